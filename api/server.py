@@ -10,9 +10,10 @@ import json
 import logging
 import tempfile
 import shutil
+import threading
 from pathlib import Path
-from typing import Optional, List
-from datetime import datetime
+from typing import Any, Callable, Optional, List
+from datetime import datetime, timezone
 
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
@@ -37,9 +38,20 @@ from src.services.extraction_pipeline import ExtractionPipeline
 from src.generators.schema_generator import SchemaGenerator
 from src.services import job_manager, storage_manager
 from src.services.supabase_client import get_supabase
+from src.services.template_store import get_template_store
+from src.services.provider_router import get_provider_router
+from src.services.hedging import get_hedge_policy
+from src.services.rate_limiter import rate_limit_snapshot
+from src.services.llm_clients import PROVIDERS, pool_snapshot
+from src.services.image_encoding import get_encoding_profile
+from src.services.call_telemetry import get_call_telemetry
+from src.services.job_control import JobAborted, JobCancelled, get_job_registry
+from src.services.page_hash import DuplicatePageIndex
 
 BASE_DIR = Path(__file__).parent.parent
 TEMPLATES_DIR = BASE_DIR / "templates"
+# Schema for re-runs of jobs that don't record their own (see job_manager.save_job_params)
+DEFAULT_REANALYSIS_SCHEMA = "templates/orofacial_exam_schema.json"
 
 ALLOWED_ORIGINS = [o.strip() for o in os.getenv("ALLOWED_ORIGINS", "").split(",") if o.strip()] if os.getenv("ALLOWED_ORIGINS") else []
 ALLOWED_ORIGINS += [
@@ -136,12 +148,32 @@ class ExtractionResultSummary(BaseModel):
     total_pages: int
     total_items_needing_review: int
     extraction_timestamp: str
+    status: Optional[str] = None
+    partial: bool = False
 
 
 # =============================================================================
 # Background Task Functions
 # =============================================================================
 
+# Loaded schemas keyed by resolved path, reused while the file is unchanged so
+# per-page prompt context memoized on them survives across jobs.
+_schema_cache: dict[Path, tuple[int, int, object]] = {}
+_schema_cache_lock = threading.Lock()
+
+
+def _load_form_schema_cached(resolved: Path):
+    stat = resolved.stat()
+    with _schema_cache_lock:
+        cached = _schema_cache.get(resolved)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+    form_schema = SchemaGenerator(resolved.parent).load_form_schema(resolved)
+    with _schema_cache_lock:
+        _schema_cache[resolved] = (stat.st_mtime_ns, stat.st_size, form_schema)
+    return form_schema
+
+
 def _load_schema(schema_path: Optional[str]):
     """Load form schema and blank templates if available."""
     if not schema_path:
@@ -155,9 +187,9 @@ def _load_schema(schema_path: Optional[str]):
         logger.warning("Schema not found at %s or %s", fe_root / schema_path, schema_path)
         return None, None
 
+    resolved = resolved.resolve()
     schema_dir = resolved.parent
-    schema_gen = SchemaGenerator(schema_dir)
-    form_schema = schema_gen.load_form_schema(resolved)
+    form_schema = _load_form_schema_cached(resolved)
 
     blank_image_paths = None
     if form_schema and form_schema.blank_images:
@@ -177,35 +209,180 @@ def _load_schema(schema_path: Optional[str]):
     return form_schema, blank_image_paths
 
 
-def _save_results_to_db(job_id: str, document_id: str, result, start_time: datetime, model_used: str = "unknown"):
-    """Persist extraction results to Supabase and create derived records."""
-    page_dicts = []
+def _retry_summary(job_id: str, start_time: datetime, page_numbers: List[int], **fields) -> dict:
+    """One retry of a job's failed pages, for extraction_jobs.retries: when, how long, which pages, its LLM calls."""
+    return {
+        "started_at": start_time.isoformat(),
+        "processing_time_ms": int((datetime.utcnow() - start_time).total_seconds() * 1000),
+        "page_numbers": list(page_numbers),
+        **fields,
+        "llm_telemetry": get_call_telemetry().job_summary(
+            job_id, since=start_time.replace(tzinfo=timezone.utc).timestamp(),
+        ),
+    }
+
+
+def _record_job_stopped(job_id: str, document_id: str, error: JobAborted, retry: Optional[dict] = None) -> None:
+    """
+    Record a cancelled or timed-out job; the pages it finished stay saved.
+
+    Args:
+        retry: The stopped run's _retry_summary when it was a retry, appended
+            to the job's retries instead of replacing its telemetry
+    """
+    cancelled = isinstance(error, JobCancelled)
+    logger.warning("[BG] job %s stopped: %s", job_id[:8], error)
+    job_manager.update_job(
+        job_id,
+        status="cancelled" if cancelled else "failed",
+        error_message=str(error),
+        current_stage="Cancelled" if cancelled else "Deadline exceeded",
+    )
+    job_manager.update_document(document_id, status="cancelled" if cancelled else "failed")
+    if retry is not None:
+        job_manager.append_job_retry(job_id, {**retry, "status": "cancelled" if cancelled else "failed"})
+    else:
+        job_manager.save_job_telemetry(job_id, get_call_telemetry().job_summary(job_id))
+
+
+def _cancelled_before_start(job_id: str) -> bool:
+    """
+    Whether a queued job was cancelled; the cancel endpoint already marked it.
+    Otherwise the job is claimed by this process, so cancels reach it here.
+
+    A cancel sent to this server is kept in the registry; one sent to another
+    server (or forced) is seen in the job row's status.
+    """
+    registry = get_job_registry()
+    registry.claim(job_id)
+    cancelled = registry.take_pending_cancel(job_id)
+    if not cancelled:
+        job = job_manager.get_job(job_id)
+        cancelled = bool(job) and job["status"] == "cancelled"
+    if cancelled:
+        registry.close(job_id)
+        logger.info("[BG] job %s was cancelled before it started", job_id[:8])
+    return cancelled
+
+
+def _page_saver(job_id: str, document_id: str) -> tuple[Callable[[Any], None], set[int]]:
+    """
+    A page_callback for extract_form that saves each page result as soon as
+    the pipeline finishes it, and the set of page numbers saved so far.
+    Saves are keyed on (job_id, page_number), so a page saved again later
+    replaces its row.
+    """
+    saved: set[int] = set()
+
+    def save(page) -> None:
+        job_manager.save_page_result(
+            job_id=job_id,
+            document_id=document_id,
+            page_number=page.page_number,
+            page_data=page.model_dump(mode="json"),
+        )
+        saved.add(page.page_number)
+
+    return save, saved
+
+
+class _JobPageIndex(DuplicatePageIndex):
+    """
+    The Supabase duplicate-page index, as seen by one job's pages: pages
+    of the same owner's uploads, or of the same document without an owner.
+    """
+
+    def __init__(self, job_id: str, document_id: str, owner_id: Optional[str] = None):
+        self.job_id = job_id
+        self.document_id = document_id
+        self.owner_id = owner_id
+
+    def find(self, page_hash, schema_key, detector):
+        return job_manager.find_duplicate_page(page_hash, schema_key, detector, self.document_id, self.owner_id)
+
+    def add(self, page_number, page_hash, schema_key):
+        job_manager.save_page_hash(
+            self.job_id, self.document_id, page_number, page_hash, schema_key, owner_id=self.owner_id,
+        )
+
+
+def _save_results_to_db(
+    job_id: str,
+    document_id: str,
+    result,
+    start_time: datetime,
+    model_used: str = "unknown",
+    blank_page_stats: Optional[dict] = None,
+    saved_pages: Optional[set[int]] = None,
+    audit_action: str = "extraction_completed",
+    duplicate_page_stats: Optional[dict] = None,
+    retry_page_numbers: Optional[List[int]] = None,
+):
+    """
+    Persist extraction results to Supabase and create derived records.
+
+    Args:
+        saved_pages: Page numbers already saved while the job ran (see
+            _page_saver); only the others are saved here
+        audit_action: Audit log action of the run (a retry logs its own)
+        duplicate_page_stats: Pages answered from earlier extractions
+            (pipeline.duplicate_page_stats)
+        retry_page_numbers: Pages a retry re-extracted; its stats are
+            appended to the job's retries instead of replacing the job's
+    """
+    saved_pages = saved_pages or set()
     for page in result.pages:
-        page_data = page.model_dump(mode="json")
-        page_dicts.append(page_data)
+        if page.page_number in saved_pages:
+            continue
         job_manager.save_page_result(
             job_id=job_id,
             document_id=document_id,
             page_number=page.page_number,
-            page_data=page_data,
+            page_data=page.model_dump(mode="json"),
         )
 
     elapsed_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-    job_manager.update_job(
-        job_id,
-        status="completed",
-        current_stage="Completed",
-        percentage=100,
-        processing_time_ms=elapsed_ms,
-        ai_model_used=model_used,
-    )
+    blank_page_stats, duplicate_page_stats = blank_page_stats or {}, duplicate_page_stats or {}
+    page_stats = {
+        "blank_pages_skipped": blank_page_stats.get("pages_skipped", 0),
+        "duplicate_pages_reused": duplicate_page_stats.get("pages_reused", 0),
+        "duplicate_pages_seeded": duplicate_page_stats.get("pages_seeded", 0),
+        "vlm_calls_saved": blank_page_stats.get("calls_saved", 0) + duplicate_page_stats.get("calls_saved", 0),
+    }
+    if retry_page_numbers is not None:
+        job_manager.update_job(job_id, status="completed", current_stage="Completed", percentage=100)
+        job_manager.append_job_retry(job_id, _retry_summary(
+            job_id, start_time, retry_page_numbers,
+            status="completed",
+            ai_model_used=model_used,
+            still_failed=[page.page_number for page in result.pages if page.overall_confidence == 0],
+            page_stats=page_stats,
+        ))
+    else:
+        job_manager.update_job(
+            job_id,
+            status="completed",
+            current_stage="Completed",
+            percentage=100,
+            processing_time_ms=elapsed_ms,
+            ai_model_used=model_used,
+        )
+        job_manager.save_job_telemetry(job_id, get_call_telemetry().job_summary(job_id))
+        job_manager.save_job_page_stats(job_id, page_stats)
     job_manager.update_document(document_id, status="analyzed")
 
     job_manager.write_audit_log(
-        action="extraction_completed",
+        action=audit_action,
         resource_type="extraction_job",
         resource_id=job_id,
-        details={"document_id": document_id, "model": model_used, "pages": len(page_dicts), "elapsed_ms": elapsed_ms},
+        details={
+            "document_id": document_id,
+            "model": model_used,
+            "pages": len(result.pages),
+            "page_numbers": [page.page_number for page in result.pages],
+            "elapsed_ms": elapsed_ms,
+            **page_stats,
+        },
     )
 
 
@@ -217,12 +394,22 @@ def run_extraction(
     schema_path: Optional[str] = None,
     start_page: Optional[int] = None,
     end_page: Optional[int] = None,
+    owner_id: Optional[str] = None,
 ):
     """Run the extraction pipeline as a background task."""
+    if _cancelled_before_start(job_id):
+        return
     start_time = datetime.utcnow()
     logger.info("[BG] run_extraction started: job=%s, file=%s", job_id[:8], file_path.name)
     try:
         job_manager.update_job(job_id, status="processing", current_stage="Initializing")
+        job_manager.save_job_params(job_id, {
+            "source": "pdf" if file_path.suffix.lower() == ".pdf" else "image",
+            "name": name,
+            "schema_path": schema_path,
+            "start_page": start_page,
+            "end_page": end_page,
+        })
 
         pdf_processor = PDFProcessor(dpi=150)
         pipeline = ExtractionPipeline()
@@ -245,25 +432,35 @@ def run_extraction(
 
         job_manager.update_job(job_id, total_pages=len(image_paths), current_stage="Running AI extraction")
 
+        save_page, saved_pages = _page_saver(job_id, document_id)
         result = pipeline.extract_form(
             image_paths=image_paths,
             form_schema=form_schema,
             form_name=name,
             blank_image_paths=blank_image_paths,
+            job_id=job_id,
+            page_callback=save_page,
+            duplicate_index=_JobPageIndex(job_id, document_id, owner_id),
         )
 
         job_manager.update_job(job_id, current_stage="Saving results", percentage=95)
-        _save_results_to_db(job_id, document_id, result, start_time, pipeline.model_used)
+        _save_results_to_db(
+            job_id, document_id, result, start_time, pipeline.model_used, pipeline.blank_page_stats,
+            saved_pages, duplicate_page_stats=pipeline.duplicate_page_stats,
+        )
 
         pdf_processor.cleanup()
         logger.info("[BG] run_extraction DONE: job=%s, model=%s", job_id[:8], pipeline.model_used)
 
+    except JobAborted as e:
+        _record_job_stopped(job_id, document_id, e)
     except Exception as e:
         logger.error("[BG] run_extraction FAILED: job=%s — %s", job_id[:8], e, exc_info=True)
         job_manager.update_job(
             job_id, status="failed", error_message=str(e), current_stage="Failed", percentage=0,
         )
         job_manager.update_document(document_id, status="failed")
+        job_manager.save_job_telemetry(job_id, get_call_telemetry().job_summary(job_id))
 
 
 def run_extraction_images(
@@ -273,18 +470,31 @@ def run_extraction_images(
     name: str,
     page_info: List[str],
     schema_path: Optional[str] = None,
+    bypass_cache: bool = False,
+    owner_id: Optional[str] = None,
+    reuse_duplicates: bool = True,
 ):
-    """Run the extraction pipeline on a batch of images with parallel processing."""
+    """
+    Run the extraction pipeline on a batch of images with parallel processing.
+
+    Args:
+        owner_id: User whose earlier uploads duplicate pages are looked up in
+        reuse_duplicates: Look pages up in the duplicate-page index at all
+            (off for re-analysis, whose pages were all extracted before)
+    """
+    if _cancelled_before_start(job_id):
+        return
     start_time = datetime.utcnow()
     logger.info("[BG] run_extraction_images started: job=%s, %d pages", job_id[:8], len(image_paths))
     try:
         job_manager.update_job(job_id, status="processing", current_stage="Initializing", percentage=0)
+        job_manager.save_job_params(job_id, {"source": "images", "name": name, "schema_path": schema_path})
 
         if page_info:
             for i, info in enumerate(page_info):
                 logger.info("  Page %d: %s", i + 1, info)
 
-        pipeline = ExtractionPipeline()
+        pipeline = ExtractionPipeline(bypass_cache=bypass_cache)
         form_schema, blank_image_paths = _load_schema(schema_path)
 
         job_manager.update_job(job_id, total_pages=len(image_paths), progress=0)
@@ -302,54 +512,199 @@ def run_extraction_images(
             )
 
         job_manager.update_job(job_id, current_stage=f"Extracting {total} page(s)")
+        save_page, saved_pages = _page_saver(job_id, document_id)
         result = pipeline.extract_form(
             image_paths=image_paths,
             form_schema=form_schema,
             form_name=name,
-            max_workers=4,
             progress_callback=_update_progress,
             blank_image_paths=blank_image_paths,
+            job_id=job_id,
+            page_callback=save_page,
+            duplicate_index=_JobPageIndex(job_id, document_id, owner_id) if reuse_duplicates else None,
         )
 
         job_manager.update_job(job_id, current_stage="Saving results", percentage=95)
+        _save_results_to_db(
+            job_id, document_id, result, start_time, pipeline.model_used, pipeline.blank_page_stats,
+            saved_pages, duplicate_page_stats=pipeline.duplicate_page_stats,
+        )
 
-        for page in result.pages:
-            page_data = page.model_dump(mode="json")
-            job_manager.save_page_result(
-                job_id=job_id,
-                document_id=document_id,
-                page_number=page_data.get("page_number", 0),
-                page_data=page_data,
-            )
+        logger.info("[BG] run_extraction_images DONE: job=%s, model=%s, %d pages",
+                     job_id[:8], pipeline.model_used, len(result.pages))
 
-        elapsed_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
+    except JobAborted as e:
+        _record_job_stopped(job_id, document_id, e)
+    except Exception as e:
+        logger.error("[BG] run_extraction_images FAILED: job=%s — %s", job_id[:8], e, exc_info=True)
         job_manager.update_job(
-            job_id, status="completed", current_stage="Completed",
-            percentage=100, processing_time_ms=elapsed_ms,
-            ai_model_used=pipeline.model_used,
+            job_id, status="failed", error_message=str(e), current_stage="Failed", percentage=0,
         )
-        job_manager.update_document(document_id, status="analyzed")
-        job_manager.write_audit_log(
-            action="extraction_completed",
-            resource_type="extraction_job",
-            resource_id=job_id,
-            details={
-                "document_id": document_id,
-                "model": pipeline.model_used,
-                "pages": len(result.pages),
-                "elapsed_ms": elapsed_ms,
-            },
+        job_manager.update_document(document_id, status="failed")
+        job_manager.save_job_telemetry(job_id, get_call_telemetry().job_summary(job_id))
+
+
+def _download_page_images(
+    pages: list[dict], tmp_dir: Path, page_numbers: Optional[set[int]] = None,
+) -> tuple[List[Path], List[int]]:
+    """
+    Download a document's stored page images (document_pages rows) into
+    tmp_dir, optionally only some page numbers.
+
+    Returns:
+        (image paths, their page numbers) of the pages that could be fetched
+    """
+    image_paths, fetched = [], []
+    for p in pages:
+        if page_numbers is not None and p["page_number"] not in page_numbers:
+            continue
+        path = p.get("annotated_image_path") or p.get("original_image_path")
+        if not path:
+            continue
+
+        bucket = storage_manager.BUCKET_ANNOTATED if "annotated" in path else storage_manager.BUCKET_PAGES
+        clean_path = path
+        for prefix in ("annotated/", "pages/", "originals/"):
+            if clean_path.startswith(prefix):
+                clean_path = clean_path[len(prefix):]
+                break
+
+        try:
+            content = storage_manager.download_file(bucket, clean_path)
+            tmp_path = tmp_dir / f"page_{p['page_number']:03d}.png"
+            tmp_path.write_bytes(content)
+            image_paths.append(tmp_path)
+            fetched.append(p["page_number"])
+        except Exception as e:
+            logger.warning("Failed to download page %d: %s", p["page_number"], e)
+    return image_paths, fetched
+
+
+def _fetch_retry_images(
+    document_id: str, params: dict, page_numbers: List[int], tmp_dir: Path,
+) -> tuple[List[Path], List[int]]:
+    """
+    Page images of a job's pages to re-extract: the stored page images of
+    image-batch documents, or the pages rendered again from the original
+    upload (PDF pages offset by the job's start_page).
+    """
+    pages = job_manager.get_document_pages(document_id)
+    if pages:
+        return _download_page_images(pages, tmp_dir, set(page_numbers))
+
+    document = job_manager.get_document(document_id)
+    if not document or not document.get("storage_path"):
+        raise ValueError(f"No stored pages or original file for document {document_id}")
+    storage_path = document["storage_path"].removeprefix("originals/")
+    local_path = tmp_dir / Path(storage_path).name
+    local_path.write_bytes(storage_manager.download_file(storage_manager.BUCKET_ORIGINALS, storage_path))
+    if local_path.suffix.lower() != ".pdf":
+        return ([local_path], [1]) if 1 in page_numbers else ([], [])
+
+    pdf_processor = PDFProcessor(dpi=150, output_dir=tmp_dir / "pages")
+    offset = (params.get("start_page") or 1) - 1
+    image_paths = []
+    for page_number in page_numbers:
+        pdf_page = offset + page_number
+        image_paths.extend(pdf_processor.convert_pdf_to_images(
+            local_path, prefix=f"page_{page_number:03d}", start_page=pdf_page, end_page=pdf_page,
+        ))
+    return image_paths, list(page_numbers)
+
+
+def run_retry_failed(job_id: str, document_id: str, page_numbers: List[int]):
+    """Re-extract a finished job's failed or missing pages and merge them into the job."""
+    if _cancelled_before_start(job_id):
+        return
+    start_time = datetime.utcnow()
+    logger.info("[BG] run_retry_failed started: job=%s, pages=%s", job_id[:8], page_numbers)
+    tmp_dir = Path(tempfile.mkdtemp(prefix="di_retry_"))
+    try:
+        job_manager.update_job(
+            job_id, status="processing", current_stage=f"Retrying {len(page_numbers)} page(s)",
+            percentage=0, error_message=None,
         )
+        job = job_manager.get_job(job_id) or {}
+        params = job.get("extraction_params") or {}
+        image_paths, fetched = _fetch_retry_images(document_id, params, page_numbers, tmp_dir)
+        if not image_paths:
+            raise RuntimeError(f"Could not retrieve images for pages {page_numbers}")
 
-        logger.info("[BG] run_extraction_images DONE: job=%s, model=%s, %d pages",
-                     job_id[:8], pipeline.model_used, len(result.pages))
+        pipeline = ExtractionPipeline()
+        form_schema, blank_image_paths = _load_schema(params.get("schema_path") or DEFAULT_REANALYSIS_SCHEMA)
+        if blank_image_paths and params.get("start_page"):
+            # Same page alignment as the original run_extraction call.
+            blank_image_paths = blank_image_paths[params["start_page"] - 1:]
+
+        def _update_progress(done, tot, pct):
+            job_manager.update_job(job_id, percentage=pct, current_stage=f"Retrying failed pages ({done}/{tot})")
+
+        save_page, saved_pages = _page_saver(job_id, document_id)
+        result = pipeline.extract_form(
+            image_paths=image_paths,
+            form_schema=form_schema,
+            form_name=params.get("name") or f"retry_{job_id[:8]}",
+            progress_callback=_update_progress,
+            blank_image_paths=blank_image_paths,
+            job_id=job_id,
+            page_callback=save_page,
+            page_numbers=fetched,
+        )
 
+        job_manager.update_job(job_id, current_stage="Saving results", percentage=95)
+        _save_results_to_db(
+            job_id, document_id, result, start_time, pipeline.model_used, pipeline.blank_page_stats,
+            saved_pages, audit_action="extraction_retried", duplicate_page_stats=pipeline.duplicate_page_stats,
+            retry_page_numbers=page_numbers,
+        )
+
+        still_failed = [p.page_number for p in result.pages if p.overall_confidence == 0]
+        logger.info(
+            "[BG] run_retry_failed DONE: job=%s, %d/%d pages recovered%s",
+            job_id[:8], len(result.pages) - len(still_failed), len(page_numbers),
+            f", still failing: {still_failed}" if still_failed else "",
+        )
+
+    except JobAborted as e:
+        _record_job_stopped(job_id, document_id, e, retry=_retry_summary(job_id, start_time, page_numbers))
     except Exception as e:
-        logger.error("[BG] run_extraction_images FAILED: job=%s — %s", job_id[:8], e, exc_info=True)
+        logger.error("[BG] run_retry_failed FAILED: job=%s — %s", job_id[:8], e, exc_info=True)
         job_manager.update_job(
             job_id, status="failed", error_message=str(e), current_stage="Failed", percentage=0,
         )
         job_manager.update_document(document_id, status="failed")
+        job_manager.append_job_retry(job_id, _retry_summary(
+            job_id, start_time, page_numbers, status="failed", error=str(e)[:300],
+        ))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+@app.on_event("startup")
+def _warm_template_payloads():
+    """Encode blank template images (per provider encoding profile) in the background so first jobs skip the PIL work."""
+    def _warm():
+        paths = []
+        for schema_file in TEMPLATES_DIR.glob("*_schema.json"):
+            try:
+                schema = json.loads(schema_file.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning("Skipping template warm-up for %s: %s", schema_file.name, e)
+                continue
+            for filename in (schema.get("blank_images") or {}).values():
+                paths.append(TEMPLATES_DIR / filename)
+        # Templates are sent encoded with the profile of the provider a page's
+        # Stage 1 goes to, so warm every configured provider's distinct profile.
+        profiles = {}
+        for provider, (key_env, _) in PROVIDERS.items():
+            if os.getenv(key_env):
+                profile = get_encoding_profile(provider)
+                profiles.setdefault(profile.key, profile)
+        store = get_template_store()
+        loaded = sum(store.warm(paths, profile) for profile in profiles.values())
+        logger.info("Warmed %d blank template payloads (%d encoding profiles)", loaded, len(profiles))
+
+    threading.Thread(target=_warm, name="template-warmup", daemon=True).start()
 
 
 # =============================================================================
@@ -370,6 +725,25 @@ async def health_check():
     }
 
 
+@app.get("/api/health/providers")
+async def provider_health():
+    """Routing policy, circuit-breaker state and rolling call stats per VLM provider, plus hedging, rate-limit and client-pool state."""
+    return {
+        **get_provider_router().snapshot(),
+        "hedging": get_hedge_policy().snapshot(),
+        "rate_limits": rate_limit_snapshot(),
+        "client_pools": pool_snapshot(),
+        "running_jobs": get_job_registry().running(),
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+@app.get("/api/health/llm-calls")
+async def llm_call_telemetry():
+    """Process-wide LLM call totals and histograms (latency, TTFB, queue wait, tokens, image bytes) by stage and provider."""
+    return {**get_call_telemetry().snapshot(), "timestamp": datetime.now().isoformat()}
+
+
 @app.post("/api/analyze", response_model=AnalyzeResponse)
 async def analyze_document(
     background_tasks: BackgroundTasks,
@@ -416,6 +790,7 @@ async def analyze_document(
 
     background_tasks.add_task(
         run_extraction, job_id, document_id, tmp_path, name, schema_path, start_page, end_page,
+        owner_id=user_id,
     )
 
     return AnalyzeResponse(job_id=job_id, document_id=document_id, status="pending", message=f"Analysis started for {file.filename}")
@@ -519,6 +894,7 @@ async def analyze_images(
 
     background_tasks.add_task(
         run_extraction_images, job_id, document_id, image_paths, name, page_info, schema_path,
+        owner_id=user_id,
     )
 
     pages_detail = ", ".join(page_info[:3])
@@ -597,6 +973,29 @@ async def get_job_status(job_id: str, user_id: str = Depends(_require_user)):
     )
 
 
+@app.get("/api/jobs/{job_id}/telemetry")
+async def get_job_telemetry(job_id: str, user_id: str = Depends(_require_user)):
+    """
+    LLM call telemetry of a job: totals per stage and provider, and each
+    call while still in memory; plus the pages it answered without the VLM
+    (blank pages skipped, duplicate pages reused) and the stats of each
+    retry of its failed pages.
+    """
+    job = job_manager.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    telemetry = get_call_telemetry()
+    calls = telemetry.job_calls(job_id)
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "summary": telemetry.job_summary(job_id) if calls else job.get("llm_telemetry"),
+        "page_stats": job.get("page_stats"),
+        "retries": job.get("retries") or [],
+        "calls": calls,
+    }
+
+
 def _collect_review_reasons(pages: list[dict]) -> list[str]:
     """Collect review reasons from free_form_annotations and low-confidence fields."""
     reasons = []
@@ -611,15 +1010,22 @@ def _collect_review_reasons(pages: list[dict]) -> list[str]:
     return reasons
 
 
-@app.get("/api/results/{job_id}")
-async def get_results(job_id: str, user_id: str = Depends(_require_user)):
-    """Get the extraction results for a completed job."""
+def _get_results_job(job_id: str) -> dict:
+    """
+    The job whose results are requested. Pages are saved as they finish, so
+    a job that is queued, running or failed part-way serves the pages it has
+    (none yet for a new job; all but the retried ones for a queued retry).
+    """
     job = job_manager.get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    if job["status"] != "completed":
-        raise HTTPException(status_code=400, detail=f"Job not completed. Current status: {job['status']}")
+    return job
+
 
+@app.get("/api/results/{job_id}")
+async def get_results(job_id: str, user_id: str = Depends(_require_user)):
+    """Get the extraction results of a job; partial while it is still running."""
+    job = _get_results_job(job_id)
     pages = job_manager.get_extraction_results(job_id)
 
     total_items_needing_review = sum(p.get("items_needing_review", 0) for p in pages)
@@ -637,6 +1043,10 @@ async def get_results(job_id: str, user_id: str = Depends(_require_user)):
         "overall_confidence": avg_confidence,
         "total_items_needing_review": total_items_needing_review,
         "all_review_reasons": all_review_reasons,
+        "status": job["status"],
+        "partial": job["status"] != "completed",
+        "pages_completed": len(pages),
+        "total_pages": job.get("total_pages"),
         "pages": [
             {
                 "page_number": p["page_number"],
@@ -656,13 +1066,8 @@ async def get_results(job_id: str, user_id: str = Depends(_require_user)):
 
 @app.get("/api/results/{job_id}/summary")
 async def get_results_summary(job_id: str, user_id: str = Depends(_require_user)):
-    """Get a summary of the extraction results."""
-    job = job_manager.get_job(job_id)
-    if not job:
-        raise HTTPException(status_code=404, detail="Job not found")
-    if job["status"] != "completed":
-        raise HTTPException(status_code=400, detail=f"Job not completed. Current status: {job['status']}")
-
+    """Get a summary of the extraction results (of the pages saved so far while running)."""
+    job = _get_results_job(job_id)
     pages = job_manager.get_extraction_results(job_id)
     total_items = sum(p.get("items_needing_review", 0) for p in pages)
     avg_confidence = (
@@ -678,24 +1083,23 @@ async def get_results_summary(job_id: str, user_id: str = Depends(_require_user)
         overall_confidence=avg_confidence,
         total_pages=len(pages),
         total_items_needing_review=total_items,
-        extraction_timestamp=job.get("completed_at", job.get("created_at", "")),
+        extraction_timestamp=job.get("completed_at") or job.get("created_at", ""),
+        status=job["status"],
+        partial=job["status"] != "completed",
     )
 
 
 @app.get("/api/results/{job_id}/page/{page_number}")
 async def get_page_results(job_id: str, page_number: int, user_id: str = Depends(_require_user)):
-    """Get results for a specific page."""
-    job = job_manager.get_job(job_id)
-    if not job:
-        raise HTTPException(status_code=404, detail="Job not found")
-    if job["status"] != "completed":
-        raise HTTPException(status_code=400, detail=f"Job not completed. Current status: {job['status']}")
-
+    """Get results for a specific page, as soon as that page is extracted."""
+    job = _get_results_job(job_id)
     pages = job_manager.get_extraction_results(job_id)
     for p in pages:
         if p["page_number"] == page_number:
             return p
 
+    if job["status"] in ("pending", "processing"):
+        raise HTTPException(status_code=404, detail=f"Page {page_number} not extracted yet")
     raise HTTPException(status_code=404, detail=f"Page {page_number} not found")
 
 
@@ -903,39 +1307,24 @@ async def get_document_pages(document_id: str, user_id: str = Depends(_require_u
 async def reanalyze_document(
     document_id: str,
     background_tasks: BackgroundTasks,
+    fresh: bool = False,
     user_id: str = Depends(_require_user),
 ):
-    """Re-analyze an existing document by creating a new extraction job."""
+    """Re-analyze an existing document by creating a new extraction job.
+
+    Every page is extracted again: the duplicate-page index is not used
+    (each page would match the previous job's). Identical requests are
+    still answered from the VLM response cache; pass ``?fresh=true`` to
+    force new provider calls.
+    """
     pages = job_manager.get_document_pages(document_id)
     if not pages:
         raise HTTPException(status_code=404, detail="No pages found for this document")
 
     # Download annotated page images from storage
     tmp_dir = Path(tempfile.mkdtemp(prefix="di_reanalyze_"))
-    image_paths = []
-    page_info = []
-
-    for p in pages:
-        path = p.get("annotated_image_path") or p.get("original_image_path")
-        if not path:
-            continue
-
-        bucket = storage_manager.BUCKET_ANNOTATED if "annotated" in path else storage_manager.BUCKET_PAGES
-        clean_path = path
-        for prefix in ("annotated/", "pages/", "originals/"):
-            if clean_path.startswith(prefix):
-                clean_path = clean_path[len(prefix):]
-                break
-
-        try:
-            content = storage_manager.download_file(bucket, clean_path)
-            filename = f"page_{p['page_number']:03d}.png"
-            tmp_path = tmp_dir / filename
-            tmp_path.write_bytes(content)
-            image_paths.append(tmp_path)
-            page_info.append(f"Page {p['page_number']}")
-        except Exception as e:
-            logger.warning("Failed to download page %d: %s", p["page_number"], e)
+    image_paths, page_numbers = _download_page_images(pages, tmp_dir)
+    page_info = [f"Page {n}" for n in page_numbers]
 
     if not image_paths:
         raise HTTPException(status_code=400, detail="Could not retrieve any page images for re-analysis")
@@ -948,18 +1337,111 @@ async def reanalyze_document(
         resource_type="extraction_job",
         resource_id=job_id,
         user_id=user_id,
-        details={"document_id": document_id, "pages": len(image_paths)},
+        details={"document_id": document_id, "pages": len(image_paths), "fresh": fresh},
     )
 
     background_tasks.add_task(
         run_extraction_images, job_id, document_id, image_paths,
         f"reanalysis_{document_id[:8]}", page_info,
-        schema_path="templates/orofacial_exam_schema.json",
+        schema_path=DEFAULT_REANALYSIS_SCHEMA,
+        bypass_cache=fresh,
+        reuse_duplicates=False,
     )
 
     return {"job_id": job_id, "status": "pending", "message": f"Re-analysis started for {len(image_paths)} pages"}
 
 
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str, force: bool = False, user_id: str = Depends(_require_user)):
+    """Cancel a queued or running job.
+
+    A running job stops its queued pages and in-flight LLM calls right away
+    and ends as "cancelled"; pages it already finished stay saved (and can be
+    completed later with retry-failed). A job that hasn't started yet is
+    marked cancelled and stops as soon as its background task starts.
+
+    A job processing on another server can't be stopped from here (409);
+    ``force`` marks it cancelled anyway, for a job left "processing" by a
+    server that went away.
+    """
+    job = job_manager.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] not in ("pending", "processing"):
+        raise HTTPException(status_code=409, detail=f"Job already {job['status']}")
+
+    registry = get_job_registry()
+    if job["status"] == "processing" and not registry.owns(job_id) and not force:
+        raise HTTPException(
+            status_code=409,
+            detail="Job is processing on another server; cancel it there, or with force=true if that server is gone",
+        )
+
+    # Only a queued job will still start here; don't let a stale cancel hit a later retry.
+    running = registry.cancel(job_id, remember=job["status"] == "pending")
+    if running:
+        job_manager.update_job(job_id, current_stage="Cancelling")
+    else:
+        # Queued (here or elsewhere; its task sees the status when it starts), or forced.
+        job_manager.update_job(job_id, status="cancelled", current_stage="Cancelled", error_message="Cancelled")
+        if job.get("document_id"):
+            job_manager.update_document(job["document_id"], status="cancelled")
+
+    job_manager.write_audit_log(
+        action="extraction_cancelled",
+        resource_type="extraction_job",
+        resource_id=job_id,
+        user_id=user_id,
+        details={"document_id": job.get("document_id"), "was_running": running},
+    )
+    return {"job_id": job_id, "status": "cancelling" if running else "cancelled"}
+
+
+@app.post("/api/jobs/{job_id}/retry-failed")
+async def retry_failed_pages(
+    job_id: str,
+    background_tasks: BackgroundTasks,
+    user_id: str = Depends(_require_user),
+):
+    """Re-extract only a job's failed or missing pages, merging them into the same job.
+
+    Failed pages are saved results with overall_confidence 0 (the
+    placeholder of a page whose extraction raised); missing pages have no
+    saved result. Pages are re-run with the job's checkpointed settings and
+    replace their rows in place; every other page is left untouched.
+    """
+    job = job_manager.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] in ("pending", "processing"):
+        raise HTTPException(status_code=409, detail=f"Job is still running (status: {job['status']})")
+    if not job.get("document_id"):
+        raise HTTPException(status_code=400, detail="Job has no document to re-extract pages from")
+
+    page_numbers = job_manager.get_retry_page_numbers(job)
+    if not page_numbers:
+        return {"job_id": job_id, "status": job["status"], "pages": [], "message": "No failed or missing pages"}
+
+    job_manager.update_job(job_id, status="pending", current_stage=f"Queued retry of {len(page_numbers)} page(s)")
+    job_manager.update_document(job["document_id"], status="processing")
+    job_manager.write_audit_log(
+        action="extraction_retry_started",
+        resource_type="extraction_job",
+        resource_id=job_id,
+        user_id=user_id,
+        details={"document_id": job["document_id"], "pages": page_numbers},
+    )
+
+    background_tasks.add_task(run_retry_failed, job_id, job["document_id"], page_numbers)
+
+    return {
+        "job_id": job_id,
+        "status": "pending",
+        "pages": page_numbers,
+        "message": f"Retrying {len(page_numbers)} failed or missing page(s)",
+    }
+
+
 # =============================================================================
 # Report Persistence
 # =============================================================================
@@ -309,6 +309,49 @@ def info(schema_file: str):
     console.print(summary)
 
 
+@cli.command()
+@click.argument("schema_file", type=click.Path(exists=True))
+@click.option("--force", is_flag=True, help="Rebuild pages whose atlas is already current")
+@click.option(
+    "--ocr", type=click.Choice(["tesseract", "rapidocr"]), default="tesseract", show_default=True,
+    help="OCR engine for the printed labels",
+)
+def atlas(schema_file: str, force: bool, ocr: str):
+    """
+    Build field region atlases for a form's blank template pages.
+
+    Locates each field's label and printed options on the blank page
+    images (OCR + layout analysis) and stores normalized boxes in
+    templates/.regions/. Pages are only rebuilt when the blank image or
+    the page schema changed. Requires pytesseract and the tesseract binary
+    (requirements-dev.txt; not in the Docker image), or rapidocr_onnxruntime
+    with --ocr rapidocr.
+
+    Example:
+
+        python main.py atlas ./templates/orofacial_exam_schema.json
+    """
+    from src.services.template_atlas import OCR_SOURCES, build_form_atlases
+
+    schema_path = Path(schema_file)
+    schema_gen = SchemaGenerator(schema_path.parent)
+    form_schema = schema_gen.load_form_schema(schema_path)
+
+    console.print(f"[bold]Building region atlases for {form_schema.form_name}[/bold]")
+    try:
+        statuses = build_form_atlases(form_schema, schema_path.parent, force=force, segment_source=OCR_SOURCES[ocr])
+    except RuntimeError as e:
+        console.print(f"[red]Error: {e}[/red]")
+        sys.exit(1)
+
+    built = sum(1 for s in statuses.values() if s == "built")
+    current = sum(1 for s in statuses.values() if s == "current")
+    missing = [p for p, s in statuses.items() if s == "no_template"]
+    console.print(f"\n[green]Built {built}, already current {current}[/green]")
+    if missing:
+        console.print(f"[yellow]No blank template image for pages {missing}[/yellow]")
+
+
 @cli.command()
 def check():
     """
@@ -14,6 +14,7 @@ import io
 import json
 import os
 import sys
+import tempfile
 import time
 from dataclasses import dataclass
 from pathlib import Path
@@ -97,6 +98,7 @@ class ModelConfig:
     prompt_key: str = "standard"
     dpi: int = 150
     max_dim: int = 1568
+    encoding: Optional[str] = None  # provider profile of src/services/image_encoding
 
 
 MODELS = [
@@ -129,6 +131,12 @@ MODELS = [
         "meta-llama/Llama-4-Maverick-17B-128E-Instruct-FP8",
         "https://api.together.xyz/v1", "TOGETHER_API_KEY", 0.27, 0.85,
     ),
+    ModelConfig(
+        "Llama4 Maverick (adaptive)", "together",
+        "meta-llama/Llama-4-Maverick-17B-128E-Instruct-FP8",
+        "https://api.together.xyz/v1", "TOGETHER_API_KEY", 0.27, 0.85,
+        "enhanced", 300, 2048, "together",
+    ),
     ModelConfig(
         "Kimi K2.5 (TG)", "together", "moonshotai/Kimi-K2.5",
         "https://api.together.xyz/v1", "TOGETHER_API_KEY", 0.50, 2.80,
@@ -141,6 +149,10 @@ MODELS = [
         "Claude Sonnet 4", "anthropic", "claude-sonnet-4-20250514",
         None, "ANTHROPIC_API_KEY", 3.00, 15.00,
     ),
+    ModelConfig(
+        "Claude Sonnet 4 (adaptive)", "anthropic", "claude-sonnet-4-20250514",
+        None, "ANTHROPIC_API_KEY", 3.00, 15.00, "enhanced", 300, 2048, "claude",
+    ),
 ]
 
 # ============================================================
@@ -219,7 +231,11 @@ PROMPTS = {"standard": STANDARD_PROMPT, "enhanced": ENHANCED_PROMPT}
 
 
 def prepare_image(
-    pdf_path: Path, page_num: int, dpi: int = 150, max_dim: int = 1568
+    pdf_path: Path,
+    page_num: int,
+    dpi: int = 150,
+    max_dim: int = 1568,
+    encoding: Optional[str] = None,
 ) -> tuple[str, str]:
     from pdf2image import convert_from_path
 
@@ -230,6 +246,21 @@ def prepare_image(
     w, h = img.size
     console.print(f"    Raw: {w}x{h} @ {dpi} DPI")
 
+    if encoding:
+        # Same encoder and per-provider budget as the extraction pipeline.
+        from src.services.image_encoding import encode_image, get_encoding_profile
+
+        with tempfile.TemporaryDirectory() as tmp:
+            page_path = Path(tmp) / f"page_{page_num}.png"
+            img.save(page_path)
+            encoded = encode_image(page_path, get_encoding_profile(encoding))
+        console.print(
+            f"    Adaptive ({encoding}): {encoded.width}x{encoded.height} "
+            f"{encoded.format} q{encoded.quality}"
+            f"{' gray' if encoded.grayscale else ''}, {encoded.size_bytes / 1024:.0f} KB"
+        )
+        return encoded.data, encoded.media_type
+
     if w > max_dim or h > max_dim:
         ratio = min(max_dim / w, max_dim / h)
         nw, nh = int(w * ratio), int(h * ratio)
@@ -244,6 +275,10 @@ def prepare_image(
     return b64, "image/jpeg"
 
 
+def _image_key(dpi: int, max_dim: int, encoding: Optional[str]) -> str:
+    return f"{dpi}_{max_dim}" + (f"_{encoding}" if encoding else "")
+
+
 # ============================================================
 # API CALLERS
 # ============================================================
@@ -570,10 +605,10 @@ def main():
 
     console.print("\n[bold]Preparing images...[/bold]")
     images: dict[str, tuple[str, str]] = {}
-    for dpi, max_dim in {(cfg.dpi, cfg.max_dim) for cfg in MODELS}:
-        key = f"{dpi}_{max_dim}"
+    for dpi, max_dim, encoding in {(cfg.dpi, cfg.max_dim, cfg.encoding) for cfg in MODELS}:
+        key = _image_key(dpi, max_dim, encoding)
         console.print(f"  [{key}] page {EXAM_PAGE} @ {dpi} DPI, max {max_dim}px")
-        images[key] = prepare_image(PDF_PATH, EXAM_PAGE, dpi, max_dim)
+        images[key] = prepare_image(PDF_PATH, EXAM_PAGE, dpi, max_dim, encoding)
 
     results: list[dict] = []
     total = len(MODELS)
@@ -588,7 +623,7 @@ def main():
             results.append({"model": cfg.name, "status": "error", "error": "no API key"})
             continue
 
-        img_key = f"{cfg.dpi}_{cfg.max_dim}"
+        img_key = _image_key(cfg.dpi, cfg.max_dim, cfg.encoding)
         b64, mtype = images[img_key]
         prompt = PROMPTS[cfg.prompt_key]
 
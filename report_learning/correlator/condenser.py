@@ -10,7 +10,6 @@ Two stages:
 from __future__ import annotations
 
 import json
-import os
 import re
 from pathlib import Path
 from typing import Any, Optional
@@ -333,12 +332,11 @@ def verify_condensed(
 ) -> dict[str, Any]:
     """Run AI verification on flagged/critical pages of a condensed extraction."""
     if client is None:
-        import anthropic
-        api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not api_key:
+        from src.services.llm_clients import get_llm_client
+        client = get_llm_client("claude")
+        if client is None:
             console.print("[yellow]No ANTHROPIC_API_KEY — skipping AI verify[/yellow]")
             return condensed
-        client = anthropic.Anthropic(api_key=api_key)
 
     pages_verified = 0
     for page in condensed.get("pages", []):
@@ -368,14 +366,13 @@ def verify_all(
     output_dir: Path | None = None,
 ) -> int:
     """Run AI verification on all condensed JSONs. Overwrites in place or to output_dir."""
-    import anthropic
+    from src.services.llm_clients import get_llm_client
 
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
+    client = get_llm_client("claude")
+    if client is None:
         console.print("[red]ANTHROPIC_API_KEY not set[/red]")
         return 0
 
-    client = anthropic.Anthropic(api_key=api_key)
     dest = output_dir or condensed_dir
     dest.mkdir(parents=True, exist_ok=True)
     files = sorted(condensed_dir.glob("*_condensed.json"))
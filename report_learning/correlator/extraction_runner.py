@@ -44,9 +44,16 @@ def _page_similarity(img_pil: Image.Image, blank_path: Path, size=(300, 390)) ->
 
     Correlation excels at highly-structured pages (page 1 with YES/NO grid).
     SSIM excels when handwriting or stamps shift overall brightness.
-    Taking the max leverages each metric's strength.
+    Taking the max leverages each metric's strength. The page is registered
+    onto the blank first, so shifted/rotated scans compare in template
+    coordinates.
     """
+    from src.services.page_registration import get_page_registrar
+
     with Image.open(blank_path) as blank:
+        registration = get_page_registrar().register(img_pil, blank)
+        if not registration.is_identity:
+            img_pil = registration.warp(img_pil)
         a = np.array(img_pil.resize(size).convert("L"), dtype=np.float64)
         b = np.array(blank.resize(size).convert("L"), dtype=np.float64)
 
@@ -435,6 +442,12 @@ def run_all_extractions_v2(
     console.print(f"[bold]Schema: {form_schema.form_name} ({form_schema.total_pages} pages)[/bold]")
     console.print(f"[bold]Blank templates: {sum(1 for p in blank_paths if p)} available[/bold]")
 
+    # Encode every blank template once up front, in the encoding of the
+    # provider the forms are forced onto; all forms reuse the payloads.
+    from src.services.image_encoding import get_encoding_profile
+    from src.services.template_store import get_template_store
+    get_template_store().warm(blank_paths, get_encoding_profile("claude"))
+
     to_process: list[Path] = []
     results: list[dict] = []
     for pdf in pdf_files:
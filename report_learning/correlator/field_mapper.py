@@ -7,12 +7,10 @@ the data was transformed.
 """
 
 import json
-import os
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Any, Optional
 
-import anthropic
 import instructor
 from rich.console import Console
 
@@ -32,10 +30,12 @@ MAX_PARALLEL = 3
 
 
 def _build_client() -> instructor.Instructor:
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
+    from src.services.llm_clients import get_instructor_client
+
+    client = get_instructor_client("claude")
+    if client is None:
         raise ValueError("ANTHROPIC_API_KEY not set")
-    return instructor.from_anthropic(anthropic.Anthropic(api_key=api_key))
+    return client
 
 
 def _summarise_report_for_prompt(report: ScannedReport) -> str:
@@ -6,11 +6,9 @@ conditional sections, universal formatting rules, and canonical ordering.
 """
 
 import json
-import os
 from pathlib import Path
 from typing import Optional
 
-import anthropic
 import instructor
 from rich.console import Console
 
@@ -22,10 +20,12 @@ CLAUDE_MODEL = "claude-sonnet-4-20250514"
 
 
 def _build_client() -> instructor.Instructor:
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
+    from src.services.llm_clients import get_instructor_client
+
+    client = get_instructor_client("claude")
+    if client is None:
         raise ValueError("ANTHROPIC_API_KEY not set")
-    return instructor.from_anthropic(anthropic.Anthropic(api_key=api_key))
+    return client
 
 
 def _summarise_correlations(correlations: list[PairCorrelation]) -> str:
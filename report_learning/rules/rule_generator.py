@@ -7,11 +7,9 @@ every report section.
 """
 
 import json
-import os
 from pathlib import Path
 from typing import Any, Optional
 
-import anthropic
 import instructor
 from rich.console import Console
 
@@ -30,10 +28,12 @@ CLAUDE_MODEL = "claude-sonnet-4-20250514"
 
 
 def _build_client() -> instructor.Instructor:
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
+    from src.services.llm_clients import get_instructor_client
+
+    client = get_instructor_client("claude")
+    if client is None:
         raise ValueError("ANTHROPIC_API_KEY not set")
-    return instructor.from_anthropic(anthropic.Anthropic(api_key=api_key))
+    return client
 
 
 def _collect_section_examples(
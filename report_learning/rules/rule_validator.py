@@ -8,12 +8,10 @@ Call 6: For weak sections, asks the LLM to suggest rule refinements.
 """
 
 import json
-import os
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Any, Optional
 
-import anthropic
 import instructor
 from rich.console import Console
 from rich.table import Table
@@ -35,10 +33,12 @@ MAX_PARALLEL = 3
 
 
 def _build_client() -> instructor.Instructor:
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
+    from src.services.llm_clients import get_instructor_client
+
+    client = get_instructor_client("claude")
+    if client is None:
         raise ValueError("ANTHROPIC_API_KEY not set")
-    return instructor.from_anthropic(anthropic.Anthropic(api_key=api_key))
+    return client
 
 
 def _generate_narrative_full(
@@ -7,10 +7,8 @@ and identify what patient data drives the narrative content.
 """
 
 import json
-import os
 from pathlib import Path
 
-import anthropic
 import instructor
 from pydantic import BaseModel, Field
 from rich.console import Console
@@ -85,10 +83,12 @@ Analyze this section thoroughly. Identify every distinct data point the doctor r
 
 
 def _build_client() -> instructor.Instructor:
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
+    from src.services.llm_clients import get_instructor_client
+
+    client = get_instructor_client("claude")
+    if client is None:
         raise ValueError("ANTHROPIC_API_KEY not set")
-    return instructor.from_anthropic(anthropic.Anthropic(api_key=api_key))
+    return client
 
 
 def _gather_section_examples(
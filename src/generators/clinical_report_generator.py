@@ -12,7 +12,6 @@ annotated or excluded depending on thresholds.
 
 import json
 import logging
-import os
 import re
 from io import BytesIO
 from pathlib import Path
@@ -24,6 +23,8 @@ from docx.oxml.ns import qn
 from docx.shared import Pt, Inches, Cm, RGBColor
 from openai import OpenAI
 
+from ..services.llm_clients import get_llm_client
+
 logger = logging.getLogger(__name__)
 
 RULES_PATH = Path(__file__).parent.parent.parent / "report_learning" / "outputs" / "rules" / "report_rules.json"
@@ -274,20 +275,16 @@ def _collect_low_confidence_fields(all_fields: dict[str, Any]) -> list[dict]:
 # =============================================================================
 
 TOGETHER_MODEL = "meta-llama/Llama-4-Maverick-17B-128E-Instruct-FP8"
-TOGETHER_BASE_URL = "https://api.together.xyz/v1"
 FIREWORKS_MODEL = "accounts/fireworks/models/deepseek-v3p1"
-FIREWORKS_BASE_URL = "https://api.fireworks.ai/inference/v1"
 
 
 def _build_llm_clients() -> list[tuple[OpenAI, str]]:
-    """Build LLM clients in priority order for automatic fallback."""
+    """LLM clients in priority order for automatic fallback (shared, keep-alive pools)."""
     clients = []
-    together_key = os.getenv("TOGETHER_API_KEY")
-    fireworks_key = os.getenv("FIREWORKS_API_KEY")
-    if together_key:
-        clients.append((OpenAI(api_key=together_key, base_url=TOGETHER_BASE_URL, timeout=120.0), TOGETHER_MODEL))
-    if fireworks_key:
-        clients.append((OpenAI(api_key=fireworks_key, base_url=FIREWORKS_BASE_URL, timeout=120.0), FIREWORKS_MODEL))
+    for provider, model in (("together", TOGETHER_MODEL), ("fireworks", FIREWORKS_MODEL)):
+        client = get_llm_client(provider, timeout=120.0)
+        if client is not None:
+            clients.append((client, model))
     return clients
 
 
@@ -2,8 +2,8 @@
 Models for form pages.
 """
 
-from typing import Optional
-from pydantic import BaseModel, Field
+from typing import Any, Optional
+from pydantic import BaseModel, Field, PrivateAttr
 
 from .fields import FormFieldSchema, TableSchema
 from .sections import SectionSchema
@@ -42,6 +42,9 @@ class PageSchema(BaseModel):
         description="Any notes about this page (references to other pages, etc.)"
     )
     
+    # Memo for prompt artifacts derived from this (immutable once loaded) schema
+    _prompt_memo: dict[Any, Any] = PrivateAttr(default_factory=dict)
+    
     @property
     def total_fields(self) -> int:
         """Count total fields on this page."""
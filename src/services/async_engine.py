@@ -0,0 +1,217 @@
+"""
+Process-wide asyncio engine for LLM-bound work.
+
+Sync callers (FastAPI background tasks, the CLI, the training runner) submit
+coroutines to one long-lived background event loop instead of spinning up
+their own threads or loops. Every LLM call, whichever loop it runs on, is
+gated by a single process-wide concurrency limit (per-provider pacing lives in
+rate_limiter).
+
+run_stages() chains worker pools with bounded queues, so multi-stage jobs
+can keep each stage's provider busy without piling up work between them.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Iterable, Optional, Sequence, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_MAX_CONCURRENCY = 256
+
+_engine_loop: Optional[asyncio.AbstractEventLoop] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared background event loop, starting it on first use."""
+    global _engine_loop
+    with _engine_lock:
+        if _engine_loop is None or _engine_loop.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="llm-engine", daemon=True)
+            thread.start()
+            _engine_loop = loop
+            logger.info("LLM engine loop started")
+        return _engine_loop
+
+
+def run_sync(coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """Run a coroutine on the engine loop and block until it finishes."""
+    loop = get_engine_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        raise RuntimeError("run_sync() called from the engine loop — await the coroutine instead")
+
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result(timeout)
+    except BaseException:
+        future.cancel()
+        raise
+
+
+class ConcurrencyLimiter:
+    """
+    Counting limiter shared by every thread and event loop in the process.
+
+    asyncio.Semaphore is bound to a single loop; this one hands slots to
+    waiters on whichever loop they were created, in FIFO order.
+    """
+
+    def __init__(self, limit: int):
+        if limit < 1:
+            raise ValueError("limit must be >= 1")
+        self.limit = limit
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._waiters: deque[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                return
+            fut = loop.create_future()
+            self._waiters.append((loop, fut))
+
+        try:
+            await fut
+        except asyncio.CancelledError:
+            with self._lock:
+                owns_slot = fut.done() and not fut.cancelled()
+                try:
+                    self._waiters.remove((loop, fut))
+                except ValueError:
+                    pass
+            if owns_slot:
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                loop, fut = self._waiters.popleft()
+                if fut.done() or loop.is_closed():
+                    continue
+                # Hand the slot straight to the next waiter; in_flight is unchanged.
+                loop.call_soon_threadsafe(self._wake, fut)
+                return
+            self._in_flight -= 1
+
+    def _wake(self, fut: asyncio.Future) -> None:
+        if fut.cancelled():
+            self.release()
+        else:
+            fut.set_result(None)
+
+    async def __aenter__(self) -> "ConcurrencyLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.release()
+
+
+@lru_cache(maxsize=1)
+def get_llm_limiter() -> ConcurrencyLimiter:
+    """Process-wide cap on in-flight LLM calls (EXTRACTION_MAX_CONCURRENCY)."""
+    limit = int(os.getenv("EXTRACTION_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+    logger.info("LLM concurrency limit: %d", limit)
+    return ConcurrencyLimiter(limit)
+
+
+# =============================================================================
+# STAGED WORKER POOLS
+# =============================================================================
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One stage of a run_stages pipeline.
+
+    Args:
+        name: Stage name (logging)
+        handle: Coroutine function processing one item; returns the items
+            passed to the next stage (none, one or several)
+        workers: Items this stage processes at once
+    """
+
+    name: str
+    handle: Callable[[Any], Awaitable[Iterable[Any]]]
+    workers: int
+
+
+_STAGE_DONE = object()
+
+
+async def run_stages(items: Iterable[Any], stages: Sequence[Stage], queue_size: Optional[int] = None) -> None:
+    """
+    Push items through a chain of worker pools connected by bounded queues.
+
+    Each stage drains its own queue with its own pool, so stages overlap:
+    while one item is in stage 2, the next is already in stage 1. The queue
+    in front of each later stage holds at most ``queue_size`` items (default:
+    that stage's worker count); when it is full the upstream worker waits,
+    which keeps a fast stage from running far ahead of a slow one.
+
+    Handlers are expected to record their own per-item failures; an
+    exception escaping a handler cancels the whole run and is re-raised.
+    """
+    if not stages:
+        return
+    for stage in stages:
+        if stage.workers < 1:
+            raise ValueError(f"stage {stage.name!r} needs at least one worker")
+    queues: list[asyncio.Queue] = [asyncio.Queue()] + [
+        asyncio.Queue(maxsize=queue_size or stage.workers) for stage in stages[1:]
+    ]
+    for item in items:
+        queues[0].put_nowait(item)
+    for _ in range(stages[0].workers):
+        queues[0].put_nowait(_STAGE_DONE)
+
+    async def worker(index: int) -> None:
+        inbox = queues[index]
+        outbox = queues[index + 1] if index + 1 < len(stages) else None
+        while True:
+            item = await inbox.get()
+            if item is _STAGE_DONE:
+                return
+            for out in await stages[index].handle(item):
+                if outbox is not None:
+                    await outbox.put(out)
+
+    async def run_stage(index: int) -> None:
+        await asyncio.gather(*(worker(index) for _ in range(stages[index].workers)))
+        logger.debug("Stage %s drained", stages[index].name)
+        if index + 1 < len(stages):
+            for _ in range(stages[index + 1].workers):
+                await queues[index + 1].put(_STAGE_DONE)
+
+    tasks = [asyncio.ensure_future(run_stage(i)) for i in range(len(stages))]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
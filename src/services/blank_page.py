@@ -0,0 +1,202 @@
+"""
+Blank-page short-circuit from the filled-vs-blank ink difference.
+
+Patients routinely skip whole conditional pages ("If MVA...", injury
+follow-ups), and each such page still costs a Stage 1 and usually a Stage 2
+call that return nothing. After aligning the filled page on its blank
+template, two kinds of ink are measured:
+
+- new ink: whatever isn't within a few pixels of the printed ink
+- over-print: ink beside and between the printed strokes, inside that
+  band (a strike-through or a tick drawn over a printed option, which
+  selects it, lands almost entirely there)
+
+Each score is the densest patch of its ink (so a single initial or a
+strike in one corner still counts). Only pages below both of their
+template's thresholds skip the VLM.
+
+Thresholds are calibrated per template and per measure: the blank is
+degraded the way a scan degrades it (offset, slight rescale, blur, JPEG)
+and scored against itself, and each threshold sits well above that noise
+level.
+"""
+
+import io
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from .page_ink import (
+    blank_ink_mask, densest_tile, dilate, ink_mask, load_registered_rgb, page_shift, reduce_mask, shift_mask,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class InkScore:
+    """New-ink score of one filled page against its blank template."""
+
+    score: float
+    threshold: float
+    alignment: float
+    blank: bool
+    over_score: float = 0.0
+    over_threshold: float = 0.0
+
+
+@dataclass
+class BlankPageDetector:
+    """
+    Decides whether a filled page has any new ink at all.
+
+    Args:
+        enabled: Run the check at all (BLANK_PAGE_SKIP)
+        min_threshold: Floor of the calibrated threshold, as a fraction of
+            a tile (a pen stroke about a tenth of an inch long)
+        noise_margin: Calibrated threshold = this × the template's scan-noise score
+        min_alignment: Fraction of the blank's printed ink that must be found
+            on the filled page; below it the page is never called blank
+        search_radius: Max page misalignment searched, as a fraction of page width
+        ink_tolerance: Distance from printed ink within which filled ink is
+            not new, as a fraction of page width
+        tile_size: Side of the patches new ink is measured over, as a
+            fraction of page width
+        over_tile_size: Side of the patches over-print is measured over
+            (smaller, as it hugs a single printed word), as a fraction of
+            page width
+        min_over_threshold: Floor of the calibrated over-print threshold,
+            as a fraction of an over-print tile
+        margin: Page border ignored (scanner edges, punch holes), as a
+            fraction of each dimension
+        prefill_confidence: Confidence given to the null fields of a blank page
+            (kept below DEFAULT_FIELD_CONFIDENCE; blank pages are also
+            flagged for review, as no VLM has looked at them)
+    """
+
+    enabled: bool = True
+    min_threshold: float = 0.003
+    noise_margin: float = 3.0
+    min_alignment: float = 0.7
+    search_radius: float = 0.015
+    ink_tolerance: float = 0.003
+    tile_size: float = 0.05
+    over_tile_size: float = 0.02
+    min_over_threshold: float = 0.004
+    margin: float = 0.03
+    prefill_confidence: float = 0.8
+
+    def __post_init__(self):
+        self._thresholds: dict[Path, tuple[int, tuple[float, float]]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "BlankPageDetector":
+        """Detector configured from BLANK_PAGE_SKIP."""
+        return cls(enabled=os.getenv("BLANK_PAGE_SKIP", "true").lower() in ("1", "true", "yes"))
+
+    def score(self, filled_image_path: Path, blank_image_path: Path) -> InkScore:
+        """Register a filled page on its blank template and score its new ink."""
+        blank = blank_ink_mask(blank_image_path)
+        filled = ink_mask(load_registered_rgb(filled_image_path, blank_image_path))
+        score, over_score, alignment = self._new_ink(filled, blank)
+        threshold, over_threshold = self.thresholds(blank_image_path)
+        return InkScore(
+            score=round(score, 5),
+            threshold=round(threshold, 5),
+            alignment=round(alignment, 3),
+            blank=alignment >= self.min_alignment and score < threshold and over_score < over_threshold,
+            over_score=round(over_score, 5),
+            over_threshold=round(over_threshold, 5),
+        )
+
+    def threshold(self, blank_image_path: Path) -> float:
+        """Calibrated new-ink threshold for a template."""
+        return self.thresholds(blank_image_path)[0]
+
+    def thresholds(self, blank_image_path: Path) -> tuple[float, float]:
+        """Calibrated (new-ink, over-print) thresholds for a template, computed once per process."""
+        path = Path(blank_image_path).resolve()
+        mtime_ns = path.stat().st_mtime_ns
+        with self._lock:
+            cached = self._thresholds.get(path)
+        if cached and cached[0] == mtime_ns:
+            return cached[1]
+        noise, over_noise = self._scan_noise(path)
+        thresholds = (
+            max(self.min_threshold, self.noise_margin * noise),
+            max(self.min_over_threshold, self.noise_margin * over_noise),
+        )
+        logger.info(
+            "Blank-page thresholds for %s: new ink %.4f (scan noise %.4f), over-print %.4f (scan noise %.4f)",
+            path.name, thresholds[0], noise, thresholds[1], over_noise,
+        )
+        with self._lock:
+            self._thresholds[path] = (mtime_ns, thresholds)
+        return thresholds
+
+    def _scan_noise(self, blank_image_path: Path) -> tuple[float, float]:
+        """(new-ink, over-print) scores of the blank against scan-like degraded copies of itself.
+
+        New ink is calibrated against a slightly rescaled copy, as it must
+        hold up when registration is off. Over-print sits within a pixel of
+        the printed ink, which only a registered page can match, so it is
+        calibrated against an unscaled copy; an unregistered page that
+        drifts just goes to the VLM.
+        """
+        from PIL import Image, ImageFilter
+
+        blank = blank_ink_mask(blank_image_path)
+        height, width = blank.shape
+        offset = max(1, int(0.002 * width))
+        scores = []
+        with Image.open(blank_image_path) as img:
+            img = img.convert("RGB")
+            for scale in (1.004, 1.0):
+                scaled = img.resize((int(width * scale), int(height * scale)), Image.Resampling.BILINEAR)
+                degraded = Image.new("RGB", (width, height), "white")
+                degraded.paste(scaled, (offset, -offset))
+                degraded = degraded.filter(ImageFilter.GaussianBlur(0.8))
+                buffer = io.BytesIO()
+                degraded.save(buffer, format="JPEG", quality=60)
+                buffer.seek(0)
+                with Image.open(buffer) as reloaded:
+                    scores.append(self._new_ink(ink_mask(np.asarray(reloaded.convert("RGB"))), blank))
+        return scores[0][0], scores[1][1]
+
+    def _new_ink(self, filled: np.ndarray, blank: np.ndarray) -> tuple[float, float, float]:
+        """(densest-tile new-ink fraction, densest-tile over-print fraction, alignment)
+        of a filled mask over a blank mask.
+
+        The translation search absorbs what registration leaves (or all of
+        the misalignment when registration is off).
+        """
+        # Half resolution (~100-150 dpi for typical scans) still resolves
+        # pen strokes and is four times cheaper.
+        factor = 2 if blank.shape[1] >= 1600 else 1
+        small_filled, small_blank = reduce_mask(filled, factor), reduce_mask(blank, factor)
+        height, width = small_blank.shape
+        dy, dx, alignment = page_shift(small_filled, small_blank, max(2, int(self.search_radius * width)))
+        added = shift_mask(small_filled, dy, dx) & ~dilate(small_blank, max(1, int(self.ink_tolerance * width)))
+        my, mx = int(self.margin * height), int(self.margin * width)
+        score = densest_tile(_despeckle(added)[my:height - my, mx:width - mx], max(8, int(self.tile_size * width)))
+
+        # Over-print at full resolution: halving fills the gaps between
+        # letters that a strike-through crosses. Ink on the printed strokes
+        # themselves can't be told apart (a pen line over a letter looks
+        # like the letter); a pixel of slack absorbs scan thickening.
+        height, width = blank.shape
+        filled = shift_mask(filled, dy * factor, dx * factor)
+        over = filled & dilate(blank, max(1, int(self.ink_tolerance * width))) & ~dilate(blank, 1)
+        my, mx = int(self.margin * height), int(self.margin * width)
+        over_score = densest_tile(_despeckle(over)[my:height - my, mx:width - mx], max(8, int(self.over_tile_size * width)))
+        return score, over_score, alignment
+
+
+def _despeckle(mask: np.ndarray) -> np.ndarray:
+    """Erode by a pixel so scanner specks don't count."""
+    return mask[:-1, :-1] & mask[1:, :-1] & mask[:-1, 1:] & mask[1:, 1:]
@@ -0,0 +1,369 @@
+"""
+Per-call telemetry for VLM requests.
+
+Every live LLM call made by the extraction pipeline produces one
+LLMCallRecord: provider, model, stage, job and pages, request size (image
+bytes, prompt characters), token usage from the provider's response, time
+spent queued for a slot, time to first byte of the last attempt, total
+latency, retries and an estimated cost. Records are logged as one JSON
+line each, summed per job (persisted on the job's extraction_jobs row when
+it finishes) and folded into fixed-bucket histograms per stage and
+provider, which is what concurrency and batching are tuned from.
+
+Costs use the per-model $/M-token prices of the vision benchmark
+(report_learning.benchmark_vision.MODELS), falling back to the price the
+caller configured for its route. Input tokens served from a provider's
+prompt cache (and, on Claude, tokens written to it) are recorded
+separately and priced with the provider's cache multipliers.
+"""
+
+import contextlib
+import json
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import Any, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS_MS = (250, 500, 1000, 2000, 5000, 10000, 20000, 30000, 60000, 120000)
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+BYTE_BUCKETS = (50_000, 100_000, 250_000, 500_000, 1_000_000, 2_000_000, 5_000_000)
+
+RECENT_CALLS = 2000
+MAX_JOBS = 500
+
+# (cache read, cache write) multipliers of the input price, per provider.
+# Anthropic: reads 0.1x, 5-minute writes 1.25x. Fireworks bills cached
+# prompt tokens at half price; providers not listed get no discount.
+CACHE_PRICE_FACTORS: dict[str, tuple[float, float]] = {
+    "claude": (0.1, 1.25),
+    "fireworks": (0.5, 1.0),
+}
+
+
+# =============================================================================
+# CALL CONTEXT
+# =============================================================================
+
+_call_scope: ContextVar[tuple[str, tuple[int, ...]]] = ContextVar("llm_call_scope", default=("unknown", ()))
+_active_call: ContextVar[Optional["LLMCallRecord"]] = ContextVar("llm_active_call", default=None)
+
+
+@contextlib.contextmanager
+def call_scope(stage: str, pages: Optional[list[int]] = None) -> Iterator[None]:
+    """Attribute LLM calls made in this context (and tasks it spawns) to a stage and pages."""
+    token = _call_scope.set((stage, tuple(pages or ())))
+    try:
+        yield
+    finally:
+        _call_scope.reset(token)
+
+
+def record_usage(completion: Any) -> None:
+    """Add a raw completion's token usage to the call in progress (no-op outside one)."""
+    record = _active_call.get()
+    usage = getattr(completion, "usage", None)
+    if record is None or usage is None:
+        return
+    # OpenAI-compatible: prompt_tokens includes cached ones (prompt_tokens_details).
+    # Anthropic: input_tokens excludes the cache_read / cache_creation tokens.
+    if getattr(usage, "prompt_tokens", None) is not None:
+        tokens_in = usage.prompt_tokens
+        cache_read = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None) or 0
+        cache_write = 0
+    else:
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+        tokens_in = (getattr(usage, "input_tokens", None) or 0) + cache_read + cache_write
+    tokens_out = getattr(usage, "completion_tokens", None) or getattr(usage, "output_tokens", None)
+    record.input_tokens = (record.input_tokens or 0) + (tokens_in or 0)
+    record.output_tokens = (record.output_tokens or 0) + (tokens_out or 0)
+    record.cache_read_tokens += cache_read
+    record.cache_write_tokens += cache_write
+
+
+def record_recall() -> None:
+    """Count a structured-output re-send against the call in progress."""
+    record = _active_call.get()
+    if record is not None:
+        record.recalls += 1
+
+
+def _mark_first_byte() -> None:
+    record = _active_call.get()
+    if record is not None and record.ttfb_ms is None and record._attempt_started:
+        record.ttfb_ms = round((time.monotonic() - record._attempt_started) * 1000, 1)
+
+
+async def httpx_response_hook(response: Any) -> None:
+    """httpx event hook: response headers arrived, i.e. time to first byte."""
+    _mark_first_byte()
+
+
+def observe_response(response: Any) -> None:
+    """Sync httpx event hook counterpart of httpx_response_hook."""
+    _mark_first_byte()
+
+
+# =============================================================================
+# PRICES
+# =============================================================================
+
+@lru_cache(maxsize=1)
+def model_prices() -> dict[str, tuple[float, float]]:
+    """(input, output) $ per million tokens by model id, from the vision benchmark configs."""
+    try:
+        from report_learning.benchmark_vision import MODELS
+    except ImportError as e:
+        logger.debug("Benchmark model prices unavailable (%s); using route prices", e)
+        return {}
+    return {m.model_id: (m.price_in, m.price_out) for m in MODELS}
+
+
+def estimate_cost(
+    model: str,
+    input_tokens: Optional[int],
+    output_tokens: Optional[int],
+    fallback_price: Optional[tuple[float, float]] = None,
+    cache_read_tokens: int = 0,
+    cache_write_tokens: int = 0,
+    provider: Optional[str] = None,
+) -> Optional[float]:
+    """
+    Estimated $ cost of a call, or None when its usage or the model's price is unknown.
+    
+    Args:
+        input_tokens: All input tokens, cached ones included
+        cache_read_tokens: Input tokens served from the prompt cache
+        cache_write_tokens: Input tokens written to the prompt cache
+        provider: Selects the cache multipliers (CACHE_PRICE_FACTORS)
+    """
+    price = model_prices().get(model, fallback_price)
+    if price is None or input_tokens is None:
+        return None
+    read_factor, write_factor = CACHE_PRICE_FACTORS.get(provider or "", (1.0, 1.0))
+    uncached = max(0, input_tokens - cache_read_tokens - cache_write_tokens)
+    input_cost = price[0] * (uncached + cache_read_tokens * read_factor + cache_write_tokens * write_factor)
+    return round((input_cost + (output_tokens or 0) * price[1]) / 1_000_000, 6)
+
+
+# =============================================================================
+# RECORDS AND HISTOGRAMS
+# =============================================================================
+
+@dataclass
+class LLMCallRecord:
+    """One LLM call (all its retries and structured-output re-calls included)."""
+
+    provider: str
+    model: str
+    stage: str
+    job_id: str
+    pages: list[int]
+    image_bytes: int
+    prompt_chars: int
+    at: float = field(default_factory=time.time)
+    attempts: int = 0
+    recalls: int = 0              # structured-output re-sends (see structured_output)
+    input_tokens: Optional[int] = None   # cached ones included
+    output_tokens: Optional[int] = None
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+    queued_ms: Optional[float] = None
+    ttfb_ms: Optional[float] = None
+    latency_ms: Optional[float] = None
+    cost_usd: Optional[float] = None
+    ok: bool = False
+    error: Optional[str] = None
+
+    def __post_init__(self):
+        self._started = time.monotonic()
+        self._attempt_started = 0.0
+
+    @property
+    def retries(self) -> int:
+        return max(0, self.attempts - 1)
+
+    @contextlib.contextmanager
+    def attempt(self) -> Iterator[None]:
+        """Wrap one attempt: times the queue wait and first byte, and makes this the active call."""
+        now = time.monotonic()
+        if self.queued_ms is None:
+            self.queued_ms = round((now - self._started) * 1000, 1)
+        self.attempts += 1
+        self._attempt_started, self.ttfb_ms = now, None
+        token = _active_call.set(self)
+        try:
+            yield
+        finally:
+            _active_call.reset(token)
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "retries": self.retries}
+
+
+class Histogram:
+    """Fixed-bucket histogram: count per upper bound (last bucket is +Inf), plus count and mean."""
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        i = next((i for i, bound in enumerate(self.bounds) if value <= bound), len(self.bounds))
+        self.counts[i] += 1
+        self.count += 1
+        self.total += value
+
+    def snapshot(self) -> dict:
+        labels = [f"le_{b}" for b in self.bounds] + ["inf"]
+        return {
+            "buckets": dict(zip(labels, self.counts)),
+            "count": self.count,
+            "mean": round(self.total / self.count, 1) if self.count else None,
+        }
+
+
+_HISTOGRAMS = {
+    "latency_ms": LATENCY_BUCKETS_MS,
+    "ttfb_ms": LATENCY_BUCKETS_MS,
+    "queued_ms": LATENCY_BUCKETS_MS,
+    "input_tokens": TOKEN_BUCKETS,
+    "output_tokens": TOKEN_BUCKETS,
+    "image_bytes": BYTE_BUCKETS,
+}
+
+
+def _quantile(values: list[float], q: float) -> Optional[float]:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+
+def _summarize(records: list[LLMCallRecord]) -> dict:
+    latencies = [r.latency_ms for r in records if r.latency_ms is not None]
+    costs = [r.cost_usd for r in records if r.cost_usd is not None]
+    input_tokens = sum(r.input_tokens or 0 for r in records)
+    cache_read = sum(r.cache_read_tokens for r in records)
+    return {
+        "calls": len(records),
+        "failed": sum(not r.ok for r in records),
+        "retries": sum(r.retries for r in records),
+        "recalls": sum(r.recalls for r in records),
+        "input_tokens": input_tokens,
+        "output_tokens": sum(r.output_tokens or 0 for r in records),
+        "cache_read_tokens": cache_read,
+        "cache_write_tokens": sum(r.cache_write_tokens for r in records),
+        "cache_hit_rate": round(cache_read / input_tokens, 3) if input_tokens else None,
+        "image_bytes": sum(r.image_bytes for r in records),
+        "prompt_chars": sum(r.prompt_chars for r in records),
+        "cost_usd": round(sum(costs), 6) if costs else None,
+        "latency_ms_p50": _quantile(latencies, 0.5),
+        "latency_ms_p95": _quantile(latencies, 0.95),
+        "latency_ms_total": round(sum(latencies), 1),
+        "queued_ms_total": round(sum(r.queued_ms or 0 for r in records), 1),
+    }
+
+
+class CallTelemetry:
+    """Process-wide store of LLM call records: recent calls, per-job records, histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._recent: deque[LLMCallRecord] = deque(maxlen=RECENT_CALLS)
+        self._jobs: "OrderedDict[str, list[LLMCallRecord]]" = OrderedDict()
+        self._histograms: dict[tuple[str, str, str], Histogram] = {}
+        self._totals: Counter = Counter()
+
+    def start(self, provider: str, model: str, image_bytes: int, prompt_chars: int) -> LLMCallRecord:
+        """A record for a call about to be queued, tagged with the current job, stage and pages."""
+        from .rate_limiter import current_job
+
+        stage, pages = _call_scope.get()
+        return LLMCallRecord(provider, model, stage, current_job(), list(pages), image_bytes, prompt_chars)
+
+    def finish(
+        self,
+        record: LLMCallRecord,
+        error: Optional[BaseException] = None,
+        fallback_price: Optional[tuple[float, float]] = None,
+    ) -> None:
+        """Close a record (success unless ``error``), price it and store it."""
+        record.latency_ms = round((time.monotonic() - record._started) * 1000, 1)
+        record.ok = error is None
+        if error is not None:
+            record.error = f"{type(error).__name__}: {error}"[:300]
+        record.cost_usd = estimate_cost(
+            record.model, record.input_tokens, record.output_tokens, fallback_price,
+            record.cache_read_tokens, record.cache_write_tokens, record.provider,
+        )
+        logger.info("llm_call %s", json.dumps(record.to_dict(), default=str))
+
+        with self._lock:
+            self._recent.append(record)
+            self._jobs.setdefault(record.job_id, []).append(record)
+            self._jobs.move_to_end(record.job_id)
+            while len(self._jobs) > MAX_JOBS:
+                self._jobs.popitem(last=False)
+            self._totals["calls"] += 1
+            self._totals["failed"] += not record.ok
+            self._totals["retries"] += record.retries
+            self._totals["cache_read_tokens"] += record.cache_read_tokens
+            self._totals["cache_write_tokens"] += record.cache_write_tokens
+            for metric, bounds in _HISTOGRAMS.items():
+                value = getattr(record, metric)
+                if value is None:
+                    continue
+                key = (metric, record.stage, record.provider)
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(bounds)
+                histogram.observe(value)
+
+    def job_summary(self, job_id: str, since: Optional[float] = None) -> dict:
+        """
+        Totals for one job, overall and per stage and provider.
+
+        Args:
+            since: Only count calls started at or after this time.time()
+                (one run of a job that is retried)
+        """
+        with self._lock:
+            records = [r for r in self._jobs.get(job_id, ()) if since is None or r.at >= since]
+        by_stage: dict[str, list[LLMCallRecord]] = {}
+        by_provider: dict[str, list[LLMCallRecord]] = {}
+        for r in records:
+            by_stage.setdefault(r.stage, []).append(r)
+            by_provider.setdefault(r.provider, []).append(r)
+        return {
+            **_summarize(records),
+            "by_stage": {stage: _summarize(rs) for stage, rs in by_stage.items()},
+            "by_provider": {provider: _summarize(rs) for provider, rs in by_provider.items()},
+        }
+
+    def job_calls(self, job_id: str) -> list[dict]:
+        """Every recorded call of one job, oldest first."""
+        with self._lock:
+            return [r.to_dict() for r in self._jobs.get(job_id, ())]
+
+    def snapshot(self) -> dict:
+        """Process totals, a summary of recent calls and the histograms by metric, stage and provider."""
+        with self._lock:
+            recent = list(self._recent)
+            histograms: dict[str, dict[str, dict[str, dict]]] = {}
+            for (metric, stage, provider), histogram in sorted(self._histograms.items()):
+                histograms.setdefault(metric, {}).setdefault(stage, {})[provider] = histogram.snapshot()
+            totals = dict(self._totals)
+        return {"totals": totals, "recent": _summarize(recent), "histograms": histograms}
+
+
+@lru_cache(maxsize=1)
+def get_call_telemetry() -> CallTelemetry:
+    """Process-wide LLM call telemetry."""
+    return CallTelemetry()
@@ -9,21 +9,30 @@ Replaces the v2 six-stage pipeline with two stages:
 
 Primary: Qwen2.5-VL-32B via Together AI / Fireworks AI (OpenAI-compatible).
 Fallback: Claude Sonnet 4 via Anthropic API.
-Uses instructor for structured outputs with both providers.
+Uses instructor for structured outputs with both providers; output that
+fails validation is repaired locally (structured_output) before any re-call.
+
+The engine is natively asyncio (AsyncOpenAI / AsyncAnthropic). The sync
+extract_page / extract_form API runs the async path on the shared engine
+loop, and every LLM call goes through one process-wide concurrency limit.
 """
 
-import base64
+import asyncio
 import json
 import logging
-import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from typing import Optional, Callable, Any
+from typing import Optional, Callable, Any, Awaitable, Union
 from datetime import datetime
 
-import anthropic
-import instructor
-from openai import OpenAI
+try:
+    from instructor.core import InstructorError
+except ImportError:  # older instructor
+    from instructor.exceptions import InstructorError
 from pydantic import BaseModel, Field, model_validator
 from rich.console import Console
 
@@ -32,6 +41,32 @@ from ..models.annotations import (
     FormExtractionResult,
 )
 from ..models import FormSchema, PageSchema
+from .async_engine import Stage, get_llm_limiter, run_stages, run_sync
+from .response_cache import ResponseCache, get_response_cache, make_cache_key
+from .template_store import get_template_store
+from .image_encoding import EncodingProfile, encode_image, get_encoding_profile
+from .prompt_schema import compact_page_schema, page_schema_without
+from .verification_policy import VerificationDecision, VerificationPolicy
+from .field_regions import FieldRegionAtlas, crop_field_regions, get_field_regions
+from .mark_detector import YES_NO_OPTIONS, MarkDetector, MarkReading
+from .blank_page import BlankPageDetector, InkScore
+from .page_hash import (
+    SEED,
+    DuplicateMatch,
+    DuplicatePageDetector,
+    DuplicatePageIndex,
+    PageHash,
+    compute_page_hash,
+    page_schema_key,
+)
+from .page_batching import PageBatchPolicy, batch_candidate
+from .provider_router import ProviderRouter, get_provider_router
+from .hedging import HedgePolicy, get_hedge_policy
+from .rate_limiter import estimate_request_tokens, get_provider_scheduler, job_scope
+from .job_control import JobAborted, current_job_control, default_deadline, get_job_registry
+from .llm_clients import get_instructor_client
+from .call_telemetry import call_scope, get_call_telemetry, record_recall, record_usage
+from .structured_output import StructuredOutputError, completion_payload, repair_structured_output
 
 console = Console()
 logger = logging.getLogger(__name__)
@@ -48,9 +83,9 @@ def extract_circled_selection_options(page_schema: Optional[PageSchema]) -> dict
         return options_map
     
     def process_fields(fields):
-        for field in fields:
-            if field.field_type == "circled_selection" and field.options:
-                options_map[field.field_id] = field.options
+        for schema_field in fields:
+            if schema_field.field_type == "circled_selection" and schema_field.options:
+                options_map[schema_field.field_id] = schema_field.options
     
     process_fields(page_schema.standalone_fields)
     
@@ -69,13 +104,13 @@ def extract_date_fields(page_schema: Optional[PageSchema]) -> list[dict]:
         return date_fields
     
     def process_fields(fields):
-        for field in fields:
-            if field.field_type == "date":
+        for schema_field in fields:
+            if schema_field.field_type == "date":
                 date_fields.append({
-                    "field_id": field.field_id,
-                    "field_label": field.field_label,
-                    "expected_format": field.expected_format or "MM/DD/YYYY",
-                    "position": field.position_description,
+                    "field_id": schema_field.field_id,
+                    "field_label": schema_field.field_label,
+                    "expected_format": schema_field.expected_format or "MM/DD/YYYY",
+                    "position": schema_field.position_description,
                 })
     
     process_fields(page_schema.standalone_fields)
@@ -85,6 +120,31 @@ def extract_date_fields(page_schema: Optional[PageSchema]) -> list[dict]:
     return date_fields
 
 
+def get_schema_field_ids(page_schema: Optional[PageSchema], include_tables: bool = False) -> list[str]:
+    """All field IDs of a page schema (and table IDs if asked), in schema order."""
+    field_ids = []
+    if not page_schema:
+        return field_ids
+    
+    def process_fields(fields):
+        field_ids.extend(field.field_id for field in fields)
+    
+    def process_tables(tables):
+        if include_tables:
+            field_ids.extend(table.table_id for table in tables)
+    
+    process_fields(page_schema.standalone_fields)
+    process_tables(page_schema.standalone_tables)
+    for section in page_schema.sections:
+        process_fields(section.fields)
+        process_tables(section.tables)
+        for subsection in section.subsections:
+            process_fields(subsection.fields)
+            process_tables(subsection.tables)
+    
+    return field_ids
+
+
 def get_schema_summary(page_schema: Optional[PageSchema]) -> str:
     """Generate a concise schema summary for prompts."""
     if not page_schema:
@@ -98,9 +158,9 @@ def get_schema_summary(page_schema: Optional[PageSchema]) -> str:
     
     def count_fields(fields):
         nonlocal field_count
-        for field in fields:
+        for schema_field in fields:
             field_count += 1
-            ft = field.field_type
+            ft = schema_field.field_type
             field_types[ft] = field_types.get(ft, 0) + 1
     
     count_fields(page_schema.standalone_fields)
@@ -119,12 +179,12 @@ def get_field_by_role(page_schema: Optional[PageSchema], role_keywords: list[str
         return None
     
     def search_fields(fields):
-        for field in fields:
-            label_lower = field.field_label.lower()
-            id_lower = field.field_id.lower()
+        for schema_field in fields:
+            label_lower = schema_field.field_label.lower()
+            id_lower = schema_field.field_id.lower()
             for keyword in role_keywords:
                 if keyword in label_lower or keyword in id_lower:
-                    return field.field_id
+                    return schema_field.field_id
         return None
     
     result = search_fields(page_schema.standalone_fields)
@@ -139,6 +199,46 @@ def get_field_by_role(page_schema: Optional[PageSchema], role_keywords: list[str
     return None
 
 
+def format_circled_options(options_map: dict[str, list[str]]) -> str:
+    """Format circled selection options for prompt."""
+    if not options_map:
+        return "No circled selection fields on this page."
+    
+    lines = []
+    for field_id, options in options_map.items():
+        lines.append(f"\nField: {field_id}")
+        lines.append(f"Valid options: {', '.join(options)}")
+    return "\n".join(lines)
+
+
+def format_date_fields(date_fields: list[dict]) -> str:
+    """Format date field info for prompt."""
+    if not date_fields:
+        return "No date fields identified in schema."
+    
+    lines = []
+    for df in date_fields:
+        lines.append(f"- {df['field_id']} ({df['field_label']}): format {df['expected_format']}")
+    return "\n".join(lines)
+
+
+def get_field_roles(page_schema: Optional[PageSchema]) -> str:
+    """Generate field role awareness text."""
+    if not page_schema:
+        return ""
+    
+    roles = []
+    nurse_field = get_field_by_role(page_schema, ['nurse'])
+    patient_field = get_field_by_role(page_schema, ['patient', 'name'])
+    
+    if nurse_field:
+        roles.append(f"- '{nurse_field}' is for the NURSE name (not the patient)")
+    if patient_field and patient_field != nurse_field:
+        roles.append(f"- '{patient_field}' is for the PATIENT name")
+    
+    return "\n".join(roles) if roles else "No special field roles identified."
+
+
 # =============================================================================
 # STAGE RESPONSE MODELS (v3 - Two-Stage: Unified Extract + Self-Verify)
 # =============================================================================
@@ -184,6 +284,18 @@ class UnifiedFieldExtraction(BaseModel):
     page_legibility: str = Field(description="'excellent', 'good', 'fair', or 'poor'")
 
 
+class BatchedFieldExtraction(BaseModel):
+    """Stage 1 for several pages in one request."""
+
+    class PageFields(BaseModel):
+        page_number: int = Field(description="Page number from the image labels")
+        fields: list[UnifiedFieldExtraction.ExtractedField] = Field(description="This page's extracted fields, mapped to its own schema")
+        unmapped_text: list[str] = Field(default_factory=list, description="Handwriting on this page that does not map to any schema field")
+        page_legibility: str = Field(description="'excellent', 'good', 'fair', or 'poor'")
+
+    pages: list[PageFields] = Field(description="One entry per page in the request")
+
+
 class VerificationResult(BaseModel):
     """Stage 2: Self-verification against original image."""
 
@@ -206,18 +318,33 @@ class VerificationResult(BaseModel):
     overall_confidence: float = Field(ge=0.0, le=1.0, description="Verifier's overall assessment of extraction quality")
 
 
+# Paid re-sends of a request whose output could not be repaired locally.
+STRUCTURED_OUTPUT_RECALLS = 2
+
+# Anthropic prompt-cache breakpoint (5 minute TTL, refreshed on every hit).
+PROMPT_CACHE_CONTROL = {"type": "ephemeral"}
+
+# Required keys a truncated Stage 1 output loses first (they follow the
+# fields list); a repaired response gets these so its fields can be used.
+TRUNCATION_DEFAULTS: dict[type[BaseModel], dict[str, Any]] = {
+    UnifiedFieldExtraction: {"page_legibility": "fair"},
+    BatchedFieldExtraction.PageFields: {"page_legibility": "fair"},
+}
+
+
 # =============================================================================
 # PROMPTS (v3 - Two-Stage)
 # =============================================================================
 
-UNIFIED_EXTRACTION_PROMPT = """You are an expert medical form extraction system. Extract ALL field values from this filled form page in a SINGLE pass.
+_STAGE1_INTRO = """You are an expert medical form extraction system. Extract ALL field values from the filled form page in a SINGLE pass.
 
-{dual_image_instruction}
+"""
 
-SCHEMA CONTEXT:
+# Schema-derived context for one page; shared by the single-page and batched prompts.
+_STAGE1_PAGE_CONTEXT = """SCHEMA CONTEXT:
 {schema_summary}
 
-PAGE SCHEMA (defines ALL valid fields and their types):
+PAGE SCHEMA (compact JSON; defines ALL valid fields and their types. An "options" value like "@opts1" refers to the shared list in "option_sets"):
 {schema_json}
 
 CIRCLED SELECTION FIELDS - VALID OPTIONS ONLY:
@@ -229,7 +356,9 @@ DATE FIELDS ON THIS PAGE:
 FIELD ROLE AWARENESS:
 {field_roles}
 
-=== EXTRACTION RULES ===
+"""
+
+_STAGE1_RULES = """=== EXTRACTION RULES ===
 
 1. **field_id**: Use the EXACT field_id from the schema. Do NOT invent field IDs.
 
@@ -281,6 +410,18 @@ FIELD ROLE AWARENESS:
 
 BE CONSERVATIVE with circles: only report a circle if you clearly see a hand-drawn circle around the text. Do NOT guess or infer circles."""
 
+# Identical for every page, so it leads the request (see StagePrompt).
+STAGE1_INSTRUCTIONS = _STAGE1_INTRO + _STAGE1_RULES
+
+BATCH_EXTRACTION_INTRO = """You are an expert medical form extraction system. This request covers {page_count} pages of the same filled form. Extract ALL field values from EVERY page in a SINGLE pass.
+
+Each image is preceded by a label naming its page number and whether it is the page's BLANK template or the FILLED page.
+{dual_image_instruction}
+
+Return one entry in "pages" per page, with the page_number from its labels. Each page has its OWN schema below: use only that page's field_ids for that page, and never move a value seen on one page to another page.
+
+"""
+
 
 VERIFICATION_PROMPT = """You are verifying a medical form extraction. You will see the FILLED form image and the extraction results from a first pass.
 
@@ -340,6 +481,227 @@ SCHEMA CONTEXT:
 Return ONLY actual corrections where you are confident. Do NOT repeat correct values. Do NOT second-guess plausible handwriting reads."""
 
 
+CROP_VERIFICATION_PROMPT = """You are verifying a medical form extraction. Instead of the full page you see several small CROPS of the FILLED form. Each crop is preceded by a label "[field_id]" naming the ONE field it covers; a crop may include parts of neighbouring rows — ignore them.
+
+EXTRACTION RESULTS TO VERIFY (one entry per crop):
+{extraction_json}
+
+SCHEMA CONTEXT:
+{schema_summary}
+
+=== RULES ===
+1. For each field, look ONLY at its own crop.
+2. yes_no fields: the answer is the printed YES or NO with a hand-drawn circle, mark or line on it, on the field's own row. If neither word has hand-drawn ink, the value MUST be null. value="YES" ↔ is_checked=true, value="NO" ↔ is_checked=false.
+3. circled_selection / checkbox_multi fields: only options with a hand-drawn circle or pen mark are selected. Printed option text alone is NEVER a selection. A circle with a line/slash/X through it is CANCELLED.
+4. Numeric scale tables (e.g. 0 1 2 3 columns): printed column numbers are not selections; only a number with a visible pen mark is.
+5. Dates and text: only correct when you are HIGHLY CONFIDENT the extraction is wrong. Do not change plausible handwriting reads.
+6. Only correct a field if you are NEAR-CERTAIN (>90% confident) the first pass is wrong. Leave newly_found_fields empty.
+
+Set overall_confidence for the listed fields: 0.9+ if few or no corrections, 0.7-0.89 minor, 0.5-0.69 significant, below 0.5 largely wrong.
+
+Return ONLY actual corrections where you are confident. Do NOT repeat correct values."""
+
+
+# =============================================================================
+# PER-PAGE PROMPT CONTEXT
+# =============================================================================
+
+# Per-call values left as literal placeholders in the pre-rendered templates.
+_CURRENT_YEAR_SLOT = "{current_year}"
+_EXTRACTION_JSON_SLOT = "{extraction_json}"
+
+_PROMPT_CONTEXT_MEMO_KEY = "page_prompt_context"
+
+
+@dataclass(frozen=True)
+class StagePrompt:
+    """
+    A prompt split by how often its parts change, for provider prefix caching.
+    
+    Requests are laid out instructions → page context → blank template →
+    filled page(s) → request, so everything before the filled page is
+    byte-identical for every patient's copy of a page and a provider's
+    prompt cache can serve it. On the Claude path the instructions, page
+    context and blank template end in cache_control breakpoints; the
+    OpenAI-compatible providers cache matching prefixes automatically.
+    
+    Prompts built as one string (batched Stage 1, Stage 2) are a StagePrompt
+    with only ``request`` set, which sends them as before: images, then text.
+    """
+    
+    instructions: str = ""   # same for every page: role and rules (system prompt)
+    page_context: str = ""   # same for every copy of a page: its schema sections
+    request: str = ""        # per call; sent after the images
+    
+    @property
+    def text(self) -> str:
+        """The whole prompt as one string (cache keys, token estimates)."""
+        return "\n\n".join(part for part in (self.instructions, self.page_context, self.request) if part)
+
+
+@dataclass(frozen=True)
+class PagePromptContext:
+    """
+    Schema-derived prompt fragments for one page, built once per loaded schema.
+    
+    Everything that depends only on the page schema (summary, compact schema
+    JSON, circled options, date fields, field roles) is rendered into the
+    Stage 1 page section and Stage 2 templates up front, so building a
+    prompt per call is plain substitution of the per-call values.
+    """
+    
+    schema_summary: str
+    schema_json: str
+    circled_options_text: str
+    date_fields_info: str
+    field_roles: str
+    page_section: str
+    stage2_template: str
+    stage2_crops_template: str
+    
+    @classmethod
+    def build(cls, page_schema: Optional[PageSchema]) -> "PagePromptContext":
+        schema_summary = get_schema_summary(page_schema)
+        schema_json = compact_page_schema(page_schema).text if page_schema else '{"note": "No schema provided"}'
+        circled_options_text = format_circled_options(extract_circled_selection_options(page_schema))
+        date_fields_info = format_date_fields(extract_date_fields(page_schema))
+        field_roles = get_field_roles(page_schema)
+        return cls(
+            schema_summary=schema_summary,
+            schema_json=schema_json,
+            circled_options_text=circled_options_text,
+            date_fields_info=date_fields_info,
+            field_roles=field_roles,
+            page_section=_STAGE1_PAGE_CONTEXT.format(
+                schema_summary=schema_summary,
+                schema_json=schema_json,
+                circled_options_text=circled_options_text,
+                date_fields_info=date_fields_info,
+                field_roles=field_roles,
+            ),
+            stage2_template=VERIFICATION_PROMPT.format(
+                extraction_json=_EXTRACTION_JSON_SLOT,
+                schema_summary=schema_summary,
+            ),
+            stage2_crops_template=CROP_VERIFICATION_PROMPT.format(
+                extraction_json=_EXTRACTION_JSON_SLOT,
+                schema_summary=schema_summary,
+            ),
+        )
+    
+    def render_stage1(self, dual_image_instruction: str, current_year: int) -> StagePrompt:
+        """Stage 1 prompt for this page; the image instruction is the only per-call part."""
+        return StagePrompt(
+            instructions=STAGE1_INSTRUCTIONS.replace(_CURRENT_YEAR_SLOT, str(current_year), 1),
+            page_context=self.page_section,
+            request=dual_image_instruction,
+        )
+    
+    def render_stage2(self, extraction_json: str) -> str:
+        """Stage 2 prompt for this page."""
+        return self.stage2_template.replace(_EXTRACTION_JSON_SLOT, extraction_json, 1)
+    
+    def render_stage2_crops(self, extraction_json: str) -> str:
+        """Stage 2 prompt for crop verification of some of this page's fields."""
+        return self.stage2_crops_template.replace(_EXTRACTION_JSON_SLOT, extraction_json, 1)
+
+
+def render_batch_stage1(
+    pages: list[tuple[int, PagePromptContext]],
+    dual_image_instruction: str,
+    current_year: int,
+) -> str:
+    """Stage 1 prompt for several pages: shared intro and rules, one schema section per page."""
+    sections = "".join(
+        f"=== PAGE {page_number} ===\n{context.page_section}" for page_number, context in pages
+    )
+    return (
+        BATCH_EXTRACTION_INTRO.format(page_count=len(pages), dual_image_instruction=dual_image_instruction)
+        + sections
+        + _STAGE1_RULES.replace(_CURRENT_YEAR_SLOT, str(current_year), 1)
+    )
+
+
+_NO_SCHEMA_CONTEXT: Optional[PagePromptContext] = None
+
+
+def get_page_prompt_context(page_schema: Optional[PageSchema]) -> PagePromptContext:
+    """
+    Return the prompt context for a page, building it on first use.
+    
+    The context is memoized on the PageSchema instance, so it lives exactly
+    as long as the loaded FormSchema that owns the page.
+    """
+    global _NO_SCHEMA_CONTEXT
+    if page_schema is None:
+        if _NO_SCHEMA_CONTEXT is None:
+            _NO_SCHEMA_CONTEXT = PagePromptContext.build(None)
+        return _NO_SCHEMA_CONTEXT
+    
+    memo = page_schema._prompt_memo
+    context = memo.get(_PROMPT_CONTEXT_MEMO_KEY)
+    if context is None:
+        context = PagePromptContext.build(page_schema)
+        memo[_PROMPT_CONTEXT_MEMO_KEY] = context
+    return context
+
+
+def _failed_page(page_number: int) -> PageExtractionResult:
+    """Placeholder result for a page whose extraction raised."""
+    return PageExtractionResult(
+        page_number=page_number,
+        overall_confidence=0.0,
+        items_needing_review=1,
+        review_reasons=[f"Page {page_number} extraction failed"],
+    )
+
+
+def _extraction_from_result(result: PageExtractionResult) -> UnifiedFieldExtraction:
+    """A page result's field values back as a Stage 1 extraction."""
+    known = UnifiedFieldExtraction.ExtractedField.model_fields
+    fields = [
+        UnifiedFieldExtraction.ExtractedField(
+            field_id=field_id, **{k: v for k, v in values.items() if k in known and k != "field_id"},
+        )
+        for field_id, values in result.field_values.items()
+        if isinstance(values, dict)
+    ]
+    return UnifiedFieldExtraction(fields=fields, page_legibility="good")
+
+
+@dataclass
+class _PreparedPage:
+    """A page ready for Stage 1: images encoded, local reads done."""
+    
+    page_number: int
+    image_path: Path
+    blank_image_path: Optional[Path]
+    page_schema: Optional[PageSchema]   # without the fields already read locally
+    extraction_mode: str
+    force_provider: Optional[str]
+    image_data: str
+    media_type: str
+    blank_data: Optional[str] = None
+    blank_type: Optional[str] = None
+    prefilled: list[UnifiedFieldExtraction.ExtractedField] = field(default_factory=list)
+    prompt_context: Optional[PagePromptContext] = None
+    result: Optional[PageExtractionResult] = None   # set when the page needs no VLM call
+    page_hash: Optional[PageHash] = None
+    schema_key: Optional[str] = None
+    seed: Optional[UnifiedFieldExtraction] = None   # an earlier extraction standing in for Stage 1
+
+
+@dataclass(frozen=True)
+class ProviderRoute:
+    """One configured provider: its instructor client, model and price."""
+
+    name: str                    # "together", "fireworks" or "claude"
+    client: Any
+    model: str
+    price: tuple[float, float]   # (input, output) $ per million tokens
+    timeout: Optional[float] = None   # the client's request timeout (seconds)
+
+
 # =============================================================================
 # EXTRACTION PIPELINE CLASS
 # =============================================================================
@@ -351,187 +713,320 @@ class ExtractionPipeline:
     Stage 1: Unified Visual Extraction (replaces old stages 1-5)
     Stage 2: Self-Verification (replaces old stage 6, now image-aware)
     
-    Priority: Together AI (Llama 4 Maverick) > Fireworks AI > Claude
+    Priority: Together AI (Llama 4 Maverick) > Fireworks AI > Claude. Each
+    call falls through to the next provider when one fails; the provider
+    router can reorder them (cost, latency) and skips providers whose
+    circuit breaker is open.
     """
     
     TOGETHER_MODEL = "meta-llama/Llama-4-Maverick-17B-128E-Instruct-FP8"
-    TOGETHER_BASE_URL = "https://api.together.xyz/v1"
     FIREWORKS_MODEL = "accounts/fireworks/models/qwen2p5-vl-32b-instruct"
-    FIREWORKS_BASE_URL = "https://api.fireworks.ai/inference/v1"
     CLAUDE_MODEL = "claude-sonnet-4-20250514"
+    # (input, output) $ per million tokens, for the "cost" routing policy
+    TOGETHER_PRICE = (0.27, 0.85)
+    FIREWORKS_PRICE = (0.90, 0.90)
+    CLAUDE_PRICE = (3.00, 15.00)
     
     def __init__(
         self,
         api_key: Optional[str] = None,
         model: Optional[str] = None,
         max_tokens: int = 32000,
+        response_cache: Optional[ResponseCache] = None,
+        bypass_cache: bool = False,
+        verification_policy: Optional[VerificationPolicy] = None,
+        mark_detector: Optional[MarkDetector] = None,
+        blank_page_detector: Optional[BlankPageDetector] = None,
+        batch_policy: Optional[PageBatchPolicy] = None,
+        provider_router: Optional[ProviderRouter] = None,
+        hedge_policy: Optional[HedgePolicy] = None,
+        prompt_caching: Optional[bool] = None,
+        duplicate_page_detector: Optional[DuplicatePageDetector] = None,
     ):
-        import os
+        """
+        Args:
+            response_cache: VLM response cache; defaults to the process-wide one
+            bypass_cache: If True, always call the provider and don't store results
+            verification_policy: When to run Stage 2 and on which fields;
+                defaults to VerificationPolicy.from_env()
+            mark_detector: Local reader for circled/marked selection fields;
+                defaults to MarkDetector.from_env()
+            blank_page_detector: Skips the VLM on pages with no new ink;
+                defaults to BlankPageDetector.from_env()
+            batch_policy: When extract_form packs several pages into one
+                Stage 1 request; defaults to PageBatchPolicy.from_env()
+            provider_router: Orders providers per call and trips breakers on
+                failing ones; defaults to the process-wide router
+            hedge_policy: When a slow Stage 1 call is duplicated to the next
+                provider; defaults to the process-wide policy (EXTRACTION_HEDGE)
+            prompt_caching: Mark the static prompt prefix for Claude's prompt
+                cache; defaults to PROMPT_CACHING (on)
+            duplicate_page_detector: Reuses earlier extractions of pages seen
+                before (with an index passed to extract_form); defaults to
+                DuplicatePageDetector.from_env()
+        """
         self.max_tokens = max_tokens
-        self._used_fallback = False
-        
-        together_key = os.getenv("TOGETHER_API_KEY")
-        fireworks_key = os.getenv("FIREWORKS_API_KEY")
-        
-        if together_key:
-            self.qwen_client = instructor.from_openai(
-                OpenAI(
-                    api_key=together_key,
-                    base_url=self.TOGETHER_BASE_URL,
-                    timeout=300.0,
-                ),
-                mode=instructor.Mode.JSON,
-            )
-            self.qwen_model = model or self.TOGETHER_MODEL
-        elif fireworks_key:
-            self.qwen_client = instructor.from_openai(
-                OpenAI(
-                    api_key=fireworks_key,
-                    base_url=self.FIREWORKS_BASE_URL,
-                    timeout=300.0,
-                ),
-                mode=instructor.Mode.JSON,
-            )
-            self.qwen_model = model or self.FIREWORKS_MODEL
-        else:
-            self.qwen_client = None
-            self.qwen_model = None
+        self.response_cache = response_cache or get_response_cache()
+        self.bypass_cache = bypass_cache
+        self.verification_policy = verification_policy or VerificationPolicy.from_env()
+        # Stage 2 decision counters: pages per action, fields sent vs. extracted.
+        self.verification_stats: Counter[str] = Counter()
+        self.mark_detector = mark_detector or MarkDetector.from_env()
+        # Selection fields examined by the mark detector vs. pre-filled from it.
+        self.mark_stats: Counter[str] = Counter()
+        self.blank_page_detector = blank_page_detector or BlankPageDetector.from_env()
+        # Pages answered without the VLM because they had no new ink, and the calls that saved.
+        self.blank_page_stats: Counter[str] = Counter()
+        self.duplicate_page_detector = duplicate_page_detector or DuplicatePageDetector.from_env()
+        # Pages answered from an earlier extraction (reused or seeded), and the calls that saved.
+        self.duplicate_page_stats: Counter[str] = Counter()
+        self.batch_policy = batch_policy or PageBatchPolicy.from_env()
+        # Batched Stage 1 requests made and the pages they answered.
+        self.batch_stats: Counter[str] = Counter()
+        # Invalid structured outputs repaired locally vs. re-sent to the provider.
+        self.output_stats: Counter[str] = Counter()
+        if prompt_caching is None:
+            prompt_caching = os.getenv("PROMPT_CACHING", "true").lower() in ("1", "true", "yes")
+        self.prompt_caching = prompt_caching
         
-        anthropic_key = api_key or os.getenv("ANTHROPIC_API_KEY")
-        if anthropic_key:
-            self.claude_client = instructor.from_anthropic(
-                anthropic.Anthropic(api_key=anthropic_key, timeout=600.0)
-            )
-            self.claude_model = self.CLAUDE_MODEL
-        else:
-            self.claude_client = None
-            self.claude_model = None
+        # Every configured provider is a route; the router picks among them per call.
+        # `model` overrides the model of the first OpenAI-compatible route.
+        # Clients come from the process-wide registry (shared keep-alive pools,
+        # SDK retries off: the provider schedulers retry with shared backoff).
+        timeouts = {"together": 300.0, "fireworks": 300.0, "claude": 600.0}
+        clients = {
+            "together": get_instructor_client("together", async_client=True, timeout=timeouts["together"]),
+            "fireworks": get_instructor_client("fireworks", async_client=True, timeout=timeouts["fireworks"]),
+            "claude": get_instructor_client("claude", async_client=True, api_key=api_key, timeout=timeouts["claude"]),
+        }
+        models = {
+            "together": model or self.TOGETHER_MODEL,
+            "fireworks": self.FIREWORKS_MODEL if clients["together"] else model or self.FIREWORKS_MODEL,
+            "claude": self.CLAUDE_MODEL,
+        }
+        prices = {"together": self.TOGETHER_PRICE, "fireworks": self.FIREWORKS_PRICE, "claude": self.CLAUDE_PRICE}
+        self.routes: dict[str, ProviderRoute] = {
+            name: ProviderRoute(name, client, models[name], prices[name], timeouts[name])
+            for name, client in clients.items() if client is not None
+        }
         
-        if not self.qwen_client and not self.claude_client:
+        if not self.routes:
             raise ValueError(
                 "No LLM configured. Set TOGETHER_API_KEY, FIREWORKS_API_KEY, or ANTHROPIC_API_KEY."
             )
         
-        providers = []
-        if self.qwen_client:
-            provider_name = "Together AI" if together_key else "Fireworks"
-            providers.append(f"Qwen VL via {provider_name} (primary)")
-        if self.claude_client:
-            providers.append(f"Claude ({'fallback' if self.qwen_client else 'primary'})")
-        console.print(f"[bold]LLM providers: {', '.join(providers)}[/bold]")
+        primary = next((r for r in self.routes.values() if r.name != "claude"), None)
+        self.qwen_client = primary.client if primary else None
+        self.qwen_model = primary.model if primary else None
+        self.claude_client = self.routes["claude"].client if "claude" in self.routes else None
+        self.claude_model = self.CLAUDE_MODEL if self.claude_client else None
+        
+        self.router = provider_router or get_provider_router()
+        self.hedge_policy = hedge_policy or get_hedge_policy()
+        for route in self.routes.values():
+            self.router.register(route.name, route.model, sum(route.price))
+        # Calls answered per model (live or cached), for model_used.
+        self.models_used: Counter[str] = Counter()
+        
+        names = {"together": "Together AI", "fireworks": "Fireworks", "claude": "Claude"}
+        console.print(
+            f"[bold]LLM providers: {' > '.join(names[n] for n in self.routes)} "
+            f"(routing: {self.router.policy}, automatic fallback)[/bold]"
+        )
     
     @property
     def model_used(self) -> str:
-        if self._used_fallback or not self.qwen_client:
-            return self.claude_model or "unknown"
-        return self.qwen_model or "unknown"
+        if self.models_used:
+            return self.models_used.most_common(1)[0][0]
+        return self.qwen_model or self.claude_model or "unknown"
+    
+    def _encoding_profile(self, force_provider: Optional[str] = None) -> EncodingProfile:
+        """Image encoding budget of the provider a page's Stage 1 goes to first."""
+        return get_encoding_profile(force_provider or self._stage_providers()[0])
     
     def _load_image(
         self, 
         image_path: Path,
-        max_dimension: int = 2048,
-        jpeg_quality: int = 95,
+        profile: Optional[EncodingProfile] = None,
     ) -> tuple[str, str]:
-        """Load image, compress it, and return as base64."""
-        try:
-            from PIL import Image
-            import io
-            
-            with Image.open(image_path) as img:
-                if img.mode in ('RGBA', 'P'):
-                    img = img.convert('RGB')
-                
-                width, height = img.size
-                if width > max_dimension or height > max_dimension:
-                    ratio = min(max_dimension / width, max_dimension / height)
-                    new_size = (int(width * ratio), int(height * ratio))
-                    img = img.resize(new_size, Image.Resampling.LANCZOS)
-                
-                buffer = io.BytesIO()
-                img.save(buffer, format='JPEG', quality=jpeg_quality, optimize=True)
-                buffer.seek(0)
-                
-                image_data = base64.standard_b64encode(buffer.read()).decode("utf-8")
-                return image_data, "image/jpeg"
-                
-        except ImportError:
-            suffix = image_path.suffix.lower()
-            media_types = {
-                ".png": "image/png",
-                ".jpg": "image/jpeg", 
-                ".jpeg": "image/jpeg",
-            }
-            media_type = media_types.get(suffix, "image/png")
-            
-            with open(image_path, "rb") as f:
-                image_data = base64.standard_b64encode(f.read()).decode("utf-8")
-            
-            return image_data, media_type
+        """Encode a page image within the provider's byte/token budget; returns (base64, media type)."""
+        encoded = encode_image(image_path, profile or self._encoding_profile())
+        logger.debug(
+            "%s: %dx%d %s q%s, %d KB", image_path.name, encoded.width, encoded.height,
+            encoded.format, encoded.quality, encoded.size_bytes // 1024,
+        )
+        return encoded.data, encoded.media_type
     
-    def _call_qwen(
+    async def _acall_qwen(
         self,
-        prompt: str,
+        prompt: StagePrompt,
         image_data: str,
         media_type: str,
         response_model: type[BaseModel],
         blank_image_data: Optional[str] = None,
         blank_media_type: Optional[str] = None,
+        labelled_images: Optional[list[tuple[str, str, str]]] = None,
+        route: Optional[ProviderRoute] = None,
+        timeout: Optional[float] = None,
     ) -> BaseModel:
-        """Call Qwen VL via OpenAI-compatible endpoint (Together AI or Fireworks)."""
+        """Call Qwen VL via OpenAI-compatible endpoint (Together AI or Fireworks).
+        
+        Static parts go first (system instructions, page context, blank
+        template) so the provider's automatic prefix cache can match them.
+        """
         content = []
-        if blank_image_data:
+        if prompt.page_context:
+            content.append({"type": "text", "text": prompt.page_context})
+        if labelled_images:
+            for label, data, data_type in labelled_images:
+                content.append({"type": "text", "text": f"[{label}]"})
+                content.append({
+                    "type": "image_url",
+                    "image_url": {"url": f"data:{data_type};base64,{data}"}
+                })
+        else:
+            if blank_image_data:
+                content.append({
+                    "type": "image_url",
+                    "image_url": {"url": f"data:{blank_media_type or media_type};base64,{blank_image_data}"}
+                })
             content.append({
                 "type": "image_url",
-                "image_url": {"url": f"data:{blank_media_type or media_type};base64,{blank_image_data}"}
+                "image_url": {"url": f"data:{media_type};base64,{image_data}"}
             })
-        content.append({
-            "type": "image_url",
-            "image_url": {"url": f"data:{media_type};base64,{image_data}"}
-        })
-        content.append({"type": "text", "text": prompt})
-        
-        return self.qwen_client.chat.completions.create(
-            model=self.qwen_model,
-            max_tokens=self.max_tokens,
-            temperature=0.0,
-            messages=[{"role": "user", "content": content}],
-            response_model=response_model,
-            max_retries=2,
+        if prompt.request:
+            content.append({"type": "text", "text": prompt.request})
+        messages = [{"role": "system", "content": prompt.instructions}] if prompt.instructions else []
+        messages.append({"role": "user", "content": content})
+        
+        route = route or next(r for r in self.routes.values() if r.name != "claude")
+        return await self._acreate_structured(
+            lambda: route.client.chat.completions.create(
+                model=route.model,
+                max_tokens=self.max_tokens,
+                temperature=0.0,
+                messages=messages,
+                response_model=response_model,
+                max_retries=0,
+                **({"timeout": timeout} if timeout else {}),
+            ),
+            response_model,
+            route.name,
         )
     
-    def _call_claude(
+    async def _acall_claude(
         self,
-        prompt: str,
+        prompt: StagePrompt,
         image_data: str,
         media_type: str,
         response_model: type[BaseModel],
         blank_image_data: Optional[str] = None,
         blank_media_type: Optional[str] = None,
+        labelled_images: Optional[list[tuple[str, str, str]]] = None,
+        route: Optional[ProviderRoute] = None,
+        timeout: Optional[float] = None,
     ) -> BaseModel:
-        """Call Claude via Anthropic API (fallback)."""
+        """Call Claude via Anthropic API (fallback).
+        
+        With prompt caching on, the system instructions and the last static
+        block (blank template, else page context) carry cache_control
+        breakpoints, so repeated page types read that prefix from the cache.
+        """
+        breakpoint = {"cache_control": PROMPT_CACHE_CONTROL} if self.prompt_caching else {}
         content = []
-        if blank_image_data:
+        if prompt.page_context:
+            content.append({
+                "type": "text",
+                "text": prompt.page_context,
+                **({} if blank_image_data else breakpoint),
+            })
+        if labelled_images:
+            for label, data, data_type in labelled_images:
+                content.append({"type": "text", "text": f"[{label}]"})
+                content.append({
+                    "type": "image",
+                    "source": {"type": "base64", "media_type": data_type, "data": data}
+                })
+        else:
+            if blank_image_data:
+                content.append({
+                    "type": "image",
+                    "source": {"type": "base64", "media_type": blank_media_type or media_type, "data": blank_image_data},
+                    **breakpoint,
+                })
             content.append({
                 "type": "image",
-                "source": {"type": "base64", "media_type": blank_media_type or media_type, "data": blank_image_data}
+                "source": {"type": "base64", "media_type": media_type, "data": image_data}
             })
-        content.append({
-            "type": "image",
-            "source": {"type": "base64", "media_type": media_type, "data": image_data}
-        })
-        content.append({"type": "text", "text": prompt})
-        
-        return self.claude_client.messages.create(
-            model=self.claude_model,
-            max_tokens=self.max_tokens,
-            messages=[{"role": "user", "content": content}],
-            response_model=response_model,
-            max_retries=2,
+        if prompt.request:
+            content.append({"type": "text", "text": prompt.request})
+        system = {"system": [{"type": "text", "text": prompt.instructions, **breakpoint}]} if prompt.instructions else {}
+        
+        route = route or self.routes["claude"]
+        return await self._acreate_structured(
+            lambda: route.client.messages.create(
+                model=route.model,
+                max_tokens=self.max_tokens,
+                messages=[{"role": "user", "content": content}],
+                **system,
+                response_model=response_model,
+                max_retries=0,
+                **({"timeout": timeout} if timeout else {}),
+            ),
+            response_model,
+            route.name,
         )
     
-    def _call_llm(
+    async def _acreate_structured(
+        self,
+        create: Callable[[], Awaitable[BaseModel]],
+        response_model: type[BaseModel],
+        provider: str,
+    ) -> BaseModel:
+        """
+        Run a structured-output request, repairing invalid output locally.
+        
+        instructor makes a single attempt; a response that fails validation
+        goes through repair_structured_output (tolerant JSON parsing,
+        truncation, type coercion) and only one with nothing usable left is
+        re-sent, up to STRUCTURED_OUTPUT_RECALLS times. Repairs and re-calls
+        are counted in output_stats.
+        """
+        for recall in range(STRUCTURED_OUTPUT_RECALLS + 1):
+            if recall:
+                self.output_stats["recalls"] += 1
+                record_recall()
+            try:
+                result = await create()
+            except InstructorError as e:
+                completion = getattr(e, "last_completion", None)
+                if completion is None:
+                    raise  # an API error, not a bad response; the scheduler decides on retries
+                record_usage(completion)
+                try:
+                    result, repairs = repair_structured_output(
+                        completion_payload(completion), response_model, TRUNCATION_DEFAULTS,
+                    )
+                except StructuredOutputError as unusable:
+                    self.output_stats["unusable"] += 1
+                    if recall >= STRUCTURED_OUTPUT_RECALLS:
+                        raise unusable from e
+                    console.print(
+                        f"  [yellow]{provider}: unusable {response_model.__name__} ({unusable}); re-calling[/yellow]"
+                    )
+                    continue
+                self.output_stats["repaired"] += 1
+                if "truncated" in repairs:
+                    self.output_stats["truncated"] += 1
+                console.print(f"  [dim]{provider}: repaired {response_model.__name__} locally ({len(repairs)} fixes)[/dim]")
+                return result
+            record_usage(getattr(result, "_raw_response", None))
+            return result
+        raise AssertionError("unreachable")
+    
+    async def _acall_llm(
         self,
-        prompt: str,
+        prompt: Union[str, StagePrompt],
         image_data: str,
         media_type: str,
         response_model: type[BaseModel],
@@ -539,73 +1034,216 @@ class ExtractionPipeline:
         blank_image_data: Optional[str] = None,
         blank_media_type: Optional[str] = None,
         force_provider: Optional[str] = None,
+        labelled_images: Optional[list[tuple[str, str, str]]] = None,
+        hedge: bool = False,
     ) -> BaseModel:
-        """Call primary vision LLM. No automatic fallback to Claude.
+        """Call the vision LLM, falling back across providers.
+        
+        The provider router orders the configured providers (skipping ones
+        whose circuit breaker is open) and each failed call moves on to the
+        next; only when every provider fails is the last error raised.
+        
+        Responses are served from the content-addressed response cache when
+        an identical call (same images, prompt, model, response model) was
+        made before. Every live call is admitted by its provider's scheduler
+        and holds a slot of the process-wide LLM concurrency limit for the
+        duration of the request.
         
         Args:
-            force_provider: If "claude", bypass primary and use Claude directly.
+            prompt: The prompt; a StagePrompt is laid out for prefix caching,
+                a plain string is sent after the images
+            force_provider: Provider tried first ("claude", "together" or
+                "fireworks"); the others remain fallbacks.
+            labelled_images: (label, base64 data, media type) images sent,
+                each after its label, instead of the page images (field crops,
+                or the pages of a batched request)
+            hedge: Duplicate the call to the next provider if it runs past
+                the provider's p90 latency (see HedgePolicy)
         """
         provider_label = f" [{force_provider}]" if force_provider else ""
         console.print(f"  [dim]Running {stage_name}{provider_label}...[/dim]")
+        if isinstance(prompt, str):
+            prompt = StagePrompt(request=prompt)
         
-        call_args = (prompt, image_data, media_type, response_model, blank_image_data, blank_media_type)
+        if force_provider and force_provider not in self.routes:
+            raise RuntimeError(f"{force_provider} requested but its API key is not set")
+        order = self.router.route(list(self.routes), pinned=force_provider)
         
-        if force_provider == "claude":
-            if not self.claude_client:
-                raise RuntimeError("Claude requested but ANTHROPIC_API_KEY not set")
-            result = self._call_claude(*call_args)
-            console.print(f"  [green]{stage_name} complete (Claude)[/green]")
-            return result
+        cache = None if self.bypass_cache else self.response_cache
+        cache_keys: dict[str, str] = {}
+        if cache:
+            key_image = (
+                "\x1f".join(f"{label}:{data}" for label, data, _ in labelled_images)
+                if labelled_images else image_data
+            )
+            for name in order:
+                model_id = self.routes[name].model
+                cache_keys[name] = make_cache_key(key_image, blank_image_data, prompt.text, model_id, response_model)
+                cached = await asyncio.to_thread(cache.get, cache_keys[name], response_model)
+                if cached is not None:
+                    console.print(f"  [green]{stage_name} complete ({name}) [cache hit][/green]")
+                    self.models_used[model_id] += 1
+                    return cached
         
-        if self.qwen_client:
-            result = self._call_qwen(*call_args)
-            console.print(f"  [green]{stage_name} complete[/green]")
+        call_args = (
+            prompt, image_data, media_type, response_model, blank_image_data, blank_media_type, labelled_images,
+        )
+        last_error: Optional[Exception] = None
+        remaining = list(order)
+        while remaining:
+            name = remaining.pop(0)
+            if last_error is not None:
+                console.print(f"  [yellow]{stage_name}: falling back to {name}[/yellow]")
+            backup = (
+                remaining[0]
+                if hedge and remaining and self.hedge_policy.enabled and self.router.available(remaining[0])
+                else None
+            )
+            tried = [name]
+            try:
+                if backup:
+                    name, result = await self._ahedged_call(name, backup, call_args, stage_name, tried)
+                else:
+                    result = await self._acall_route(name, call_args)
+            except JobAborted:
+                raise
+            except Exception as e:
+                console.print(f"  [red]{stage_name} failed on {', '.join(tried)}: {e}[/red]")
+                last_error = e
+                remaining = [n for n in remaining if n not in tried]
+                continue
+            console.print(f"  [green]{stage_name} complete ({name})[/green]")
+            self.models_used[self.routes[name].model] += 1
+            
+            if cache:
+                await asyncio.to_thread(cache.put, cache_keys[name], self.routes[name].model, result)
             return result
+        raise last_error
+    
+    async def _acall_route(
+        self,
+        name: str,
+        call_args: tuple,
+        started: Optional[asyncio.Event] = None,
+    ) -> BaseModel:
+        """One live call to one provider, recorded with the router.
         
-        if self.claude_client:
-            result = self._call_claude(*call_args)
-            self._used_fallback = True
-            console.print(f"  [green]{stage_name} complete (Claude)[/green]")
-            return result
+        The provider's scheduler admits the call (fairly across jobs, within
+        its concurrency and rate limits) and retries rate limits and
+        transient errors; the router sees only the final outcome. Each
+        attempt first checks the job's control (cancelled or out of time
+        raises JobAborted) and caps its request timeout at the time left.
         
-        raise RuntimeError("No LLM client available")
-    
-    def _format_circled_options(self, options_map: dict[str, list[str]]) -> str:
-        """Format circled selection options for prompt."""
-        if not options_map:
-            return "No circled selection fields on this page."
+        Args:
+            started: Set once the call is admitted and the request is
+                actually going out
+        """
+        route = self.routes[name]
+        prompt, image_data, blank_image_data, labelled_images = call_args[0], call_args[1], call_args[4], call_args[6]
+        images = len(labelled_images) if labelled_images else 1 + bool(blank_image_data)
+        encoded = [data for _, data, _ in labelled_images] if labelled_images else [image_data, blank_image_data or ""]
+        telemetry = get_call_telemetry()
+        record = telemetry.start(name, route.model, sum(len(d) for d in encoded) * 3 // 4, len(prompt.text))
         
-        lines = []
-        for field_id, options in options_map.items():
-            lines.append(f"\nField: {field_id}")
-            lines.append(f"Valid options: {', '.join(options)}")
-        return "\n".join(lines)
-    
-    def _format_date_fields(self, date_fields: list[dict]) -> str:
-        """Format date field info for prompt."""
-        if not date_fields:
-            return "No date fields identified in schema."
+        began = time.monotonic()
+        control = current_job_control()
         
-        lines = []
-        for df in date_fields:
-            lines.append(f"- {df['field_id']} ({df['field_label']}): format {df['expected_format']}")
-        return "\n".join(lines)
+        async def attempt() -> BaseModel:
+            nonlocal began
+            timeout = control.call_timeout(route.timeout) if control else None
+            # Runs inside the provider's slot, so calls queued on a busy provider don't hold global slots.
+            async with get_llm_limiter():
+                if started is not None:
+                    started.set()
+                # Router latency is the last attempt's, not time spent queued or backing off.
+                began = time.monotonic()
+                with record.attempt():
+                    if name == "claude":
+                        return await self._acall_claude(*call_args, route=route, timeout=timeout)
+                    return await self._acall_qwen(*call_args, route=route, timeout=timeout)
+        
+        self.router.acquire(name)
+        try:
+            result = await get_provider_scheduler(name).call(attempt, estimate_request_tokens(prompt.text, images))
+        except (asyncio.CancelledError, JobAborted) as e:
+            # The job stopped, not the provider: nothing for the breaker.
+            self.router.release(name)
+            telemetry.finish(record, e, route.price)
+            raise
+        except Exception as e:
+            self.router.record_failure(name, time.monotonic() - began, e)
+            telemetry.finish(record, e, route.price)
+            raise
+        self.router.record_success(name, time.monotonic() - began)
+        telemetry.finish(record, fallback_price=route.price)
+        return result
     
-    def _get_field_roles(self, page_schema: Optional[PageSchema]) -> str:
-        """Generate field role awareness text."""
-        if not page_schema:
-            return ""
+    async def _ahedged_call(
+        self,
+        primary: str,
+        backup: str,
+        call_args: tuple,
+        stage_name: str,
+        tried: list[str],
+    ) -> tuple[str, BaseModel]:
+        """
+        Call ``primary``, hedging to ``backup`` if it runs past its p90 latency.
+        
+        The first successful result wins and the other request is cancelled.
+        If the hedge budget is spent, or the primary has too little latency
+        history, this is a plain call. ``tried`` gets every provider that was
+        called, so a caller falling back after a failure can skip them.
         
-        roles = []
-        nurse_field = get_field_by_role(page_schema, ['nurse'])
-        patient_field = get_field_by_role(page_schema, ['patient', 'name'])
+        Returns:
+            (provider that answered, result)
+        """
+        policy = self.hedge_policy
+        policy.start()
+        started = asyncio.Event()
+        primary_task = asyncio.ensure_future(self._acall_route(primary, call_args, started))
+        # The hedge clock starts when the request goes out, not while it queues for a slot.
+        started_wait = asyncio.ensure_future(started.wait())
+        await asyncio.wait({primary_task, started_wait}, return_when=asyncio.FIRST_COMPLETED)
+        started_wait.cancel()
+        began = time.monotonic()
         
-        if nurse_field:
-            roles.append(f"- '{nurse_field}' is for the NURSE name (not the patient)")
-        if patient_field and patient_field != nurse_field:
-            roles.append(f"- '{patient_field}' is for the PATIENT name")
+        delay = policy.delay(self.router, primary)
+        if delay is not None and not primary_task.done():
+            await asyncio.wait({primary_task}, timeout=delay)
+        if primary_task.done() or delay is None or not policy.try_hedge():
+            try:
+                result = await primary_task
+            finally:
+                elapsed = time.monotonic() - began
+                policy.record(elapsed, elapsed)
+            return primary, result
         
-        return "\n".join(roles) if roles else "No special field roles identified."
+        console.print(f"  [yellow]{stage_name}: {primary} past {delay:.1f}s, hedging to {backup}[/yellow]")
+        tried.append(backup)
+        hedge_task = asyncio.ensure_future(self._acall_route(backup, call_args))
+        tasks = {primary_task: primary, hedge_task: backup}
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    elapsed = time.monotonic() - began
+                    hedge_won = task is hedge_task
+                    primary_elapsed = None if hedge_won and not primary_task.done() else elapsed
+                    policy.record(elapsed, primary_elapsed, hedge_won)
+                    if hedge_won:
+                        console.print(f"  [green]{stage_name}: hedge on {backup} won after {elapsed:.1f}s[/green]")
+                    return tasks[task], task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+        elapsed = time.monotonic() - began
+        policy.record(elapsed, elapsed)
+        raise error
     
     # =========================================================================
     # TWO-STAGE EXTRACTION
@@ -619,6 +1257,25 @@ class ExtractionPipeline:
         blank_image_path: Optional[Path] = None,
         extraction_mode: str = "differential",
         force_provider: Optional[str] = None,
+    ) -> PageExtractionResult:
+        """Sync wrapper around aextract_page (runs on the shared engine loop)."""
+        return run_sync(self.aextract_page(
+            image_path,
+            page_number,
+            page_schema,
+            blank_image_path=blank_image_path,
+            extraction_mode=extraction_mode,
+            force_provider=force_provider,
+        ))
+
+    async def aextract_page(
+        self,
+        image_path: Path,
+        page_number: int,
+        page_schema: Optional[PageSchema] = None,
+        blank_image_path: Optional[Path] = None,
+        extraction_mode: str = "differential",
+        force_provider: Optional[str] = None,
     ) -> PageExtractionResult:
         """Extract all data from a single page using the two-stage pipeline.
         
@@ -633,31 +1290,100 @@ class ExtractionPipeline:
             extraction_mode: "differential" (handwritten only) or "full_page" (all text)
             force_provider: If "claude", force Claude for both stages
         """
+        page = await self._aprepare_page(
+            image_path, page_number, page_schema, blank_image_path, extraction_mode, force_provider,
+        )
+        if page.result is not None:
+            return page.result
+        
+        try:
+            extraction = await self._astage1(page)
+        except Exception as e:
+            return self._stage1_failed(page_number, e)
+        return await self._afinish_page(page, extraction)
+    
+    async def _aprepare_page(
+        self,
+        image_path: Path,
+        page_number: int,
+        page_schema: Optional[PageSchema],
+        blank_image_path: Optional[Path],
+        extraction_mode: str,
+        force_provider: Optional[str],
+        duplicate_index: Optional[DuplicatePageIndex] = None,
+    ) -> _PreparedPage:
+        """Everything before Stage 1: encode images, skip blank and duplicate pages, read marks locally."""
         mode_label = "full-page OCR" if extraction_mode == "full_page" else "differential"
         console.print(f"\n[bold cyan]Processing Page {page_number} ({mode_label})[/bold cyan]")
         
-        image_data, media_type = self._load_image(image_path)
+        # PIL work is CPU-bound; keep it off the event loop.
+        profile = self._encoding_profile(force_provider)
+        image_data, media_type = await asyncio.to_thread(self._load_image, image_path, profile)
+        page = _PreparedPage(
+            page_number=page_number,
+            image_path=image_path,
+            blank_image_path=blank_image_path,
+            page_schema=page_schema,
+            extraction_mode=extraction_mode,
+            force_provider=force_provider,
+            image_data=image_data,
+            media_type=media_type,
+        )
         
-        blank_data, blank_type = None, None
         if extraction_mode != "full_page" and blank_image_path and blank_image_path.exists():
-            blank_data, blank_type = self._load_image(blank_image_path)
-            console.print(f"  [dim]Using blank template for comparison[/dim]")
+            # Blank templates are encoded once per process (and persisted on disk).
+            page.blank_data, page.blank_type = await asyncio.to_thread(
+                get_template_store().get, blank_image_path, profile,
+            )
+            console.print("  [dim]Using blank template for comparison[/dim]")
         
-        current_year = datetime.now().year
-        schema_summary = get_schema_summary(page_schema)
-        circled_options = extract_circled_selection_options(page_schema)
-        date_fields = extract_date_fields(page_schema)
-        field_roles = self._get_field_roles(page_schema)
+        # Skipped conditional pages carry no new ink; don't pay the VLM to say so.
+        if page.blank_data and self.blank_page_detector.enabled:
+            ink = await self._ascore_blank_page(page_number, image_path, blank_image_path)
+            if ink is not None and ink.blank:
+                page.result = self._blank_page_result(page_number, page_schema, blank_image_path, ink)
+                return page
+        
+        # Re-exported or re-uploaded pages were extracted before; reuse that result.
+        if duplicate_index is not None and self.duplicate_page_detector.enabled:
+            match = await self._afind_duplicate(page, duplicate_index)
+            if match is not None and self.duplicate_page_detector.mode == SEED:
+                page.seed = self._seed_extraction(page_number, blank_image_path, match)
+                page.prompt_context = get_page_prompt_context(page_schema)
+                return page
+            if match is not None:
+                page.result = self._reused_page_result(page_number, blank_image_path, match)
+                return page
         
+        # Selection fields the local mark detector reads with certainty are
+        # pre-filled and left out of the VLM schema.
+        if page.blank_data and page_schema is not None and self.mark_detector.enabled:
+            page.prefilled = await self._adetect_marks(page_number, image_path, blank_image_path, page_schema)
+            if page.prefilled:
+                page.page_schema = page_schema_without(page_schema, {f.field_id for f in page.prefilled})
+        
+        page.prompt_context = get_page_prompt_context(page.page_schema)
+        return page
+    
+    def _dual_image_instruction(self, extraction_mode: str, has_blank: bool, batched: bool = False) -> str:
         if extraction_mode == "full_page":
-            dual_image_instruction = (
+            return (
                 "Extract ALL visible text on this page — both PRINTED labels/form fields "
                 "AND handwritten entries.\nThis is an administrative or legal page where "
                 "printed text IS important data.\nCapture every field label and its value, "
                 "whether printed or handwritten."
             )
-        elif blank_data:
-            dual_image_instruction = (
+        if has_blank and batched:
+            return (
+                "Each page has a BLANK template image (the form unfilled) followed by its FILLED image "
+                "(the handwritten content to extract).\n\n"
+                "TASK: For each page, identify ONLY what is DIFFERENT between its blank and filled images.\n"
+                "- Handwriting that appears in the filled page but not the blank\n"
+                "- Circles/marks that appear in the filled page but not the blank\n"
+                "- Do NOT report printed text that appears in both images"
+            )
+        if has_blank:
+            return (
                 "IMAGE 1 (first image): BLANK template form — shows what the form looks like unfilled\n"
                 "IMAGE 2 (second image): FILLED form — contains handwritten content to extract\n\n"
                 "TASK: Identify ONLY what is DIFFERENT between the blank and filled form.\n"
@@ -665,72 +1391,192 @@ class ExtractionPipeline:
                 "- Circles/marks that appear in the filled form but not the blank\n"
                 "- Do NOT report printed text that appears in both images"
             )
-        else:
-            dual_image_instruction = "Analyzing a single filled form image. Focus on handwritten content and marks only."
+        if batched:
+            return "Each page is a single filled form image. Focus on handwritten content and marks only."
+        return "Analyzing a single filled form image. Focus on handwritten content and marks only."
+    
+    async def _astage1(self, page: _PreparedPage) -> UnifiedFieldExtraction:
+        """Stage 1 for one page (raises on failure)."""
+        dual_image_instruction = self._dual_image_instruction(page.extraction_mode, bool(page.blank_data))
+        stage1_prompt = page.prompt_context.render_stage1(dual_image_instruction, datetime.now().year)
+        with call_scope("stage1", [page.page_number]):
+            return await self._acall_llm(
+                stage1_prompt,
+                page.image_data,
+                page.media_type,
+                UnifiedFieldExtraction,
+                "Stage 1: Unified Visual Extraction",
+                blank_image_data=page.blank_data,
+                blank_media_type=page.blank_type,
+                force_provider=page.force_provider,
+                hedge=True,
+            )
+    
+    async def _astage1_batch(self, pages: list[_PreparedPage]) -> list[Any]:
+        """
+        Stage 1 for several pages in one request, split back per page.
         
-        schema_json = page_schema.model_dump_json(indent=2) if page_schema else '{"note": "No schema provided"}'
+        Fields are assigned to the page whose schema owns their field_id,
+        whatever page entry the model put them under. Pages missing from the
+        response, or the whole batch if the request fails, fall back to
+        single-page Stage 1.
         
-        # === STAGE 1: Unified Visual Extraction ===
-        stage1_prompt = UNIFIED_EXTRACTION_PROMPT.format(
-            dual_image_instruction=dual_image_instruction,
-            schema_summary=schema_summary,
-            schema_json=schema_json,
-            circled_options_text=self._format_circled_options(circled_options),
-            date_fields_info=self._format_date_fields(date_fields),
-            field_roles=field_roles,
-            current_year=current_year,
+        Returns:
+            Per page, its UnifiedFieldExtraction or the exception it failed with
+        """
+        first = pages[0]
+        dual_image_instruction = self._dual_image_instruction(first.extraction_mode, bool(first.blank_data), batched=True)
+        prompt = render_batch_stage1(
+            [(p.page_number, p.prompt_context) for p in pages], dual_image_instruction, datetime.now().year,
         )
+        images: list[tuple[str, str, str]] = []
+        for p in pages:
+            if p.blank_data:
+                images.append((f"Page {p.page_number} — BLANK template", p.blank_data, p.blank_type or p.media_type))
+            images.append((f"Page {p.page_number} — FILLED", p.image_data, p.media_type))
+        page_list = ", ".join(str(p.page_number) for p in pages)
         
         try:
-            extraction = self._call_llm(
-                stage1_prompt,
-                image_data,
-                media_type,
-                UnifiedFieldExtraction,
-                "Stage 1: Unified Visual Extraction",
-                blank_image_data=blank_data,
-                blank_media_type=blank_type,
-                force_provider=force_provider,
-            )
+            with call_scope("stage1_batch", [p.page_number for p in pages]):
+                batched = await self._acall_llm(
+                    prompt,
+                    "",
+                    first.media_type,
+                    BatchedFieldExtraction,
+                    f"Stage 1: Batched Extraction (pages {page_list})",
+                    force_provider=first.force_provider,
+                    labelled_images=images,
+                    hedge=True,
+                )
+        except JobAborted:
+            raise
         except Exception as e:
-            console.print(f"[red]Stage 1 failed for page {page_number}: {e}[/red]")
-            return PageExtractionResult(
-                page_number=page_number,
-                overall_confidence=0.0,
-                items_needing_review=1,
-                review_reasons=[f"Extraction failed: {e}"],
+            console.print(f"[yellow]Batched Stage 1 failed for pages {page_list}: {e}; extracting them one by one[/yellow]")
+            return list(await asyncio.gather(*(self._astage1(p) for p in pages), return_exceptions=True))
+        
+        by_number = {p.page_number: i for i, p in enumerate(pages)}
+        owner = {
+            fid: i for i, p in enumerate(pages)
+            for fid in get_schema_field_ids(p.page_schema, include_tables=True)
+        }
+        extractions: list[Optional[UnifiedFieldExtraction]] = [None] * len(pages)
+        for entry in batched.pages:
+            i = by_number.get(entry.page_number)
+            if i is not None and extractions[i] is None:
+                extractions[i] = UnifiedFieldExtraction(
+                    fields=[], unmapped_text=entry.unmapped_text, page_legibility=entry.page_legibility,
+                )
+        for entry in batched.pages:
+            for f in entry.fields:
+                i = owner.get(f.field_id, by_number.get(entry.page_number))
+                if i is None:
+                    continue
+                if extractions[i] is None:
+                    # Fields filed under another page's entry still answer their own page.
+                    extractions[i] = UnifiedFieldExtraction(fields=[], page_legibility=entry.page_legibility)
+                extractions[i].fields.append(f)
+        
+        missing = [i for i, e in enumerate(extractions) if e is None]
+        self.batch_stats["requests"] += 1
+        self.batch_stats["pages_batched"] += len(pages) - len(missing)
+        if missing:
+            console.print(
+                f"[yellow]Batched Stage 1 returned no entry for page(s) "
+                f"{', '.join(str(pages[i].page_number) for i in missing)}; extracting them alone[/yellow]"
             )
+            retries = await asyncio.gather(*(self._astage1(pages[i]) for i in missing), return_exceptions=True)
+            for i, outcome in zip(missing, retries):
+                extractions[i] = outcome
+        return extractions
+    
+    def _stage1_failed(self, page_number: int, error: BaseException) -> PageExtractionResult:
+        console.print(f"[red]Stage 1 failed for page {page_number}: {error}[/red]")
+        return PageExtractionResult(
+            page_number=page_number,
+            overall_confidence=0.0,
+            items_needing_review=1,
+            review_reasons=[f"Extraction failed: {error}"],
+        )
+    
+    def _drop_unknown_fields(self, page: _PreparedPage, extraction: UnifiedFieldExtraction) -> None:
+        """Remove fields whose field_id is not in the page schema; their text goes to unmapped_text."""
+        known = set(get_schema_field_ids(page.page_schema, include_tables=True))
+        if not known:
+            return
+        known.update(f.field_id for f in page.prefilled)
+        unknown = [f for f in extraction.fields if f.field_id not in known]
+        if not unknown:
+            return
+        extraction.fields = [f for f in extraction.fields if f.field_id in known]
+        extraction.unmapped_text.extend(f"{f.field_id}: {f.value}" for f in unknown if f.value)
+        self.output_stats["unknown_fields_dropped"] += len(unknown)
+        logger.info(
+            "Page %d: dropped %d field(s) not in the schema: %s",
+            page.page_number, len(unknown), ", ".join(f.field_id for f in unknown[:10]),
+        )
+    
+    async def _afinish_page(self, page: _PreparedPage, extraction: UnifiedFieldExtraction) -> PageExtractionResult:
+        """Everything after Stage 1: merge local reads, Stage 2, build the page result."""
+        page_number, image_path, blank_image_path = page.page_number, page.image_path, page.blank_image_path
+        image_data, media_type = page.image_data, page.media_type
+        prompt_context, force_provider = page.prompt_context, page.force_provider
+        
+        self._drop_unknown_fields(page, extraction)
+        if page.prefilled:
+            local_ids = {f.field_id for f in page.prefilled}
+            extraction.fields = [f for f in extraction.fields if f.field_id not in local_ids] + page.prefilled
         
         # === STAGE 2: Cross-Model Verification ===
         # Use Claude for verification when available to get an independent second opinion.
         # Same-model verification has identical blind spots; cross-model catches more.
-        extraction_json = json.dumps(
-            [f.model_dump() for f in extraction.fields],
-            indent=2,
-        )
-        
-        stage2_prompt = VERIFICATION_PROMPT.format(
-            extraction_json=extraction_json,
-            schema_summary=schema_summary,
-        )
+        # The policy skips clean pages and narrows the rest to the fields worth re-checking.
+        decision = self.verification_policy.decide(extraction.fields, extraction.page_legibility)
+        if page.seed is not None and decision.skipped:
+            # A seed is an earlier page's result; only Stage 2 looks at this image.
+            decision = VerificationDecision(
+                "full", [f.field_id for f in extraction.fields], len(extraction.fields),
+                "seeded from an earlier extraction",
+            )
+        self._record_verification_decision(page_number, decision)
         
         verify_provider = force_provider
         if verify_provider is None and self.claude_client and self.qwen_client:
             verify_provider = "claude"
         
         verification: Optional[VerificationResult] = None
-        try:
-            verification = self._call_llm(
-                stage2_prompt,
-                image_data,
-                media_type,
-                VerificationResult,
-                "Stage 2: Cross-Model Verification",
-                force_provider=verify_provider,
+        atlas = get_field_regions(blank_image_path) if not decision.skipped else None
+        if self.verification_policy.use_crops(decision, bool(atlas and atlas.covers(decision.field_ids))):
+            verification = await self._averify_crops(
+                page_number, image_path, blank_image_path, atlas, extraction, decision, prompt_context,
+                verify_provider,
             )
-        except Exception as e:
-            console.print(f"[yellow]Stage 2 (verification) failed for page {page_number}: {e}[/yellow]")
-            console.print(f"[yellow]Using unverified Stage 1 results[/yellow]")
+        elif not decision.skipped:
+            selected = set(decision.field_ids)
+            extraction_json = json.dumps(
+                [f.model_dump() for f in extraction.fields if f.field_id in selected],
+                indent=2,
+            )
+            if decision.action == "subset":
+                extraction_json = (
+                    f"(Only {len(selected)} of {decision.total_fields} extracted fields are listed: "
+                    "the low-confidence and legally significant ones. The rest are already "
+                    "confirmed — do not count or correct them.)\n" + extraction_json
+                )
+            stage2_prompt = prompt_context.render_stage2(extraction_json)
+            
+            try:
+                with call_scope("stage2", [page_number]):
+                    verification = await self._acall_llm(
+                        stage2_prompt,
+                        image_data,
+                        media_type,
+                        VerificationResult,
+                        "Stage 2: Cross-Model Verification",
+                        force_provider=verify_provider,
+                    )
+            except Exception as e:
+                console.print(f"[yellow]Stage 2 (verification) failed for page {page_number}: {e}[/yellow]")
+                console.print("[yellow]Using unverified Stage 1 results[/yellow]")
         
         # === Apply corrections ===
         if verification:
@@ -750,6 +1596,267 @@ class ExtractionPipeline:
         
         return result
     
+    async def _ascore_blank_page(
+        self,
+        page_number: int,
+        image_path: Path,
+        blank_image_path: Path,
+    ) -> Optional[InkScore]:
+        """New-ink score of a page against its blank template; None if it couldn't be computed."""
+        try:
+            ink = await asyncio.to_thread(self.blank_page_detector.score, image_path, blank_image_path)
+        except Exception as e:
+            logger.warning("Blank-page check failed for page %d: %s", page_number, e)
+            return None
+        logger.debug(
+            "Blank-page check page=%d score=%.5f threshold=%.5f over=%.5f over_threshold=%.5f alignment=%.3f blank=%s",
+            page_number, ink.score, ink.threshold, ink.over_score, ink.over_threshold, ink.alignment, ink.blank,
+        )
+        return ink
+    
+    def _stage2_calls(self, extraction: UnifiedFieldExtraction, blank_image_path: Optional[Path]) -> int:
+        """VLM calls the verification policy would spend on Stage 2 of an extraction."""
+        decision = self.verification_policy.decide(extraction.fields, extraction.page_legibility)
+        if decision.skipped:
+            return 0
+        atlas = get_field_regions(blank_image_path)
+        if self.verification_policy.use_crops(decision, bool(atlas and atlas.covers(decision.field_ids))):
+            per_request = max(1, self.verification_policy.crops_per_request)
+            return -(-len(decision.field_ids) // per_request)
+        return 1
+    
+    def _blank_page_result(
+        self,
+        page_number: int,
+        page_schema: Optional[PageSchema],
+        blank_image_path: Optional[Path],
+        ink: InkScore,
+    ) -> PageExtractionResult:
+        """All-null result for a page with no new ink, counted in blank_page_stats."""
+        confidence = self.blank_page_detector.prefill_confidence
+        extraction = UnifiedFieldExtraction(
+            fields=[
+                UnifiedFieldExtraction.ExtractedField(field_id=field_id, confidence=confidence)
+                for field_id in get_schema_field_ids(page_schema)
+            ],
+            page_legibility="excellent",
+        )
+        # Stage 1, plus whatever Stage 2 would have spent verifying it.
+        calls_saved = 1 + self._stage2_calls(extraction, blank_image_path)
+        self.blank_page_stats["pages_skipped"] += 1
+        self.blank_page_stats["calls_saved"] += calls_saved
+        
+        result = self._build_page_result(page_number, extraction, None)
+        # Set explicitly: a page with no plain fields would otherwise average to 0.
+        result.overall_confidence = confidence
+        result.items_needing_review += 1
+        result.review_reasons.append(
+            f"No handwriting detected (ink score {ink.score:.4f} < {ink.threshold:.4f}, "
+            f"over-print {ink.over_score:.4f} < {ink.over_threshold:.4f}); "
+            "page left blank without VLM extraction"
+        )
+        console.print(
+            f"[green]Page {page_number} complete: no new ink, {len(result.field_values)} fields left blank "
+            f"({calls_saved} VLM calls skipped)[/green]"
+        )
+        return result
+    
+    async def _afind_duplicate(self, page: _PreparedPage, index: DuplicatePageIndex) -> Optional[DuplicateMatch]:
+        """Hash a page (kept on it for indexing) and look for an earlier extraction of it."""
+        try:
+            page.page_hash = await asyncio.to_thread(compute_page_hash, page.image_path)
+            page.schema_key = page_schema_key(page.page_schema, page.extraction_mode)
+            match = await asyncio.to_thread(index.find, page.page_hash, page.schema_key, self.duplicate_page_detector)
+        except Exception as e:
+            logger.warning("Duplicate-page lookup failed for page %d: %s", page.page_number, e)
+            return None
+        if match is not None:
+            logger.info(
+                "Page %d duplicates page %d of job %s (dHash %d, pHash %d bits apart)",
+                page.page_number, match.page_number, match.job_id[:8], match.dhash_distance, match.phash_distance,
+            )
+        return match
+    
+    async def _aindex_page(self, page: _PreparedPage, index: DuplicatePageIndex) -> None:
+        """Index an extracted page so later copies of it can reuse its result."""
+        try:
+            await asyncio.to_thread(index.add, page.page_number, page.page_hash, page.schema_key)
+        except Exception as e:
+            logger.warning("Failed to index page %d hashes: %s", page.page_number, e)
+    
+    def _reused_page_result(
+        self,
+        page_number: int,
+        blank_image_path: Optional[Path],
+        match: DuplicateMatch,
+    ) -> PageExtractionResult:
+        """An earlier extraction of the same page, counted in duplicate_page_stats."""
+        calls_saved = 1 + self._stage2_calls(_extraction_from_result(match.result), blank_image_path)
+        self.duplicate_page_stats["pages_reused"] += 1
+        self.duplicate_page_stats["calls_saved"] += calls_saved
+        
+        result = match.result.model_copy(update={"page_number": page_number}, deep=True)
+        result.review_reasons.append(
+            f"Duplicate of page {match.page_number} of job {match.job_id} "
+            f"(hash distance {match.dhash_distance}/{match.phash_distance}); earlier extraction reused"
+        )
+        console.print(
+            f"[green]Page {page_number} complete: duplicate of an earlier page, "
+            f"{len(result.field_values)} fields reused ({calls_saved} VLM calls skipped)[/green]"
+        )
+        return result
+    
+    def _seed_extraction(
+        self,
+        page_number: int,
+        blank_image_path: Optional[Path],
+        match: DuplicateMatch,
+    ) -> UnifiedFieldExtraction:
+        """An earlier extraction of the same page as this page's Stage 1 output, for Stage 2 to verify."""
+        extraction = _extraction_from_result(match.result)
+        # Stage 1 is saved, but Stage 2 runs even where the policy would skip it.
+        self.duplicate_page_stats["pages_seeded"] += 1
+        self.duplicate_page_stats["calls_saved"] += 1 if self._stage2_calls(extraction, blank_image_path) else 0
+        console.print(
+            f"  [dim]Page {page_number}: duplicate of an earlier page, "
+            f"verifying its {len(extraction.fields)} fields instead of re-extracting[/dim]"
+        )
+        return extraction
+    
+    async def _adetect_marks(
+        self,
+        page_number: int,
+        image_path: Path,
+        blank_image_path: Path,
+        page_schema: PageSchema,
+    ) -> list[UnifiedFieldExtraction.ExtractedField]:
+        """Read selection fields locally; returns the fields read with certainty."""
+        atlas = get_field_regions(blank_image_path)
+        if atlas is None:
+            return []
+        try:
+            readings = await asyncio.to_thread(
+                self.mark_detector.detect, image_path, blank_image_path, page_schema, atlas,
+            )
+        except Exception as e:
+            logger.warning("Mark detection failed for page %d: %s", page_number, e)
+            return []
+        
+        prefilled = [self._field_from_marks(r) for r in readings.values() if r.certain]
+        self.mark_stats["fields_examined"] += len(readings)
+        self.mark_stats["fields_prefilled"] += len(prefilled)
+        for reading in readings.values():
+            logger.debug(
+                "Marks page=%d field=%s certain=%s selected=%s reason=%s scores=%s",
+                page_number, reading.field_id, reading.certain, reading.selected, reading.reason, reading.scores,
+            )
+        if readings:
+            console.print(
+                f"  [dim]Marks read locally for {len(prefilled)}/{len(readings)} selection fields[/dim]"
+            )
+        return prefilled
+    
+    def _field_from_marks(self, reading: MarkReading) -> UnifiedFieldExtraction.ExtractedField:
+        """Stage 1 field for a certain mark-detector reading."""
+        if reading.selected:
+            confidence = self.mark_detector.prefill_confidence
+        else:
+            confidence = self.mark_detector.unanswered_confidence
+        if reading.field_type in YES_NO_OPTIONS:
+            choice = reading.selected[0] if reading.selected else None
+            return UnifiedFieldExtraction.ExtractedField(
+                field_id=reading.field_id,
+                value=choice,
+                is_checked={"YES": True, "NO": False}.get(choice),
+                confidence=confidence,
+            )
+        return UnifiedFieldExtraction.ExtractedField(
+            field_id=reading.field_id,
+            circled_options=list(reading.selected),
+            confidence=confidence,
+        )
+    
+    async def _averify_crops(
+        self,
+        page_number: int,
+        image_path: Path,
+        blank_image_path: Path,
+        atlas: FieldRegionAtlas,
+        extraction: UnifiedFieldExtraction,
+        decision: VerificationDecision,
+        prompt_context: PagePromptContext,
+        verify_provider: Optional[str],
+    ) -> Optional[VerificationResult]:
+        """Verify a field subset from labelled crops, several crops per request.
+        
+        Requests run concurrently; their results are merged into one
+        VerificationResult (None if every request failed).
+        """
+        crops = await asyncio.to_thread(
+            crop_field_regions, image_path, atlas, decision.field_ids, blank_image_path=blank_image_path,
+        )
+        fields_by_id = {f.field_id: f for f in extraction.fields}
+        per_request = max(1, self.verification_policy.crops_per_request)
+        batches = [crops[i:i + per_request] for i in range(0, len(crops), per_request)]
+        
+        crop_kb = sum(len(data) for _, data, _ in crops) * 3 // 4 // 1024
+        console.print(f"  [dim]Stage 2 from {len(crops)} crops in {len(batches)} request(s), {crop_kb} KB[/dim]")
+        
+        async def verify_batch(batch: list[tuple[str, str, str]]) -> VerificationResult:
+            extraction_json = json.dumps(
+                [fields_by_id[fid].model_dump() for fid, _, _ in batch],
+                indent=2,
+            )
+            with call_scope("stage2_crops", [page_number]):
+                return await self._acall_llm(
+                    prompt_context.render_stage2_crops(extraction_json),
+                    "",
+                    "image/jpeg",
+                    VerificationResult,
+                    "Stage 2: Crop Verification",
+                    force_provider=verify_provider,
+                    labelled_images=batch,
+                )
+        
+        outcomes = await asyncio.gather(*(verify_batch(b) for b in batches), return_exceptions=True)
+        
+        results: list[tuple[int, VerificationResult]] = []
+        for batch, outcome in zip(batches, outcomes):
+            if isinstance(outcome, asyncio.CancelledError):
+                raise outcome
+            if isinstance(outcome, BaseException):
+                console.print(f"[yellow]Stage 2 crop request failed for page {page_number}: {outcome}[/yellow]")
+                continue
+            results.append((len(batch), outcome))
+        if not results:
+            console.print("[yellow]Using unverified Stage 1 results[/yellow]")
+            return None
+        
+        weight = sum(n for n, _ in results)
+        return VerificationResult(
+            corrections=[c for _, r in results for c in r.corrections],
+            newly_found_fields=[],
+            confirmed_count=sum(r.confirmed_count for _, r in results),
+            overall_confidence=sum(n * r.overall_confidence for n, r in results) / weight,
+        )
+    
+    def _record_verification_decision(self, page_number: int, decision: VerificationDecision) -> None:
+        """Log a Stage 2 policy decision and add it to verification_stats."""
+        self.verification_stats[f"pages_{decision.action}"] += 1
+        self.verification_stats["fields_extracted"] += decision.total_fields
+        self.verification_stats["fields_verified"] += len(decision.field_ids)
+        logger.info(
+            "Verification decision page=%d action=%s fields=%d/%d reason=%s",
+            page_number, decision.action, len(decision.field_ids), decision.total_fields, decision.reason,
+        )
+        if decision.skipped:
+            console.print(f"  [dim]Stage 2 skipped ({decision.reason})[/dim]")
+        elif decision.action == "subset":
+            console.print(
+                f"  [dim]Stage 2 on {len(decision.field_ids)}/{decision.total_fields} fields "
+                f"({decision.reason})[/dim]"
+            )
+    
     def _apply_corrections(
         self,
         extraction: UnifiedFieldExtraction,
@@ -809,24 +1916,24 @@ class ExtractionPipeline:
         low_confidence_count = 0
         review_reasons: list[str] = []
         
-        for field in extraction.fields:
-            value = field.value
-            if value is None and field.is_checked is not None:
-                value = "YES" if field.is_checked else "NO"
-            elif value is None and len(field.circled_options) == 1:
+        for extracted in extraction.fields:
+            value = extracted.value
+            if value is None and extracted.is_checked is not None:
+                value = "YES" if extracted.is_checked else "NO"
+            elif value is None and len(extracted.circled_options) == 1:
                 # Single circled selection — promote the one selected option to value
-                value = field.circled_options[0]
+                value = extracted.circled_options[0]
 
-            field_values[field.field_id] = {
+            field_values[extracted.field_id] = {
                 "value": value,
-                "is_checked": field.is_checked,
-                "circled_options": field.circled_options,
-                "confidence": field.confidence,
-                "has_correction": field.has_correction,
-                "original_value": field.original_value,
-                "annotation_note": field.annotation_note,
+                "is_checked": extracted.is_checked,
+                "circled_options": extracted.circled_options,
+                "confidence": extracted.confidence,
+                "has_correction": extracted.has_correction,
+                "original_value": extracted.original_value,
+                "annotation_note": extracted.annotation_note,
             }
-            if field.confidence < 0.6:
+            if extracted.confidence < 0.6:
                 low_confidence_count += 1
         
         if verification:
@@ -862,83 +1969,339 @@ class ExtractionPipeline:
     # MULTI-PAGE FORM EXTRACTION
     # =========================================================================
 
+    def _stage_providers(self) -> tuple[str, str]:
+        """(Stage 1, Stage 2) provider of a form run without force_provider."""
+        stage1 = next(iter(self.routes))
+        stage2 = "claude" if self.claude_client else stage1
+        return stage1, stage2
+    
+    async def _aextract_pages(
+        self,
+        image_paths: list[Path],
+        page_numbers: list[int],
+        page_schemas: list[Optional[PageSchema]],
+        blank_paths: list[Optional[Path]],
+        extraction_mode: str,
+        max_workers: Optional[int],
+        batch_pages: bool,
+        page_done: Callable[[int, Any], Awaitable[None]],
+        duplicate_index: Optional[DuplicatePageIndex] = None,
+    ) -> list[Any]:
+        """
+        Run a form's pages through prepare → Stage 1 → Stage 2 worker pools.
+        
+        Each stage has its own pool, sized to its provider's concurrency
+        limit (or max_workers), and a bounded queue in front of it, so the
+        Stage 1 and Stage 2 providers are busy at the same time and a job
+        takes about as long as its slower stage. When batching, every page
+        is prepared first so the batch policy can group them; Stage 2 still
+        runs per page. ``page_done(index, outcome)`` is awaited as each page
+        finishes, in completion order. Pages seeded from a duplicate skip
+        Stage 1 (and batching) and go straight to Stage 2.
+        
+        Returns:
+            Per page, its PageExtractionResult or the exception it failed with
+        """
+        total = len(image_paths)
+        outcomes: list[Any] = [None] * total
+        stage1_provider, stage2_provider = self._stage_providers()
+        
+        def pool_size(limit: int) -> int:
+            return max(1, min(total, max_workers or limit))
+        
+        prepare_workers = pool_size(max(4, os.cpu_count() or 1))
+        stage1_workers = pool_size(get_provider_scheduler(stage1_provider).max_concurrency)
+        stage2_workers = pool_size(get_provider_scheduler(stage2_provider).max_concurrency)
+        console.print(
+            f"[dim]Worker pools: prepare {prepare_workers}, Stage 1 {stage1_workers} ({stage1_provider}), "
+            f"Stage 2 {stage2_workers} ({stage2_provider})[/dim]"
+        )
+        
+        async def prepare(idx: int) -> list[list[tuple[int, _PreparedPage]]]:
+            try:
+                page = await self._aprepare_page(
+                    image_paths[idx], page_numbers[idx], page_schemas[idx], blank_paths[idx], extraction_mode, None,
+                    duplicate_index,
+                )
+            except JobAborted:
+                raise
+            except Exception as e:
+                outcomes[idx] = e
+                await page_done(idx, e)
+                return []
+            if page.result is not None:
+                outcomes[idx] = page.result
+                await page_done(idx, page.result)
+                return []
+            return [[(idx, page)]]
+        
+        async def stage1(batch: list[tuple[int, _PreparedPage]]) -> list[tuple[int, _PreparedPage, Any]]:
+            pages = [page for _, page in batch]
+            if len(pages) > 1:
+                extractions = await self._astage1_batch(pages)
+            elif pages[0].seed is not None:
+                extractions = [pages[0].seed]
+            else:
+                extractions = await asyncio.gather(self._astage1(pages[0]), return_exceptions=True)
+            return [(idx, page, extraction) for (idx, page), extraction in zip(batch, extractions)]
+        
+        async def stage2(item: tuple[int, _PreparedPage, Any]) -> list:
+            idx, page, extraction = item
+            if isinstance(extraction, (asyncio.CancelledError, JobAborted)):
+                # The job was stopped; the page didn't fail.
+                raise extraction
+            if isinstance(extraction, BaseException):
+                outcomes[idx] = self._stage1_failed(page.page_number, extraction)
+            else:
+                try:
+                    outcomes[idx] = await self._afinish_page(page, extraction)
+                except JobAborted:
+                    raise
+                except Exception as e:
+                    outcomes[idx] = e
+            await page_done(idx, outcomes[idx])
+            extracted = isinstance(outcomes[idx], PageExtractionResult) and outcomes[idx].overall_confidence > 0
+            if duplicate_index is not None and page.page_hash is not None and page.seed is None and extracted:
+                await self._aindex_page(page, duplicate_index)
+            return []
+        
+        stage1_pool = Stage("stage1", stage1, stage1_workers)
+        stage2_pool = Stage("stage2", stage2, stage2_workers)
+        if not batch_pages:
+            await run_stages(range(total), [Stage("prepare", prepare, prepare_workers), stage1_pool, stage2_pool])
+            return outcomes
+        
+        prepared: list[list[tuple[int, _PreparedPage]]] = []
+        
+        async def collect(idx: int) -> list:
+            prepared.extend(await prepare(idx))
+            return []
+        
+        await run_stages(range(total), [Stage("prepare", collect, prepare_workers)])
+        by_index = {batch[0][0]: batch[0][1] for batch in prepared if batch[0][1].seed is None}
+        seeded = [batch for batch in prepared if batch[0][1].seed is not None]
+        candidates = []
+        for idx in sorted(by_index):
+            page = by_index[idx]
+            images = 2 if page.blank_data else 1
+            candidates.append(batch_candidate(idx, page.page_schema, images, (page.extraction_mode, images)))
+        # batch_pages=True asks for batching even when the policy is off by default.
+        policy = replace(self.batch_policy, enabled=True)
+        batches = [[(idx, by_index[idx]) for idx in batch] for batch in policy.plan(candidates)]
+        await run_stages(batches + seeded, [stage1_pool, stage2_pool])
+        return outcomes
+    
     def extract_form(
         self,
         image_paths: list[Path],
         form_schema: Optional[FormSchema] = None,
         form_name: str = "extracted_form",
-        max_workers: int = 4,
+        max_workers: Optional[int] = None,
         progress_callback: Optional[Callable[[int, int, float], None]] = None,
         blank_image_paths: Optional[list[Path]] = None,
         extraction_mode: str = "differential",
+        batch_pages: Optional[bool] = None,
+        job_id: Optional[str] = None,
+        page_callback: Optional[Callable[[PageExtractionResult], None]] = None,
+        page_numbers: Optional[list[int]] = None,
+        deadline_s: Optional[float] = None,
+        duplicate_index: Optional[DuplicatePageIndex] = None,
     ) -> FormExtractionResult:
-        """Extract data from an entire multi-page form with parallel processing."""
+        """Sync wrapper around aextract_form (runs on the shared engine loop)."""
+        return run_sync(self.aextract_form(
+            image_paths,
+            form_schema=form_schema,
+            form_name=form_name,
+            max_workers=max_workers,
+            progress_callback=progress_callback,
+            blank_image_paths=blank_image_paths,
+            extraction_mode=extraction_mode,
+            batch_pages=batch_pages,
+            job_id=job_id,
+            page_callback=page_callback,
+            page_numbers=page_numbers,
+            deadline_s=deadline_s,
+            duplicate_index=duplicate_index,
+        ))
+
+    async def aextract_form(
+        self,
+        image_paths: list[Path],
+        form_schema: Optional[FormSchema] = None,
+        form_name: str = "extracted_form",
+        max_workers: Optional[int] = None,
+        progress_callback: Optional[Callable[[int, int, float], None]] = None,
+        blank_image_paths: Optional[list[Path]] = None,
+        extraction_mode: str = "differential",
+        batch_pages: Optional[bool] = None,
+        job_id: Optional[str] = None,
+        page_callback: Optional[Callable[[PageExtractionResult], None]] = None,
+        page_numbers: Optional[list[int]] = None,
+        deadline_s: Optional[float] = None,
+        duplicate_index: Optional[DuplicatePageIndex] = None,
+    ) -> FormExtractionResult:
+        """Extract data from an entire multi-page form.
+        
+        Pages flow through separate prepare, Stage 1 and Stage 2 worker
+        pools (see _aextract_pages), each sized to its provider's
+        concurrency limit unless max_workers caps this job's pools.
+        
+        Args:
+            batch_pages: Pack short/sparse pages into shared Stage 1 requests
+                (see PageBatchPolicy); defaults to the pipeline's batch policy
+            job_id: Key this run's LLM calls are queued under, so provider
+                schedulers interleave concurrent jobs fairly; defaults to a
+                fresh key per call
+            page_callback: Called with each page's result as soon as that
+                page finishes (in completion order, off the event loop), so
+                callers can persist pages while the rest are still running.
+                A failed page is passed as its placeholder result. Errors
+                raised by the callback are logged and don't stop the job.
+            page_numbers: The form page number of each image (1-based), for
+                extracting some pages of a form (e.g. re-running failed
+                ones); page schemas and blank templates are looked up by
+                it. Defaults to 1..len(image_paths).
+            deadline_s: Seconds the job may run; defaults to
+                EXTRACTION_JOB_DEADLINE_S. Past it, or when the job is
+                cancelled (job_control.get_job_registry().cancel(job_id)),
+                pending pages and in-flight LLM calls are dropped and
+                JobDeadlineExceeded / JobCancelled is raised; pages
+                already finished have been passed to page_callback.
+            duplicate_index: Hashes of pages extracted before (see
+                page_hash); a page that duplicates one of them reuses its
+                result (or seeds Stage 2 with it), and newly extracted
+                pages are added to it. None turns duplicate detection off.
+        """
         total_pages = len(image_paths)
         console.print(f"\n[bold]Extracting form: {form_name}[/bold]")
         console.print(f"Total pages: {total_pages}")
-        console.print(f"Processing with {max_workers} parallel workers")
+        if max_workers:
+            console.print(f"Processing with up to {max_workers} concurrent pages per stage")
         
         if blank_image_paths:
-            console.print(f"[cyan]Using blank templates for differential extraction[/cyan]")
+            console.print("[cyan]Using blank templates for differential extraction[/cyan]")
         
-        page_schemas = [None] * total_pages
-        if form_schema:
-            for i in range(min(total_pages, len(form_schema.pages))):
-                page_schemas[i] = form_schema.pages[i]
+        page_numbers = page_numbers or list(range(1, total_pages + 1))
+        if len(page_numbers) != total_pages:
+            raise ValueError(f"{len(page_numbers)} page numbers for {total_pages} images")
         
+        page_schemas = [None] * total_pages
         blank_paths = [None] * total_pages
-        if blank_image_paths:
-            for i in range(min(total_pages, len(blank_image_paths))):
-                blank_paths[i] = blank_image_paths[i]
+        for i, page_number in enumerate(page_numbers):
+            if form_schema and page_number <= len(form_schema.pages):
+                page_schemas[i] = form_schema.pages[page_number - 1]
+            if blank_image_paths and page_number <= len(blank_image_paths):
+                blank_paths[i] = blank_image_paths[page_number - 1]
         
         completed_count = 0
-        lock = threading.Lock()
         
-        def process_page(args: tuple) -> tuple[int, PageExtractionResult]:
+        async def page_done(idx: int, outcome: Any) -> None:
             nonlocal completed_count
-            idx, image_path, page_schema, blank_path = args
-            
-            result = self.extract_page(
-                image_path, 
-                idx + 1, 
-                page_schema,
-                blank_image_path=blank_path,
-                extraction_mode=extraction_mode,
-            )
-            
-            with lock:
-                completed_count += 1
-                if progress_callback:
-                    percentage = round((completed_count / total_pages) * 100, 1)
-                    progress_callback(completed_count, total_pages, percentage)
-            
-            return idx, result
-        
-        args_list = [
-            (i, path, page_schemas[i], blank_paths[i])
-            for i, path in enumerate(image_paths)
-        ]
-        
-        pages = [None] * total_pages
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [executor.submit(process_page, args) for args in args_list]
-            
-            for future in as_completed(futures):
+            completed_count += 1
+            if page_callback and not isinstance(outcome, asyncio.CancelledError):
+                page = _failed_page(page_numbers[idx]) if isinstance(outcome, BaseException) else outcome
                 try:
-                    idx, result = future.result(timeout=600)
-                    pages[idx] = result
+                    await asyncio.to_thread(page_callback, page)
                 except Exception as e:
-                    console.print(f"[red]Error processing page: {e}[/red]")
-                    console.print(f"[yellow]Skipping page, continuing...[/yellow]")
+                    logger.warning("page_callback failed for page %d: %s", page_numbers[idx], e)
+            if progress_callback:
+                percentage = round((completed_count / total_pages) * 100, 1)
+                # Callbacks may do blocking I/O (DB updates) — run them off-loop.
+                await asyncio.to_thread(progress_callback, completed_count, total_pages, percentage)
+        
+        job_key = job_id or f"{form_name}-{uuid.uuid4().hex[:8]}"
+        registry = get_job_registry()
+        control = registry.open(job_key, deadline_s or default_deadline())
+        try:
+            with job_scope(job_key), control.bind():
+                outcomes = await self._aextract_pages(
+                    image_paths,
+                    page_numbers,
+                    page_schemas,
+                    blank_paths,
+                    extraction_mode,
+                    max_workers,
+                    self.batch_policy.enabled if batch_pages is None else batch_pages,
+                    page_done,
+                    duplicate_index,
+                )
+        except asyncio.CancelledError:
+            if not control.aborted:
+                raise
+            # Cancelled through the job control, not by our caller.
+            console.print(f"[yellow]Job {job_key} stopped ({control.reason}) after {completed_count}/{total_pages} pages[/yellow]")
+            raise control.error() from None
+        except JobAborted:
+            console.print(f"[yellow]Job {job_key} stopped ({control.reason}) after {completed_count}/{total_pages} pages[/yellow]")
+            raise
+        finally:
+            registry.close(job_key)
+        
+        pages: list[Optional[PageExtractionResult]] = [None] * total_pages
+        for i, outcome in enumerate(outcomes):
+            if isinstance(outcome, asyncio.CancelledError):
+                raise outcome
+            if isinstance(outcome, BaseException):
+                console.print(f"[red]Error processing page {page_numbers[i]}: {outcome}[/red]")
+                console.print("[yellow]Skipping page, continuing...[/yellow]")
+                continue
+            pages[i] = outcome
         
         for i, p in enumerate(pages):
             if p is None:
-                pages[i] = PageExtractionResult(
-                    page_number=i + 1,
-                    overall_confidence=0.0,
-                    items_needing_review=1,
-                    review_reasons=[f"Page {i + 1} extraction failed"],
-                )
+                pages[i] = _failed_page(page_numbers[i])
+        
+        stats = self.verification_stats
+        if stats:
+            console.print(
+                f"[dim]Stage 2: {stats['pages_full']} full, {stats['pages_subset']} subset, "
+                f"{stats['pages_skip']} skipped; {stats['fields_verified']}/{stats['fields_extracted']} "
+                f"fields sent to verifier[/dim]"
+            )
+        if self.mark_stats:
+            console.print(
+                f"[dim]Marks: {self.mark_stats['fields_prefilled']}/{self.mark_stats['fields_examined']} "
+                f"selection fields read locally[/dim]"
+            )
+        if self.blank_page_stats:
+            console.print(
+                f"[dim]Blank pages: {self.blank_page_stats['pages_skipped']} skipped, "
+                f"{self.blank_page_stats['calls_saved']} VLM calls saved[/dim]"
+            )
+        if self.duplicate_page_stats:
+            console.print(
+                f"[dim]Duplicate pages: {self.duplicate_page_stats['pages_reused']} reused, "
+                f"{self.duplicate_page_stats['pages_seeded']} seeded into Stage 2, "
+                f"{self.duplicate_page_stats['calls_saved']} VLM calls saved[/dim]"
+            )
+        hedging = self.hedge_policy.snapshot()
+        if hedging["hedged"]:
+            console.print(
+                f"[dim]Hedging (process): {hedging['hedged']}/{hedging['calls']} Stage 1 calls hedged, "
+                f"{hedging['hedge_wins']} won; p99 {hedging['latency']['p99_ms']} ms seen vs "
+                f"{hedging['primary_latency']['p99_ms']} ms for finished primaries "
+                f"(+{hedging['primaries_cancelled']} slower, cancelled)[/dim]"
+            )
+        if self.batch_stats:
+            console.print(
+                f"[dim]Batching: {self.batch_stats['pages_batched']} pages in "
+                f"{self.batch_stats['requests']} shared Stage 1 requests[/dim]"
+            )
+        calls = get_call_telemetry().job_summary(job_key)
+        if calls["calls"]:
+            cost = f"${calls['cost_usd']:.4f}" if calls["cost_usd"] is not None else "unknown cost"
+            console.print(
+                f"[dim]LLM calls: {calls['calls']} ({calls['failed']} failed, {calls['retries']} retries), "
+                f"{calls['input_tokens']}/{calls['output_tokens']} tokens in/out "
+                f"({calls['cache_read_tokens']} in from prompt cache), {cost}, "
+                f"p95 {calls['latency_ms_p95']} ms[/dim]"
+            )
+        if self.output_stats:
+            console.print(
+                f"[dim]Structured output: {self.output_stats['repaired']} repaired locally "
+                f"({self.output_stats['truncated']} truncated), {self.output_stats['recalls']} re-calls, "
+                f"{self.output_stats['unknown_fields_dropped']} unknown field_ids dropped[/dim]"
+            )
         
         successful = [p for p in pages if p.overall_confidence > 0]
         total_confidence = sum(p.overall_confidence for p in successful) / len(successful) if successful else 0
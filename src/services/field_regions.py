@@ -0,0 +1,232 @@
+"""
+Per-field regions on blank templates, and crops of filled pages cut from them.
+
+Each blank template page can have a region atlas — a JSON sidecar in a
+``.regions/`` directory next to the template, built offline by
+``template_atlas`` — mapping field_id (or table_id) to a normalized box
+(fractions of page width/height), plus boxes for the printed options of
+selection fields. Lookups are dict reads on an atlas cached per process.
+"""
+
+import base64
+import io
+import json
+import logging
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Optional
+
+from ..models import BoundingBox
+
+logger = logging.getLogger(__name__)
+
+REGIONS_DIR_NAME = ".regions"
+ATLAS_VERSION = 1
+DEFAULT_CROP_PADDING = 0.015      # fraction of page height added around each box
+DEFAULT_CROP_MAX_DIMENSION = 1024
+DEFAULT_CROP_JPEG_QUALITY = 90
+
+# Normalized (x0, y0, x1, y1), each in [0, 1].
+NormBox = tuple[float, float, float, float]
+
+
+def _scale(box: NormBox, width: int, height: int) -> BoundingBox:
+    x0, y0, x1, y1 = box
+    left, top = int(round(x0 * width)), int(round(y0 * height))
+    return BoundingBox(
+        x=left,
+        y=top,
+        width=max(1, int(round(x1 * width)) - left),
+        height=max(1, int(round(y1 * height)) - top),
+    )
+
+
+@dataclass
+class FieldRegion:
+    """Where one field sits on its template page."""
+
+    box: NormBox
+    options: dict[str, NormBox] = field(default_factory=dict)
+    score: float = 1.0
+
+    def scaled(self, width: int, height: int) -> BoundingBox:
+        """Field box in pixels of an image of the given size."""
+        return _scale(self.box, width, height)
+
+    def option_box(self, option: str, width: int, height: int) -> Optional[BoundingBox]:
+        """Box of one printed option in pixels, if located."""
+        box = self.options.get(option)
+        return _scale(box, width, height) if box else None
+
+
+@dataclass
+class FieldRegionAtlas:
+    """Field regions for one blank template page."""
+
+    template: str
+    width: int
+    height: int
+    regions: dict[str, FieldRegion]
+    source_sha256: str = ""
+    schema_sha256: str = ""
+    unmatched: list[str] = field(default_factory=list)
+
+    def get(self, field_id: str) -> Optional[FieldRegion]:
+        return self.regions.get(field_id)
+
+    def box(self, field_id: str, width: Optional[int] = None, height: Optional[int] = None) -> Optional[BoundingBox]:
+        """Field box in pixels; template pixels unless another image size is given."""
+        region = self.regions.get(field_id)
+        if region is None:
+            return None
+        return region.scaled(width or self.width, height or self.height)
+
+    def covers(self, field_ids: Iterable[str]) -> bool:
+        return all(fid in self.regions for fid in field_ids)
+
+    def to_dict(self) -> dict:
+        return {
+            "version": ATLAS_VERSION,
+            "template": self.template,
+            "width": self.width,
+            "height": self.height,
+            "source_sha256": self.source_sha256,
+            "schema_sha256": self.schema_sha256,
+            "regions": {
+                fid: {
+                    "box": [round(v, 5) for v in r.box],
+                    "options": {opt: [round(v, 5) for v in b] for opt, b in r.options.items()},
+                    "score": round(r.score, 3),
+                }
+                for fid, r in self.regions.items()
+            },
+            "unmatched": self.unmatched,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FieldRegionAtlas":
+        if data.get("version") != ATLAS_VERSION:
+            raise ValueError(f"unsupported atlas version {data.get('version')!r}")
+        return cls(
+            template=data["template"],
+            width=int(data["width"]),
+            height=int(data["height"]),
+            source_sha256=data.get("source_sha256", ""),
+            schema_sha256=data.get("schema_sha256", ""),
+            regions={
+                fid: FieldRegion(
+                    box=tuple(r["box"]),
+                    options={opt: tuple(b) for opt, b in r.get("options", {}).items()},
+                    score=float(r.get("score", 1.0)),
+                )
+                for fid, r in data.get("regions", {}).items()
+            },
+            unmatched=list(data.get("unmatched", [])),
+        )
+
+
+def atlas_path(blank_image_path: Path) -> Path:
+    """Sidecar location of the region atlas for a blank template image."""
+    blank_image_path = Path(blank_image_path)
+    return blank_image_path.parent / REGIONS_DIR_NAME / f"{blank_image_path.stem}.json"
+
+
+def save_field_regions(blank_image_path: Path, atlas: FieldRegionAtlas) -> Path:
+    """Write an atlas sidecar atomically. Returns its path."""
+    path = atlas_path(Path(blank_image_path).resolve())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(atlas.to_dict(), indent=1), encoding="utf-8")
+    tmp.replace(path)
+    return path
+
+
+_atlases: dict[Path, tuple[int, Optional[FieldRegionAtlas]]] = {}
+_atlases_lock = threading.Lock()
+
+
+def get_field_regions(blank_image_path: Optional[Path]) -> Optional[FieldRegionAtlas]:
+    """Region atlas for a blank template, or None if none has been built."""
+    if not blank_image_path:
+        return None
+    path = atlas_path(Path(blank_image_path).resolve())
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+    with _atlases_lock:
+        cached = _atlases.get(path)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
+
+    atlas: Optional[FieldRegionAtlas] = None
+    try:
+        atlas = FieldRegionAtlas.from_dict(json.loads(path.read_text(encoding="utf-8")))
+    except Exception as e:
+        logger.warning("Ignoring unreadable region atlas %s: %s", path, e)
+    with _atlases_lock:
+        _atlases[path] = (mtime_ns, atlas)
+    return atlas
+
+
+def crop_field_regions(
+    image_path: Path,
+    atlas: FieldRegionAtlas,
+    field_ids: list[str],
+    padding: float = DEFAULT_CROP_PADDING,
+    max_dimension: int = DEFAULT_CROP_MAX_DIMENSION,
+    jpeg_quality: int = DEFAULT_CROP_JPEG_QUALITY,
+    blank_image_path: Optional[Path] = None,
+) -> list[tuple[str, str, str]]:
+    """
+    Cut the atlas regions of the given fields out of a filled page.
+
+    With ``blank_image_path`` the page is first registered onto its blank
+    template and cropped in template coordinates; otherwise normalized
+    boxes are scaled to the filled image's size. Boxes are padded to absorb
+    residual misalignment.
+
+    Returns:
+        (field_id, base64 JPEG data, media type) per field that has a region
+    """
+    from PIL import Image
+
+    crops: list[tuple[str, str, str]] = []
+    with Image.open(image_path) as img:
+        if img.mode in ('RGBA', 'P'):
+            img = img.convert('RGB')
+        if blank_image_path:
+            from .page_registration import get_page_registrar
+
+            try:
+                img = get_page_registrar().register_page(image_path, blank_image_path).warp(img)
+            except Exception as e:
+                logger.warning("Cropping %s unregistered: %s", Path(image_path).name, e)
+        pad = int(padding * img.height)
+
+        for field_id in field_ids:
+            box = atlas.box(field_id, img.width, img.height)
+            if box is None:
+                continue
+            left = max(0, box.x - pad)
+            top = max(0, box.y - pad)
+            right = min(img.width, box.right + pad)
+            bottom = min(img.height, box.bottom + pad)
+            if right <= left or bottom <= top:
+                continue
+
+            crop = img.crop((left, top, right, bottom))
+            if max(crop.size) > max_dimension:
+                ratio = max_dimension / max(crop.size)
+                crop = crop.resize(
+                    (max(1, int(crop.width * ratio)), max(1, int(crop.height * ratio))),
+                    Image.Resampling.LANCZOS,
+                )
+
+            buffer = io.BytesIO()
+            crop.save(buffer, format='JPEG', quality=jpeg_quality, optimize=True)
+            data = base64.standard_b64encode(buffer.getvalue()).decode("utf-8")
+            crops.append((field_id, data, "image/jpeg"))
+    return crops
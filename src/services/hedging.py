@@ -0,0 +1,131 @@
+"""
+Request hedging for Stage 1 tail latency.
+
+A form job finishes with its slowest page, and VLM providers have long
+latency tails. When hedging is on, a Stage 1 call that is still running
+after its provider's recent p90 latency gets a duplicate on the next
+provider in the route; the first valid result wins and the other request
+is cancelled (which closes its HTTP connection).
+
+Hedges are capped at a fraction of calls, so a slow provider cannot double
+the load. The policy also keeps the latency the caller saw next to the
+primary requests' own latency: primaries cut short by a winning hedge are
+counted separately, since each had already run past the hedge delay, and
+the gap between the two tails is what hedging removed.
+"""
+
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from .provider_router import ProviderRouter
+
+LATENCY_SAMPLES = 1000
+
+
+def _quantiles(values: deque) -> dict[str, Optional[int]]:
+    ordered = sorted(values)
+    if not ordered:
+        return {"p50_ms": None, "p90_ms": None, "p99_ms": None}
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000)
+    return {"p50_ms": pick(0.5), "p90_ms": pick(0.9), "p99_ms": pick(0.99)}
+
+
+@dataclass
+class HedgePolicy:
+    """
+    When to hedge a Stage 1 call, and the process-wide hedging metrics.
+
+    Args:
+        enabled: Hedge at all (EXTRACTION_HEDGE)
+        quantile: Latency quantile of the provider after which a call is hedged
+        budget: Max fraction of eligible calls that get a hedge (EXTRACTION_HEDGE_BUDGET)
+        min_samples: Successful calls a provider needs before its quantile is trusted
+        min_delay_seconds: Never hedge earlier than this
+    """
+
+    enabled: bool = False
+    quantile: float = 0.9
+    budget: float = 0.1
+    min_samples: int = 20
+    min_delay_seconds: float = 5.0
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.primaries_cancelled = 0
+        self._observed: deque = deque(maxlen=LATENCY_SAMPLES)
+        self._primary: deque = deque(maxlen=LATENCY_SAMPLES)
+
+    @classmethod
+    def from_env(cls) -> "HedgePolicy":
+        """Policy from EXTRACTION_HEDGE / EXTRACTION_HEDGE_BUDGET."""
+        return cls(
+            enabled=os.getenv("EXTRACTION_HEDGE", "false").lower() in ("1", "true", "yes"),
+            budget=float(os.getenv("EXTRACTION_HEDGE_BUDGET", 0.1)),
+        )
+
+    def delay(self, router: ProviderRouter, provider: str) -> Optional[float]:
+        """Seconds after which a call to ``provider`` is hedged; None until it has enough history."""
+        p = router.latency_quantile(provider, self.quantile, self.min_samples)
+        return None if p is None else max(self.min_delay_seconds, p)
+
+    def start(self) -> None:
+        """Count a hedge-eligible call (the budget is a fraction of these)."""
+        with self._lock:
+            self.calls += 1
+
+    def try_hedge(self) -> bool:
+        """Spend budget on a hedge; False when the hedge budget is used up."""
+        with self._lock:
+            if self.hedged + 1 > self.budget * self.calls:
+                return False
+            self.hedged += 1
+            return True
+
+    def record(self, observed: float, primary: Optional[float], hedge_won: bool = False) -> None:
+        """
+        Latency of one eligible call.
+
+        Args:
+            observed: What the caller waited
+            primary: The primary request's own latency; None when a winning
+                hedge cancelled it
+            hedge_won: Whether the hedge's result was used
+        """
+        with self._lock:
+            self._observed.append(observed)
+            if primary is not None:
+                self._primary.append(primary)
+            else:
+                self.primaries_cancelled += 1
+            if hedge_won:
+                self.hedge_wins += 1
+
+    def snapshot(self) -> dict:
+        """Hedge counts and caller-vs-primary latency quantiles."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "quantile": self.quantile,
+                "budget": self.budget,
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "hedged_fraction": round(self.hedged / self.calls, 3) if self.calls else 0.0,
+                "latency": _quantiles(self._observed),
+                # Primaries that finished; cancelled ones were all slower than the hedge delay.
+                "primary_latency": _quantiles(self._primary),
+                "primaries_cancelled": self.primaries_cancelled,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_hedge_policy() -> HedgePolicy:
+    """Process-wide hedge policy and metrics (EXTRACTION_HEDGE, EXTRACTION_HEDGE_BUDGET)."""
+    return HedgePolicy.from_env()
@@ -0,0 +1,267 @@
+"""
+Encoding of page images for VLM requests.
+
+By default pages are encoded as they always were: LANCZOS-resized to
+2048 px and saved as JPEG quality 95 with ``optimize=True`` (DEFAULT_PROFILE).
+That is slow on CPU and 0.5-1 MB of base64 per page, well past what the
+providers' vision encoders resolve, so with IMAGE_ADAPTIVE_ENCODING on
+(off until the smaller payloads are benchmarked against extraction
+accuracy) each provider's images are encoded to a budget instead
+(ADAPTIVE_PROFILES):
+
+- resolution: capped by the profile's max dimension and by its vision
+  token budget (providers bill and downscale by pixel count)
+- format: the first of the profile's formats (JPEG, WebP, 8-bit grayscale
+  PNG) that fits the byte budget
+- quality: the highest that fits the byte budget, found by bisection;
+  if even the minimum doesn't fit, the image is scaled down and retried
+
+Large downscales take a fast path (JPEG draft decoding, and box reduction
+before the final LANCZOS pass). With ``grayscale`` on (IMAGE_GRAYSCALE, off
+by default until it is benchmarked), pages without colored ink are encoded
+as grayscale, which is smaller at the same quality; colored ink keeps RGB,
+since pen color helps tell handwriting from print.
+
+Encoding is deterministic for a given source and profile, so identical
+pages produce identical payloads and the response cache (which hashes the
+payload) keeps hitting. ``EncodingProfile.key`` names the settings, for
+stores that persist encoded payloads.
+"""
+
+import base64
+import io
+import logging
+import os
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("jpeg", "webp", "png8")
+MEDIA_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png8": "image/png"}
+
+# Chroma (max |Cb|,|Cr| deviation) above which a pixel counts as colored,
+# and the number of colored pixels (at full resolution) from which a page
+# keeps RGB: a pen tick or initial, however large the scan. A share of the
+# page, or a thumbnail, lets a short stroke on a large scan slip under it.
+COLOR_CHROMA_THRESHOLD = 24
+COLOR_MIN_PIXELS = 150
+
+MAX_DOWNSCALE_STEPS = 4
+DOWNSCALE_STEP = 0.85
+
+
+@dataclass(frozen=True)
+class EncodingProfile:
+    """
+    Budget and settings for encoding one provider's page images. The
+    defaults are the baseline encoding (no budgets, JPEG quality 95).
+
+    Args:
+        max_dimension: Longest edge in pixels
+        target_bytes: Largest encoded size (before base64); None for no byte budget
+        target_tokens: Largest vision-token cost; None for no token budget
+        pixels_per_token: How many pixels the provider bills as one token
+        formats: Formats to try, in order of preference (see FORMATS)
+        min_quality: Lowest JPEG/WebP quality before the image is scaled down instead
+        max_quality: Quality used when it fits the budget
+        optimize: Extra JPEG Huffman-table pass (smaller, slower)
+        fast_downscale: Draft-decode JPEGs and box-reduce before LANCZOS
+        grayscale: Encode pages without colored ink as grayscale (IMAGE_GRAYSCALE)
+    """
+
+    max_dimension: int = 2048
+    target_bytes: Optional[int] = None
+    target_tokens: Optional[int] = None
+    pixels_per_token: int = 750
+    formats: tuple[str, ...] = ("jpeg",)
+    min_quality: int = 60
+    max_quality: int = 95
+    optimize: bool = True
+    fast_downscale: bool = False
+    grayscale: bool = False
+
+    def __post_init__(self):
+        unknown = [f for f in self.formats if f not in FORMATS]
+        if unknown or not self.formats:
+            raise ValueError(f"Unknown image formats {unknown}; expected some of {FORMATS}")
+
+    @property
+    def key(self) -> str:
+        """Short, filename-safe name of these settings."""
+        parts = [
+            f"{self.max_dimension}px",
+            f"{self.target_bytes // 1000}kb" if self.target_bytes else "nokb",
+            f"{self.target_tokens}t{self.pixels_per_token}" if self.target_tokens else "notok",
+            "-".join(self.formats),
+            f"q{self.min_quality}-{self.max_quality}",
+            "opt" if self.optimize else "noopt",
+            "fast" if self.fast_downscale else "exact",
+            "gray" if self.grayscale else "rgb",
+        ]
+        return ".".join(parts)
+
+
+DEFAULT_PROFILE = EncodingProfile()
+
+# Claude downscales anything over ~1.15 MP (about 1600 tokens at w*h/750);
+# the OpenAI-compatible VLMs read fine print better at a higher resolution.
+ADAPTIVE_PROFILE = EncodingProfile(target_bytes=450_000, max_quality=88, optimize=False, fast_downscale=True)
+ADAPTIVE_PROFILES: dict[str, EncodingProfile] = {
+    "together": ADAPTIVE_PROFILE,
+    "fireworks": ADAPTIVE_PROFILE,
+    "claude": replace(ADAPTIVE_PROFILE, max_dimension=1568, target_bytes=400_000, target_tokens=1600),
+}
+
+
+def get_encoding_profile(provider: Optional[str] = None) -> EncodingProfile:
+    """
+    Encoding profile of a provider: the baseline DEFAULT_PROFILE, or with
+    IMAGE_ADAPTIVE_ENCODING on the provider's budgeted profile (ADAPTIVE_PROFILE
+    for None or an unknown provider). IMAGE_MAX_DIMENSION / IMAGE_TARGET_KB /
+    IMAGE_FORMATS / IMAGE_GRAYSCALE overrides apply to every profile.
+    """
+    if os.getenv("IMAGE_ADAPTIVE_ENCODING", "false").lower() in ("1", "true", "yes"):
+        profile = ADAPTIVE_PROFILES.get(provider or "", ADAPTIVE_PROFILE)
+    else:
+        profile = DEFAULT_PROFILE
+    overrides = {}
+    if os.getenv("IMAGE_MAX_DIMENSION"):
+        overrides["max_dimension"] = int(os.environ["IMAGE_MAX_DIMENSION"])
+    if os.getenv("IMAGE_TARGET_KB"):
+        overrides["target_bytes"] = int(os.environ["IMAGE_TARGET_KB"]) * 1000
+    if os.getenv("IMAGE_FORMATS"):
+        overrides["formats"] = tuple(f.strip().lower() for f in os.environ["IMAGE_FORMATS"].split(",") if f.strip())
+    if os.getenv("IMAGE_GRAYSCALE"):
+        overrides["grayscale"] = os.environ["IMAGE_GRAYSCALE"].lower() in ("1", "true", "yes")
+    return replace(profile, **overrides) if overrides else profile
+
+
+@dataclass(frozen=True)
+class EncodedImage:
+    """A page image ready to send, and how it was encoded."""
+
+    data: str            # base64
+    media_type: str
+    width: int
+    height: int
+    format: str
+    quality: Optional[int]
+    grayscale: bool
+    size_bytes: int
+
+
+def _target_size(width: int, height: int, profile: EncodingProfile) -> tuple[int, int]:
+    scale = min(1.0, profile.max_dimension / max(width, height))
+    if profile.target_tokens:
+        max_pixels = profile.target_tokens * profile.pixels_per_token
+        scale = min(scale, (max_pixels / (width * height)) ** 0.5)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def _has_color(img) -> bool:
+    """Whether a page has colored ink, judged at full resolution."""
+    if img.mode in ("L", "1", "LA", "I", "I;16", "F"):
+        return False
+    _, cb, cr = img.convert("RGB").convert("YCbCr").split()
+    colored = 0
+    for channel in (cb, cr):
+        histogram = channel.histogram()
+        colored = max(colored, sum(
+            count for value, count in enumerate(histogram) if abs(value - 128) > COLOR_CHROMA_THRESHOLD
+        ))
+    return colored >= COLOR_MIN_PIXELS
+
+
+def _save(img, fmt: str, quality: Optional[int], optimize: bool = False) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "jpeg":
+        img.save(buffer, format="JPEG", quality=quality, optimize=optimize)
+    elif fmt == "webp":
+        img.save(buffer, format="WEBP", quality=quality, method=4)
+    else:
+        img.convert("L").save(buffer, format="PNG", compress_level=6)
+    return buffer.getvalue()
+
+
+def _fit_quality(img, fmt: str, profile: EncodingProfile) -> tuple[Optional[bytes], Optional[int]]:
+    """Highest quality of ``fmt`` within the byte budget; (None, None) if even the lowest is too big."""
+    if fmt == "png8":
+        data = _save(img, fmt, None)
+        return (data, None) if not profile.target_bytes or len(data) <= profile.target_bytes else (None, None)
+    data = _save(img, fmt, profile.max_quality, profile.optimize)
+    if not profile.target_bytes or len(data) <= profile.target_bytes:
+        return data, profile.max_quality
+    lo, hi, best = profile.min_quality, profile.max_quality - 1, None
+    while lo <= hi:
+        quality = (lo + hi) // 2
+        data = _save(img, fmt, quality, profile.optimize)
+        if len(data) <= profile.target_bytes:
+            best, lo = (data, quality), quality + 1
+        else:
+            hi = quality - 1
+    return best if best else (None, None)
+
+
+def encode_image(image_path: Path, profile: Optional[EncodingProfile] = None) -> EncodedImage:
+    """
+    Encode a page image for a VLM request within ``profile``'s budget.
+
+    If nothing fits the byte budget after MAX_DOWNSCALE_STEPS downscales,
+    the smallest encoding tried is used (and logged).
+    """
+    from PIL import Image
+
+    profile = profile or DEFAULT_PROFILE
+    with Image.open(image_path) as source:
+        width, height = _target_size(*source.size, profile)
+        gray = profile.grayscale and not _has_color(source)
+        mode = "L" if gray else "RGB"
+        if profile.fast_downscale and source.format == "JPEG":
+            # Decode JPEGs at a reduced scale straight from the DCT coefficients.
+            source.draft(mode, (width, height))
+        img = source.convert(mode) if source.mode != mode else source.copy()
+
+    # Box-reduce big downscales before the final LANCZOS pass (much faster, about the same result).
+    if img.size != (width, height):
+        reducing_gap = 3.0 if profile.fast_downscale else None
+        img = img.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=reducing_gap)
+
+    smallest: Optional[tuple[bytes, str, Optional[int], tuple[int, int]]] = None
+    for step in range(MAX_DOWNSCALE_STEPS + 1):
+        for fmt in profile.formats:
+            if fmt == "png8" and not gray:
+                continue
+            data, quality = _fit_quality(img, fmt, profile)
+            if data is not None:
+                return _encoded(data, fmt, quality, img.size, gray)
+            quality = profile.min_quality if fmt != "png8" else None
+            fallback = _save(img, fmt, quality, profile.optimize)
+            if smallest is None or len(fallback) < len(smallest[0]):
+                smallest = (fallback, fmt, quality, img.size)
+        if step < MAX_DOWNSCALE_STEPS:
+            img = img.resize(
+                (max(1, int(img.width * DOWNSCALE_STEP)), max(1, int(img.height * DOWNSCALE_STEP))),
+                Image.Resampling.LANCZOS,
+            )
+
+    data, fmt, quality, size = smallest
+    logger.warning(
+        "%s: no encoding within %d bytes; sending %d bytes of %s",
+        Path(image_path).name, profile.target_bytes, len(data), fmt,
+    )
+    return _encoded(data, fmt, quality, size, gray)
+
+
+def _encoded(data: bytes, fmt: str, quality: Optional[int], size: tuple[int, int], gray: bool) -> EncodedImage:
+    return EncodedImage(
+        data=base64.standard_b64encode(data).decode("utf-8"),
+        media_type=MEDIA_TYPES[fmt],
+        width=size[0],
+        height=size[1],
+        format=fmt,
+        quality=quality,
+        grayscale=gray,
+        size_bytes=len(data),
+    )
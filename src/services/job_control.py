@@ -0,0 +1,236 @@
+"""
+Per-job deadlines and cooperative cancellation.
+
+Every extraction job runs under a JobControl: a deadline (a wall-clock
+budget from the moment the job starts) and a cancel flag, shared by every
+page task and LLM call of the job through a context variable. Cancelling
+a job, or reaching its deadline, cancels the job's asyncio task on the
+engine loop, which stops in-flight provider requests, drops pages still
+queued between stages and frees the slots they were waiting for. Before
+each LLM attempt the call checks its job and caps its request timeout at
+the time the job has left, so no request outlives its job.
+
+Controls are registered per job id in a process-wide registry, which is
+what POST /api/jobs/{job_id}/cancel talks to. A cancel that arrives
+before the job has started (still queued as a background task) is
+remembered and takes effect as soon as it starts. The registry is per
+process: with several API workers, a cancel only reaches jobs running in
+the worker that receives it.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEADLINE_SECONDS = 3600.0
+# Calls with less time than this left fail fast instead of starting a doomed request.
+MIN_CALL_SECONDS = 5.0
+MAX_PENDING_CANCELS = 1000
+
+
+class JobAborted(RuntimeError):
+    """A job stopped before finishing, by cancellation or its deadline."""
+
+
+class JobCancelled(JobAborted):
+    """The job was cancelled."""
+
+
+class JobDeadlineExceeded(JobAborted):
+    """The job ran past its deadline."""
+
+
+def default_deadline() -> Optional[float]:
+    """Job deadline in seconds from EXTRACTION_JOB_DEADLINE_S (0 = none)."""
+    seconds = float(os.getenv("EXTRACTION_JOB_DEADLINE_S", DEFAULT_DEADLINE_SECONDS))
+    return seconds if seconds > 0 else None
+
+
+class JobControl:
+    """Deadline and cancel flag of one running job."""
+
+    def __init__(self, job_id: str, deadline_s: Optional[float] = None):
+        self.job_id = job_id
+        self.deadline_s = deadline_s
+        self.started = time.monotonic()
+        self.deadline = self.started + deadline_s if deadline_s else None
+        self.reason: Optional[str] = None   # "cancelled" | "deadline" once aborted
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def aborted(self) -> bool:
+        return self.reason is not None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline (None without one)."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def error(self) -> JobAborted:
+        if self.reason == "deadline":
+            return JobDeadlineExceeded(f"Job {self.job_id} exceeded its {self.deadline_s:g}s deadline")
+        return JobCancelled(f"Job {self.job_id} was cancelled")
+
+    def check(self) -> None:
+        """Raise if the job was cancelled or is past its deadline."""
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0 and self.reason is None:
+            self.reason = "deadline"
+        if self.reason is not None:
+            raise self.error()
+
+    def call_timeout(self, default: Optional[float] = None) -> Optional[float]:
+        """
+        Request timeout for an LLM call: ``default`` capped at the time left.
+
+        Raises:
+            JobAborted: The job is aborted, or has under MIN_CALL_SECONDS left
+        """
+        self.check()
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        if remaining < MIN_CALL_SECONDS:
+            self.reason = "deadline"
+            raise self.error()
+        return min(default, remaining) if default else remaining
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """Abort the job (thread-safe): its task is cancelled on its loop."""
+        with self._lock:
+            if self.reason is None:
+                self.reason = reason
+            task, loop = self._task, self._loop
+        if task is not None and loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(task.cancel)
+
+    @contextlib.contextmanager
+    def bind(self) -> Iterator["JobControl"]:
+        """
+        Make this the job control of the current task (and tasks it spawns),
+        and arm the deadline. Must be entered inside the job's task.
+        """
+        self.check()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._task, self._loop = asyncio.current_task(), loop
+        timer = loop.call_later(self.remaining(), self.cancel, "deadline") if self.deadline is not None else None
+        token = _current_control.set(self)
+        try:
+            yield self
+        finally:
+            _current_control.reset(token)
+            if timer is not None:
+                timer.cancel()
+            with self._lock:
+                self._task = self._loop = None
+
+
+_current_control: ContextVar[Optional[JobControl]] = ContextVar("job_control", default=None)
+
+
+def current_job_control() -> Optional[JobControl]:
+    """The control of the job running in this context, if any."""
+    return _current_control.get()
+
+
+class JobRegistry:
+    """Process-wide map of running jobs' controls, for cancellation by job id."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: dict[str, JobControl] = {}
+        # Cancels for jobs that haven't started yet (bounded, oldest dropped).
+        self._pending_cancels: "OrderedDict[str, None]" = OrderedDict()
+        # Jobs whose task started here but that haven't opened yet (same bound).
+        self._claimed: "OrderedDict[str, None]" = OrderedDict()
+
+    def claim(self, job_id: str) -> None:
+        """
+        Mark a job as running in this process from the start of its task,
+        before it opens (e.g. while its pages are fetched), so it can be
+        cancelled here in between.
+        """
+        with self._lock:
+            self._claimed[job_id] = None
+            while len(self._claimed) > MAX_PENDING_CANCELS:
+                self._claimed.popitem(last=False)
+
+    def owns(self, job_id: str) -> bool:
+        """Whether a job is running (or claimed) in this process."""
+        with self._lock:
+            return job_id in self._jobs or job_id in self._claimed
+
+    def open(self, job_id: str, deadline_s: Optional[float] = None) -> JobControl:
+        """Register a starting job; it starts cancelled if a cancel arrived first."""
+        control = JobControl(job_id, deadline_s)
+        with self._lock:
+            self._jobs[job_id] = control
+            self._claimed.pop(job_id, None)
+            if job_id in self._pending_cancels:
+                del self._pending_cancels[job_id]
+                control.reason = "cancelled"
+        return control
+
+    def take_pending_cancel(self, job_id: str) -> bool:
+        """Whether a job was cancelled before it started (the cancel is used up)."""
+        with self._lock:
+            if job_id in self._pending_cancels:
+                del self._pending_cancels[job_id]
+                return True
+            return False
+
+    def close(self, job_id: str) -> None:
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._claimed.pop(job_id, None)
+
+    def cancel(self, job_id: str, remember: bool = True) -> bool:
+        """
+        Cancel a job. Returns whether it was running in this process; if it
+        wasn't and ``remember`` is set (or it is claimed here), the cancel is
+        kept for when it opens.
+        """
+        with self._lock:
+            control = self._jobs.get(job_id)
+            if control is None:
+                if not remember and job_id not in self._claimed:
+                    return False
+                self._pending_cancels[job_id] = None
+                while len(self._pending_cancels) > MAX_PENDING_CANCELS:
+                    self._pending_cancels.popitem(last=False)
+                return False
+        logger.info("Cancelling job %s", job_id)
+        control.cancel()
+        return True
+
+    def running(self) -> list[dict]:
+        with self._lock:
+            controls = list(self._jobs.values())
+        return [
+            {
+                "job_id": c.job_id,
+                "elapsed_s": round(time.monotonic() - c.started, 1),
+                "remaining_s": None if c.remaining() is None else round(c.remaining(), 1),
+                "aborted": c.reason,
+            }
+            for c in controls
+        ]
+
+
+@lru_cache(maxsize=1)
+def get_job_registry() -> JobRegistry:
+    """Process-wide job registry."""
+    return JobRegistry()
@@ -6,6 +6,8 @@ Replaces the in-memory job_status dict with Supabase persistence.
 import logging
 from datetime import datetime
 from typing import Optional
+from ..models.annotations import PageExtractionResult
+from .page_hash import DuplicateMatch, DuplicatePageDetector, PageHash
 from .supabase_client import get_supabase
 
 logger = logging.getLogger(__name__)
@@ -39,7 +41,7 @@ def update_job(job_id: str, **fields) -> None:
     sb = get_supabase()
     if "status" in fields and fields["status"] == "processing" and "started_at" not in fields:
         fields["started_at"] = datetime.utcnow().isoformat()
-    if "status" in fields and fields["status"] in ("completed", "failed") and "completed_at" not in fields:
+    if "status" in fields and fields["status"] in ("completed", "failed", "cancelled") and "completed_at" not in fields:
         fields["completed_at"] = datetime.utcnow().isoformat()
 
     sb.table("extraction_jobs").update(fields).eq("id", job_id).execute()
@@ -50,6 +52,84 @@ def update_job(job_id: str, **fields) -> None:
         logger.debug("Job %s stage: %s", job_id[:8], fields["current_stage"])
 
 
+def save_job_telemetry(job_id: str, telemetry: dict) -> None:
+    """
+    Store a job's aggregated LLM call telemetry (call_telemetry.job_summary)
+    in its extraction_jobs.llm_telemetry column. Best effort: a failure here
+    never fails the job.
+    """
+    sb = get_supabase()
+    try:
+        sb.table("extraction_jobs").update({
+            "llm_telemetry": telemetry,
+            "llm_calls": telemetry.get("calls", 0),
+            "llm_cost_usd": telemetry.get("cost_usd"),
+        }).eq("id", job_id).execute()
+    except Exception as e:
+        logger.warning("Failed to save LLM telemetry for job %s: %s", job_id[:8], e)
+
+
+def save_job_page_stats(job_id: str, stats: dict) -> None:
+    """
+    Store how many pages a job answered without extracting them (blank
+    pages skipped, duplicate pages reused) in extraction_jobs.page_stats.
+    Best effort, like telemetry.
+    """
+    sb = get_supabase()
+    try:
+        sb.table("extraction_jobs").update({"page_stats": stats}).eq("id", job_id).execute()
+    except Exception as e:
+        logger.warning("Failed to save page stats for job %s: %s", job_id[:8], e)
+
+
+def save_job_params(job_id: str, params: dict) -> None:
+    """
+    Checkpoint what a job was run with (source kind, name, schema path, page
+    range) in its extraction_jobs.extraction_params column, so failed pages
+    can be re-run later with the same settings. Best effort, like telemetry.
+    """
+    sb = get_supabase()
+    try:
+        sb.table("extraction_jobs").update({"extraction_params": params}).eq("id", job_id).execute()
+    except Exception as e:
+        logger.warning("Failed to save extraction params for job %s: %s", job_id[:8], e)
+
+
+def append_job_retry(job_id: str, retry: dict) -> None:
+    """
+    Record one retry of a job's failed pages in its extraction_jobs.retries
+    list. The first run's processing time, model, page stats and telemetry
+    are left as they were; llm_calls and llm_cost_usd grow by the retry's
+    calls so they stay totals over every run. Best effort, like telemetry.
+    """
+    sb = get_supabase()
+    try:
+        rows = sb.table("extraction_jobs").select("retries,llm_calls,llm_cost_usd").eq("id", job_id).execute().data
+        job = rows[0] if rows else {}
+        telemetry = retry.get("llm_telemetry") or {}
+        fields = {"retries": (job.get("retries") or []) + [retry]}
+        if telemetry.get("calls"):
+            fields["llm_calls"] = (job.get("llm_calls") or 0) + telemetry["calls"]
+        if telemetry.get("cost_usd") is not None:
+            fields["llm_cost_usd"] = round(float(job.get("llm_cost_usd") or 0) + telemetry["cost_usd"], 6)
+        sb.table("extraction_jobs").update(fields).eq("id", job_id).execute()
+    except Exception as e:
+        logger.warning("Failed to save retry stats for job %s: %s", job_id[:8], e)
+
+
+def get_retry_page_numbers(job: dict) -> list[int]:
+    """
+    Page numbers of a job that need re-extracting: pages whose saved result
+    is a failure placeholder (overall_confidence 0) and pages with no saved
+    result at all (up to the job's total_pages).
+    """
+    results = get_extraction_results(job["id"])
+    saved = {r["page_number"] for r in results}
+    failed = {r["page_number"] for r in results if float(r.get("overall_confidence") or 0) == 0}
+    missing = set(range(1, (job.get("total_pages") or 0) + 1)) - saved
+    return sorted(failed | missing)
+
+
 def get_job(job_id: str) -> Optional[dict]:
     sb = get_supabase()
     result = sb.table("extraction_jobs").select("*").eq("id", job_id).execute()
@@ -62,6 +142,16 @@ def save_page_result(
     page_number: int,
     page_data: dict,
 ) -> str:
+    """
+    Save one page's extraction result, replacing any earlier row for the
+    same (job_id, page_number).
+
+    Pages are saved as they finish and again for any the streaming save
+    missed, so the write is an upsert; it relies on the unique index on
+    extraction_results (job_id, page_number) (supabase/migrations). Until
+    that migration is applied the upsert is rejected, and the page's old
+    rows are deleted and the row inserted instead.
+    """
     sb = get_supabase()
     row = {
         "job_id": job_id,
@@ -82,7 +172,7 @@ def save_page_result(
 
     n_fields = len(page_data.get("field_values", {}))
     try:
-        result = sb.table("extraction_results").insert(row).execute()
+        result = _upsert_page_result(sb, row)
         result_id = result.data[0]["id"]
         logger.info(
             "Saved page %d results for job %s (%d fields, confidence=%.2f)",
@@ -94,6 +184,30 @@ def save_page_result(
         raise
 
 
+# Postgres "no unique or exclusion constraint matching the ON CONFLICT specification"
+_NO_CONFLICT_TARGET = "42P10"
+_results_upsert_supported = True
+
+
+def _upsert_page_result(sb, row: dict):
+    """Upsert on (job_id, page_number), or delete + insert without the unique index."""
+    global _results_upsert_supported
+    if _results_upsert_supported:
+        try:
+            return sb.table("extraction_results").upsert(row, on_conflict="job_id,page_number").execute()
+        except Exception as e:
+            if getattr(e, "code", None) != _NO_CONFLICT_TARGET:
+                raise
+            _results_upsert_supported = False
+            logger.warning(
+                "extraction_results has no unique index on (job_id, page_number); saving pages with "
+                "delete + insert until supabase/migrations/20261017000100_extraction_results_page_unique.sql "
+                "is applied"
+            )
+    sb.table("extraction_results").delete().eq("job_id", row["job_id"]).eq("page_number", row["page_number"]).execute()
+    return sb.table("extraction_results").insert(row).execute()
+
+
 def create_document(
     file_name: str,
     file_type: str,
@@ -131,6 +245,12 @@ def create_document(
     return doc_id
 
 
+def get_document(document_id: str) -> Optional[dict]:
+    sb = get_supabase()
+    result = sb.table("documents").select("*").eq("id", document_id).execute()
+    return result.data[0] if result.data else None
+
+
 def update_document(document_id: str, **fields) -> None:
     sb = get_supabase()
     sb.table("documents").update(fields).eq("id", document_id).execute()
@@ -181,6 +301,139 @@ def list_jobs(status: Optional[str] = None, limit: int = 50) -> list[dict]:
     return query.execute().data
 
 
+# =============================================================================
+# Duplicate-page index
+# =============================================================================
+
+_RESULT_PAGE_FIELDS = (
+    "field_values", "visual_elements", "spatial_connections", "annotation_groups",
+    "free_form_annotations", "circled_selections", "cross_page_references", "unknown_marks",
+    "overall_confidence", "items_needing_review",
+)
+_MAX_DUPLICATE_CANDIDATES = 50
+
+# Postgres / PostgREST codes of a missing table, column or unique index: the
+# document_page_hashes migration has not been applied
+_SCHEMA_ERRORS = {"42P01", "42703", "42P10", "42883", "PGRST204", "PGRST205"}
+_page_hashes_available = True
+
+
+def _page_hashes_missing(error: Exception) -> bool:
+    """
+    Whether a document_page_hashes query failed because the table (or one
+    of its columns or indexes) is missing. The first such failure turns the
+    duplicate-page index off for the process, with a single warning.
+    """
+    global _page_hashes_available
+    if getattr(error, "code", None) not in _SCHEMA_ERRORS:
+        return False
+    if _page_hashes_available:
+        _page_hashes_available = False
+        logger.warning(
+            "document_page_hashes is missing or out of date (%s); duplicate-page reuse is off until "
+            "supabase/migrations/20261017000200_document_page_hashes.sql is applied",
+            error,
+        )
+    return True
+
+
+def save_page_hash(
+    job_id: str,
+    document_id: str,
+    page_number: int,
+    page_hash: PageHash,
+    schema_key: str,
+    owner_id: Optional[str] = None,
+) -> None:
+    """
+    Index an extracted page's perceptual hashes and ink grid in
+    document_page_hashes, keyed like extraction_results on
+    (job_id, page_number) (unique index). Does nothing without the table.
+    """
+    if not _page_hashes_available:
+        return
+    sb = get_supabase()
+    try:
+        sb.table("document_page_hashes").upsert({
+            "job_id": job_id,
+            "document_id": document_id,
+            "owner_id": owner_id,
+            "page_number": page_number,
+            "schema_key": schema_key,
+            "dhash": page_hash.dhash_hex,
+            "phash": page_hash.phash_hex,
+            "dhash_bands": page_hash.bands(),
+            "ink": page_hash.ink_b64,
+        }, on_conflict="job_id,page_number").execute()
+    except Exception as e:
+        if _page_hashes_missing(e):
+            return
+        raise
+    logger.debug("Indexed page %d hashes for job %s", page_number, job_id[:8])
+
+
+def find_duplicate_page(
+    page_hash: PageHash,
+    schema_key: str,
+    detector: DuplicatePageDetector,
+    document_id: str,
+    owner_id: Optional[str] = None,
+) -> Optional[DuplicateMatch]:
+    """
+    The closest earlier page with the same schema key, uploaded by the same
+    owner (or, without one, in the same document), that the detector
+    matches and whose saved result succeeded. Pages of other users'
+    documents are never candidates.
+
+    Candidates share at least one dHash band with the page (an indexed
+    array overlap); distances and ink are checked here. Without the
+    document_page_hashes table no page has a duplicate.
+    """
+    if not _page_hashes_available:
+        return None
+    sb = get_supabase()
+    query = sb.table("document_page_hashes").select("job_id,page_number,dhash,phash,ink")
+    query = query.eq("owner_id", owner_id) if owner_id else query.eq("document_id", document_id)
+    try:
+        rows = (
+            query
+            .eq("schema_key", schema_key)
+            .ov("dhash_bands", page_hash.bands())
+            .order("created_at", desc=True)
+            .limit(_MAX_DUPLICATE_CANDIDATES)
+            .execute()
+        ).data or []
+    except Exception as e:
+        if _page_hashes_missing(e):
+            return None
+        raise
+
+    candidates = []
+    for row in rows:
+        distances = detector.matches(page_hash, PageHash.from_hex(row["dhash"], row["phash"], row.get("ink")))
+        if distances is not None:
+            candidates.append((sum(distances), distances, row))
+    candidates.sort(key=lambda c: c[0])
+
+    for _, (dhash_distance, phash_distance), row in candidates[:3]:
+        result = (
+            sb.table("extraction_results")
+            .select(",".join(_RESULT_PAGE_FIELDS))
+            .eq("job_id", row["job_id"])
+            .eq("page_number", row["page_number"])
+            .gt("overall_confidence", 0)
+            .execute()
+        ).data
+        if not result:
+            continue
+        page = PageExtractionResult(
+            page_number=row["page_number"],
+            **{k: v for k, v in result[0].items() if v is not None},
+        )
+        return DuplicateMatch(row["job_id"], row["page_number"], page, dhash_distance, phash_distance)
+    return None
+
+
 # =============================================================================
 # Patient extraction from results
 # =============================================================================
@@ -0,0 +1,203 @@
+"""
+Process-wide registry of LLM SDK clients.
+
+Building an OpenAI or Anthropic client per job (or per report, or per
+learning pair) means a fresh connection pool and a TLS handshake on the
+first request of each. Clients from here are created once per provider and
+share one long-lived httpx pool per provider: keep-alive connections, tuned
+pool limits, HTTP/2 when the ``h2`` package is installed, and the provider
+scheduler's and the call telemetry's response hooks (ratelimit headers and
+time to first byte are seen on every call).
+
+Async clients are meant for the shared engine loop (async_engine) and have
+SDK retries off, since the provider schedulers own retries. An httpx async
+pool is bound to the event loop it first runs on, so async pools (and the
+SDK clients over them) are kept per loop: one asked for inside a running
+loop belongs to that loop, one asked for outside any loop (e.g. while a
+pipeline is built) to the engine loop. Using an async client on another
+loop raises a RuntimeError instead of failing somewhere inside httpx.
+Sync clients (report generation, report_learning) keep the SDK's own
+retries.
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+from typing import Any, Optional
+
+import httpx
+
+from . import call_telemetry
+from .async_engine import get_engine_loop
+from .rate_limiter import get_provider_scheduler
+
+logger = logging.getLogger(__name__)
+
+TOGETHER_BASE_URL = "https://api.together.xyz/v1"
+FIREWORKS_BASE_URL = "https://api.fireworks.ai/inference/v1"
+
+# provider -> (API key env var, base URL; None for Anthropic)
+PROVIDERS: dict[str, tuple[str, Optional[str]]] = {
+    "together": ("TOGETHER_API_KEY", TOGETHER_BASE_URL),
+    "fireworks": ("FIREWORKS_API_KEY", FIREWORKS_BASE_URL),
+    "claude": ("ANTHROPIC_API_KEY", None),
+}
+
+POOL_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=32, keepalive_expiry=300.0)
+DEFAULT_TIMEOUT = 300.0
+
+_lock = threading.Lock()
+# (provider, loop): loop is None for the sync pool
+_http_clients: dict[tuple[str, Optional[asyncio.AbstractEventLoop]], Any] = {}
+_sdk_clients: dict[tuple, Any] = {}
+_instructor_clients: dict[tuple, Any] = {}
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def _client_loop() -> asyncio.AbstractEventLoop:
+    """The loop an async client asked for now will run on."""
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return get_engine_loop()
+
+
+def _loop_guard(loop: asyncio.AbstractEventLoop):
+    """httpx request hook: the pool is only used on the loop it belongs to."""
+    async def check(request: httpx.Request) -> None:
+        if asyncio.get_running_loop() is not loop:
+            raise RuntimeError(
+                f"Async LLM client for {request.url.host} used outside the event loop it was created for; "
+                "get the client inside the loop that uses it (or run the call on the engine loop)"
+            )
+    return check
+
+
+def _drop_closed_loops_locked() -> None:
+    for key in [k for k in _http_clients if k[1] is not None and k[1].is_closed()]:
+        del _http_clients[key]
+    for clients in (_sdk_clients, _instructor_clients):
+        for key in [k for k in clients if k[-1] is not None and k[-1].is_closed()]:
+            del clients[key]
+
+
+def _http_client(provider: str, loop: Optional[asyncio.AbstractEventLoop]) -> Any:
+    """The shared httpx pool of a provider: one sync (loop None), one async per event loop."""
+    async_client = loop is not None
+    key = (provider, loop)
+    with _lock:
+        _drop_closed_loops_locked()
+        client = _http_clients.get(key)
+        if client is not None:
+            return client
+        scheduler = get_provider_scheduler(provider)
+        if provider == "claude":
+            import anthropic
+            factory = anthropic.DefaultAsyncHttpxClient if async_client else anthropic.DefaultHttpxClient
+        else:
+            import openai
+            factory = openai.DefaultAsyncHttpxClient if async_client else openai.DefaultHttpxClient
+        if async_client:
+            hooks = [scheduler.httpx_response_hook, call_telemetry.httpx_response_hook]
+        else:
+            hooks = [scheduler.observe_response, call_telemetry.observe_response]
+        event_hooks = {"response": hooks}
+        if async_client:
+            event_hooks["request"] = [_loop_guard(loop)]
+        client = factory(limits=POOL_LIMITS, http2=_http2_available(), event_hooks=event_hooks)
+        _http_clients[key] = client
+        logger.info(
+            "Created %s %s HTTP pool (http2=%s)", provider, "async" if async_client else "sync", _http2_available(),
+        )
+        return client
+
+
+def get_llm_client(
+    provider: str,
+    async_client: bool = False,
+    api_key: Optional[str] = None,
+    timeout: float = DEFAULT_TIMEOUT,
+    base_url: Optional[str] = None,
+) -> Optional[Any]:
+    """
+    Shared SDK client of a provider, or None when its API key isn't set.
+
+    Args:
+        provider: "together", "fireworks" or "claude"
+        async_client: AsyncOpenAI / AsyncAnthropic instead of the sync client,
+            for the running loop (the engine loop when called outside one)
+        api_key: Overrides the provider's API key env var
+        timeout: Request timeout; clients differing only in timeout share a pool
+        base_url: Overrides the provider's base URL (OpenAI-compatible providers)
+    """
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider {provider!r}; expected one of {list(PROVIDERS)}")
+    env_var, default_base_url = PROVIDERS[provider]
+    api_key = api_key or os.getenv(env_var)
+    if not api_key:
+        return None
+    base_url = base_url or default_base_url
+    loop = _client_loop() if async_client else None
+    key = (provider, async_client, api_key, timeout, base_url, loop)
+    with _lock:
+        client = _sdk_clients.get(key)
+    if client is not None:
+        return client
+
+    http_client = _http_client(provider, loop)
+    # Async clients run under the provider schedulers, which do the retrying.
+    retries = {"max_retries": 0} if async_client else {}
+    if provider == "claude":
+        import anthropic
+        cls = anthropic.AsyncAnthropic if async_client else anthropic.Anthropic
+        client = cls(api_key=api_key, timeout=timeout, http_client=http_client, **retries)
+    else:
+        import openai
+        cls = openai.AsyncOpenAI if async_client else openai.OpenAI
+        client = cls(api_key=api_key, base_url=base_url, timeout=timeout, http_client=http_client, **retries)
+    with _lock:
+        return _sdk_clients.setdefault(key, client)
+
+
+def get_instructor_client(
+    provider: str,
+    async_client: bool = False,
+    api_key: Optional[str] = None,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> Optional[Any]:
+    """
+    Shared instructor client over get_llm_client (JSON mode for OpenAI-compatible
+    providers); None when the provider's API key isn't set.
+    """
+    client = get_llm_client(provider, async_client=async_client, api_key=api_key, timeout=timeout)
+    if client is None:
+        return None
+    key = (provider, async_client, id(client), _client_loop() if async_client else None)
+    with _lock:
+        wrapped = _instructor_clients.get(key)
+    if wrapped is not None:
+        return wrapped
+
+    import instructor
+    if provider == "claude":
+        wrapped = instructor.from_anthropic(client)
+    else:
+        wrapped = instructor.from_openai(client, mode=instructor.Mode.JSON)
+    with _lock:
+        return _instructor_clients.setdefault(key, wrapped)
+
+
+def pool_snapshot() -> dict:
+    """Which shared HTTP pools exist and how many SDK clients use them."""
+    snapshot: dict[str, int] = {}
+    with _lock:
+        for provider, loop in _http_clients:
+            name = f"{provider}:{'async' if loop is not None else 'sync'}"
+            clients = sum(1 for k in _sdk_clients if k[0] == provider and k[-1] is loop)
+            snapshot[name] = snapshot.get(name, 0) + clients
+    return snapshot
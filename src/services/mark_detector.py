@@ -0,0 +1,353 @@
+"""
+Local detection of circled / marked options on selection fields.
+
+Most orofacial pages are grids of YES/NO questions and circled option
+lists. With a region atlas for the blank template (see ``template_atlas``)
+each printed option has a box, so whether it was marked can be read by
+diffing the filled page against the blank inside that box: a hand-drawn
+circle is new ink in a ring around the printed word. That takes a few
+milliseconds per field with NumPy/SciPy.
+
+Only readings that are clear-cut are reported as certain — one ring-marked
+option (or none at all) for single-choice fields, every option clearly
+marked or clearly empty for multi-select ones, and no other new ink in the
+field's box (notes, strike-throughs, cancelled circles). Certain fields are
+pre-filled and left out of the VLM schema (unanswered ones at a lower
+confidence, so Stage 2 still checks them); everything else still goes to
+the model.
+"""
+
+import logging
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+from scipy import ndimage
+
+from ..models import FieldType, FormFieldSchema, PageSchema, SectionSchema
+from .field_regions import FieldRegionAtlas
+from .page_ink import blank_ink_mask, dilate, ink_mask, load_registered_rgb
+
+logger = logging.getLogger(__name__)
+
+YES_NO_OPTIONS = {
+    FieldType.YES_NO: ["YES", "NO"],
+    FieldType.YES_NO_NA: ["YES", "NO", "N/A"],
+    FieldType.YES_NO_SOMETIMES: ["YES", "NO", "SOMETIMES"],
+}
+SINGLE_CHOICE_TYPES = (
+    FieldType.YES_NO, FieldType.YES_NO_NA, FieldType.YES_NO_SOMETIMES,
+    FieldType.RADIO_GROUP, FieldType.CHECKBOX_SINGLE, FieldType.NUMERIC_SCALE,
+)
+MULTI_CHOICE_TYPES = (FieldType.CIRCLED_SELECTION, FieldType.CHECKBOX_MULTI)
+
+
+@dataclass(frozen=True)
+class MarkReading:
+    """Detector outcome for one selection field."""
+
+    field_id: str
+    field_type: FieldType
+    selected: tuple[str, ...]
+    certain: bool
+    reason: str
+    scores: dict[str, float] = field(default_factory=dict)
+
+
+# =============================================================================
+# SCHEMA HELPERS
+# =============================================================================
+
+def _iter_fields(page_schema: PageSchema) -> Iterable[FormFieldSchema]:
+    def walk(section: SectionSchema):
+        yield from section.fields
+        for sub in section.subsections:
+            yield from walk(sub)
+
+    yield from page_schema.standalone_fields
+    for section in page_schema.sections:
+        yield from walk(section)
+
+
+def field_options(field_schema: FormFieldSchema) -> list[str]:
+    """Printed options of a selection field (YES/NO pairs are implied by the type)."""
+    if field_schema.field_type in YES_NO_OPTIONS:
+        return YES_NO_OPTIONS[field_schema.field_type]
+    return list(field_schema.options or [])
+
+
+# =============================================================================
+# DETECTOR
+# =============================================================================
+
+@dataclass
+class MarkDetector:
+    """
+    Reads selection fields from the filled-vs-blank ink difference.
+
+    New ink is split into strokes (connected components). A stroke whose
+    bounding box encloses the centre of exactly one printed option is a
+    mark on that option — a circle, or a line through the word. Strokes
+    enclosing several options (circles on adjacent rows that touch) or
+    touching a word without enclosing it (underlines, ticks, partial
+    circles) make the field ambiguous. Scores are fractions of pixels, so
+    they don't depend on scan resolution.
+
+    Args:
+        enabled: Run the detector at all (LOCAL_MARK_DETECTION)
+        mark_threshold: New ink, as a fraction of the ring around a word, a
+            mark needs; weaker marks make the field ambiguous
+        inner_threshold: New ink inside the printed word above which the
+            option may be struck through or cancelled (ambiguous)
+        side_threshold: New ink a side of the ring needs to count as
+            touched; a circle touches at least three sides of the word
+        stray_threshold: New ink elsewhere on the field's line above which
+            there is handwriting the model should read (ambiguous)
+        min_alignment: Fraction of the blank's printed ink that must be found
+            on the filled page after the local shift search
+        search_radius: Max local misalignment searched, as a fraction of page width
+        prefill_confidence: Confidence given to certain readings with a mark
+        unanswered_confidence: Confidence given to certain readings with no
+            mark at all. Finding nothing is weaker evidence than finding a
+            circle (a faint tick or a mark outside the atlas box is missed),
+            so it stays below the verifier's field threshold and Stage 2
+            re-checks it.
+    """
+
+    enabled: bool = True
+    mark_threshold: float = 0.03
+    inner_threshold: float = 0.12
+    side_threshold: float = 0.04
+    stray_threshold: float = 0.004
+    min_alignment: float = 0.6
+    search_radius: float = 0.006
+    prefill_confidence: float = 0.95
+    unanswered_confidence: float = 0.7
+
+    @classmethod
+    def from_env(cls) -> "MarkDetector":
+        """Detector configured from LOCAL_MARK_DETECTION."""
+        return cls(enabled=os.getenv("LOCAL_MARK_DETECTION", "true").lower() in ("1", "true", "yes"))
+
+    def detect(
+        self,
+        filled_image_path: Path,
+        blank_image_path: Path,
+        page_schema: PageSchema,
+        atlas: FieldRegionAtlas,
+    ) -> dict[str, MarkReading]:
+        """
+        Read every selection field of a page whose options are all in the atlas.
+
+        Returns:
+            field_id -> MarkReading (certain or not) for each field examined
+        """
+        blank = blank_ink_mask(blank_image_path)
+        height, width = blank.shape
+        filled = load_registered_rgb(filled_image_path, blank_image_path)
+        radius = max(2, int(self.search_radius * width))
+        page_boxes = {
+            _px(box, width, height) for region in atlas.regions.values() for box in region.options.values()
+        }
+
+        readings: dict[str, MarkReading] = {}
+        for field_schema in _iter_fields(page_schema):
+            if field_schema.field_type not in SINGLE_CHOICE_TYPES + MULTI_CHOICE_TYPES:
+                continue
+            region = atlas.get(field_schema.field_id)
+            options = field_options(field_schema)
+            if region is None or not options or any(o not in region.options for o in options):
+                continue
+            opt_boxes = {o: _px(region.options[o], width, height) for o in options}
+            if _overlapping(list(opt_boxes.values())):
+                # The atlas couldn't separate the printed options.
+                continue
+            readings[field_schema.field_id] = self._read_field(
+                field_schema, opt_boxes, _px(region.box, width, height), blank, filled, radius, page_boxes,
+            )
+        return readings
+
+    def _read_field(self, field_schema, opt_boxes, field_box, blank, filled, radius, page_boxes) -> MarkReading:
+        height, width = blank.shape
+        fid, ftype = field_schema.field_id, field_schema.field_type
+        options = list(opt_boxes)
+
+        rings = {o: _pad(box, 0.7 * (box[3] - box[1])) for o, box in opt_boxes.items()}
+        # The field box is padded into the neighbouring rows; judge stray ink
+        # only on the field's own line.
+        line = (
+            min([field_box[0]] + [b[0] for b in opt_boxes.values()]),
+            min(b[1] for b in opt_boxes.values()),
+            max([field_box[2]] + [b[2] for b in opt_boxes.values()]),
+            max(b[3] for b in opt_boxes.values()),
+        )
+        # Work on a window with a margin, so strokes crossing into the line
+        # from neighbouring rows are seen whole.
+        margin = 2 * max(b[3] - b[1] for b in opt_boxes.values())
+        x0, y0 = max(0, line[0] - margin), max(0, line[1] - margin)
+        x1, y1 = min(width, line[2] + margin), min(height, line[3] + margin)
+
+        blank_win = blank[y0:y1, x0:x1]
+        probe = (
+            slice(max(0, min(r[1] for r in rings.values()) - y0), max(r[3] for r in rings.values()) - y0),
+            slice(max(0, min(r[0] for r in rings.values()) - x0), max(r[2] for r in rings.values()) - x0),
+        )
+        shifted, alignment = _align_window(filled, blank_win, x0, y0, radius, probe)
+        if alignment < self.min_alignment:
+            return MarkReading(fid, ftype, (), False, f"alignment {alignment:.2f}")
+
+        printed = dilate(blank_win, 3)
+        added = ndimage.binary_opening(shifted & ~printed, structure=np.ones((2, 2), dtype=bool))
+        # Strokes crossing printed ink (table rules, letters) are cut by the
+        # diff; bridge small gaps, and gaps through printed ink, before
+        # splitting the new ink into strokes.
+        connect = dilate(added, 3)
+        connect |= dilate(connect, 4) & printed
+        labels, _ = ndimage.label(connect, structure=np.ones((3, 3), dtype=bool))
+        labels[~added] = 0
+
+        def local(box) -> tuple[slice, slice]:
+            return (
+                slice(max(0, box[1] - y0), max(0, box[3] - y0)),
+                slice(max(0, box[0] - x0), max(0, box[2] - x0)),
+            )
+
+        centres = {
+            box: ((box[0] + box[2]) / 2 - x0, (box[1] + box[3]) / 2 - y0)
+            for box in page_boxes
+            if box[0] < x1 and box[2] > x0 and box[1] < y1 and box[3] > y0
+        }
+        near = {o: local(_pad(box, max(2, (box[3] - box[1]) // 4))) for o, box in opt_boxes.items()}
+        own = {box: o for o, box in opt_boxes.items()}
+        marks: dict[str, np.ndarray] = {o: np.zeros(labels.shape, dtype=bool) for o in options}
+        stray = np.zeros(labels.shape, dtype=bool)
+
+        for index, sl in enumerate(ndimage.find_objects(labels), start=1):
+            if sl is None:
+                continue
+            stroke = labels[sl] == index
+            enclosed = [
+                box for box, (cx, cy) in centres.items()
+                if sl[1].start <= cx < sl[1].stop and sl[0].start <= cy < sl[0].stop
+            ]
+            touching = [
+                o for o, (ys, xs) in near.items()
+                if (labels[ys, xs] == index).any()
+            ]
+            if len(enclosed) == 1 and enclosed[0] in own:
+                marks[own[enclosed[0]]][sl] |= stroke
+            elif len(enclosed) > 1 and (touching or any(box in own for box in enclosed)):
+                return MarkReading(fid, ftype, (), False, "stroke encloses several options")
+            elif not enclosed and touching:
+                return MarkReading(fid, ftype, (), False, f"unclear mark at {touching[0]!r}")
+            elif not enclosed:
+                stray[sl] |= stroke
+
+        def frac(mask: np.ndarray, box, exclude=()) -> float:
+            area = np.zeros(mask.shape, dtype=bool)
+            area[local(box)] = True
+            for ex in exclude:
+                area[local(ex)] = False
+            total = int(area.sum())
+            return float(mask[area].sum()) / total if total else 0.0
+
+        scores: dict[str, float] = {}
+        marked: list[str] = []
+        for option in options:
+            box, ring, ink = opt_boxes[option], rings[option], marks[option]
+            if not ink.any():
+                scores[option] = 0.0
+                continue
+            if frac(ink, _shrink(box, 0.15)) > self.inner_threshold:
+                return MarkReading(fid, ftype, (), False, f"ink through {option!r}", scores)
+            score = scores[option] = round(frac(ink, ring, exclude=(box,)), 4)
+            bx0, by0, bx1, by1 = box
+            rx0, ry0, rx1, ry1 = ring
+            sides = sum(
+                frac(ink, strip) >= self.side_threshold
+                for strip in ((rx0, by0, bx0, by1), (bx1, by0, rx1, by1), (bx0, ry0, bx1, by0), (bx0, by1, bx1, ry1))
+            )
+            if score < self.mark_threshold or sides < 3:
+                return MarkReading(fid, ftype, (), False, f"partial mark at {option!r}", scores)
+            marked.append(option)
+
+        stray_level = frac(stray, line, exclude=tuple(rings.values()))
+        if stray_level > self.stray_threshold:
+            return MarkReading(fid, ftype, (), False, f"other ink in field ({stray_level:.3f})", scores)
+
+        if ftype in SINGLE_CHOICE_TYPES and len(marked) > 1:
+            return MarkReading(fid, ftype, tuple(marked), False, "several options marked", scores)
+        return MarkReading(fid, ftype, tuple(marked), True, "marked" if marked else "unanswered", scores)
+
+
+def _px(box, width: int, height: int) -> tuple[int, int, int, int]:
+    return (int(box[0] * width), int(box[1] * height), int(box[2] * width), int(box[3] * height))
+
+
+def _pad(box: tuple[int, int, int, int], pad: float) -> tuple[int, int, int, int]:
+    pad = int(pad)
+    return (box[0] - pad, box[1] - pad, box[2] + pad, box[3] + pad)
+
+
+def _shrink(box: tuple[int, int, int, int], fraction: float) -> tuple[int, int, int, int]:
+    x0, y0, x1, y1 = box
+    dx, dy = int((x1 - x0) * fraction), int((y1 - y0) * fraction)
+    return (x0 + dx, y0 + dy, x1 - dx, y1 - dy)
+
+
+def _overlapping(boxes: list[tuple[int, int, int, int]]) -> bool:
+    return any(
+        a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+        for i, a in enumerate(boxes) for b in boxes[i + 1:]
+    )
+
+
+def _align_window(
+    filled_rgb: np.ndarray,
+    blank_win: np.ndarray,
+    x0: int,
+    y0: int,
+    radius: int,
+    probe: tuple[slice, slice],
+) -> tuple[np.ndarray, float]:
+    """
+    Filled-page ink for a window, shifted to best cover the blank's ink.
+
+    Searches integer shifts within ``radius`` (coarse, then ±1 around the
+    best), scoring only the ``probe`` part of the window (where the
+    printed options are). Returns the aligned window and the fraction of
+    the probe's blank ink covered.
+    """
+    h, w = blank_win.shape
+    height, width = filled_rgb.shape[:2]
+    padded = np.zeros((h + 2 * radius, w + 2 * radius), dtype=bool)
+    sy0, sx0 = max(0, y0 - radius), max(0, x0 - radius)
+    sy1, sx1 = min(height, y0 + h + radius), min(width, x0 + w + radius)
+    padded[sy0 - (y0 - radius):sy1 - (y0 - radius), sx0 - (x0 - radius):sx1 - (x0 - radius)] = ink_mask(
+        filled_rgb[sy0:sy1, sx0:sx1]
+    )
+
+    ys, xs = probe
+    blank_probe = blank_win[ys, xs]
+    blank_total = int(blank_probe.sum())
+    if blank_total == 0:
+        # Printed options are always ink; alignment can't be confirmed.
+        return padded[radius:radius + h, radius:radius + w], 0.0
+
+    def overlap(dy: int, dx: int) -> int:
+        shifted = padded[radius + dy + ys.start:radius + dy + ys.stop, radius + dx + xs.start:radius + dx + xs.stop]
+        return int(np.count_nonzero(shifted & blank_probe))
+
+    step = max(1, radius // 4)
+    coarse = range(-radius, radius + 1, step)
+    best = max(((dy, dx) for dy in coarse for dx in coarse), key=lambda s: overlap(*s))
+    fine = [
+        (best[0] + dy, best[1] + dx)
+        for dy in (-1, 0, 1) for dx in (-1, 0, 1)
+        if abs(best[0] + dy) <= radius and abs(best[1] + dx) <= radius
+    ]
+    dy, dx = max(fine, key=lambda s: overlap(*s))
+    window = padded[radius + dy:radius + dy + h, radius + dx:radius + dx + w]
+    return window, overlap(dy, dx) / blank_total
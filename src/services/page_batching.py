@@ -0,0 +1,153 @@
+"""
+When to pack several pages into one Stage 1 request.
+
+Both providers accept several images per request, and most of a Stage 1
+prompt is the same extraction rules for every page. Short or sparse pages
+(few fields left after local mark detection, small schema, little expected
+output) can share one call: the rules are sent once, and the combined
+result is split back per page. Long pages still go alone — one large
+structured output per page is more reliable than one huge output for
+several — and a batch never exceeds the provider's image limit.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from ..models import PageSchema, SectionSchema, TableSchema
+from .prompt_schema import compact_page_schema
+
+DEFAULT_MAX_PAGES = 4
+DEFAULT_MAX_IMAGES = 4
+DEFAULT_MAX_PAGE_SCHEMA_TOKENS = 1200
+DEFAULT_MAX_BATCH_OUTPUT_TOKENS = 4000
+
+TOKENS_PER_FIELD = 40        # one ExtractedField object in the JSON output
+TOKENS_PER_TABLE_CELL = 12
+DEFAULT_TABLE_ROWS = 5
+
+
+def _count_fields_and_cells(page_schema: PageSchema) -> tuple[int, int]:
+    fields, cells = len(page_schema.standalone_fields), 0
+
+    def table_cells(table: TableSchema) -> int:
+        rows = table.expected_rows or len(table.row_labels or []) or DEFAULT_TABLE_ROWS
+        return rows * max(1, len(table.columns))
+
+    def walk(section: SectionSchema) -> None:
+        nonlocal fields, cells
+        fields += len(section.fields)
+        cells += sum(table_cells(t) for t in section.tables)
+        for sub in section.subsections:
+            walk(sub)
+
+    cells += sum(table_cells(t) for t in page_schema.standalone_tables)
+    for section in page_schema.sections:
+        walk(section)
+    return fields, cells
+
+
+def estimate_output_tokens(page_schema: Optional[PageSchema]) -> Optional[int]:
+    """Rough Stage 1 output size for a page; None without a schema (unbounded)."""
+    if page_schema is None:
+        return None
+    fields, cells = _count_fields_and_cells(page_schema)
+    return fields * TOKENS_PER_FIELD + cells * TOKENS_PER_TABLE_CELL
+
+
+@dataclass(frozen=True)
+class BatchCandidate:
+    """What the planner needs to know about one prepared page."""
+
+    index: int
+    schema_tokens: Optional[int]
+    output_tokens: Optional[int]
+    images: int
+    group: tuple  # pages batch only with pages of the same group (mode, provider)
+
+
+def batch_candidate(
+    index: int,
+    page_schema: Optional[PageSchema],
+    images: int,
+    group: tuple = (),
+) -> BatchCandidate:
+    """Candidate for a page whose (possibly reduced) schema is ``page_schema``."""
+    return BatchCandidate(
+        index=index,
+        schema_tokens=compact_page_schema(page_schema).tokens_after if page_schema else None,
+        output_tokens=estimate_output_tokens(page_schema),
+        images=images,
+        group=group,
+    )
+
+
+@dataclass
+class PageBatchPolicy:
+    """
+    Groups pages into shared Stage 1 requests.
+
+    Args:
+        enabled: Batch at all (EXTRACTION_BATCH_PAGES)
+        max_pages: Pages per request
+        max_images: Images per request, blanks included (EXTRACTION_BATCH_MAX_IMAGES)
+        max_page_schema_tokens: Pages with a longer compact schema go alone
+        max_batch_output_tokens: Expected Stage 1 output of one request;
+            pages expected to produce more than half of it go alone
+    """
+
+    enabled: bool = False
+    max_pages: int = DEFAULT_MAX_PAGES
+    max_images: int = DEFAULT_MAX_IMAGES
+    max_page_schema_tokens: int = DEFAULT_MAX_PAGE_SCHEMA_TOKENS
+    max_batch_output_tokens: int = DEFAULT_MAX_BATCH_OUTPUT_TOKENS
+
+    @classmethod
+    def from_env(cls) -> "PageBatchPolicy":
+        """Policy from EXTRACTION_BATCH_PAGES / EXTRACTION_BATCH_MAX_IMAGES."""
+        return cls(
+            enabled=os.getenv("EXTRACTION_BATCH_PAGES", "false").lower() in ("1", "true", "yes"),
+            max_images=int(os.getenv("EXTRACTION_BATCH_MAX_IMAGES", DEFAULT_MAX_IMAGES)),
+        )
+
+    def worth_batching(self, candidate: BatchCandidate) -> bool:
+        """Whether a page is short and sparse enough to share a request."""
+        return (
+            candidate.schema_tokens is not None
+            and candidate.output_tokens is not None
+            and candidate.schema_tokens <= self.max_page_schema_tokens
+            and candidate.output_tokens <= self.max_batch_output_tokens // 2
+            and candidate.images <= self.max_images // 2
+        )
+
+    def plan(self, candidates: list[BatchCandidate]) -> list[list[int]]:
+        """
+        Split pages into requests, keeping page order within each group.
+
+        Batchable pages are packed greedily, in page order per group, while
+        the request stays within the page, image and output limits.
+
+        Returns:
+            Lists of candidate indexes; single-element lists run alone
+        """
+        batches: list[list[int]] = []
+        open_batches: dict[tuple, tuple[list[int], int, int]] = {}
+        for candidate in candidates:
+            if not self.enabled or not self.worth_batching(candidate):
+                batches.append([candidate.index])
+                continue
+            current = open_batches.get(candidate.group)
+            if current is not None:
+                members, images, output = current
+                if (
+                    len(members) < self.max_pages
+                    and images + candidate.images <= self.max_images
+                    and output + candidate.output_tokens <= self.max_batch_output_tokens
+                ):
+                    members.append(candidate.index)
+                    open_batches[candidate.group] = (members, images + candidate.images, output + candidate.output_tokens)
+                    continue
+            members = [candidate.index]
+            batches.append(members)
+            open_batches[candidate.group] = (members, candidate.images, candidate.output_tokens)
+        return batches
@@ -0,0 +1,263 @@
+"""
+Perceptual hashes of page images, for spotting pages extracted before.
+
+Annotators re-export the same pages and staff re-upload the same packets,
+and every upload used to pay for a full two-stage extraction. Each page
+that is extracted is hashed (a difference hash and a DCT hash, both
+256-bit, computed with NumPy) and indexed under its page-schema key; a
+later page of the same schema whose hashes are both within a few bits of
+an indexed page, and whose ink matches it, is the same scan. By default
+("seed" mode) the earlier result is handed to Stage 2 to verify against
+the new image; "reuse" mode returns it as is.
+
+Hashes are compared over the whole page at 16x16 resolution, so a
+re-export, re-compression or slight rescale stays within a few bits while
+a different patient's handwriting on the same form moves many. A single
+small mark added to an otherwise identical page can stay within those
+distances, so each page also keeps a coarse ink grid (INK_GRID² cells, a
+few pixels each, at two ink levels), and a match needs no patch of cells
+that are well inked on one page and (nearly) empty on the other. Candidate lookup is by exact match on any of the dHash's
+eight 32-bit bands: two hashes within MAX_INDEXED_DISTANCE bits always
+share at least one band.
+"""
+
+import base64
+import hashlib
+import logging
+import os
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from ..models import PageSchema
+from ..models.annotations import PageExtractionResult
+from .page_ink import densest_tile, ink_mask, shift_mask
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 16                 # hashes are HASH_SIZE² bits
+HASH_BITS = HASH_SIZE * HASH_SIZE
+BAND_BITS = 32
+BANDS = HASH_BITS // BAND_BITS
+# Largest dHash distance the band lookup is guaranteed to find.
+MAX_INDEXED_DISTANCE = BANDS - 1
+DCT_SIZE = 64
+INK_GRID = 256                 # ink grids are INK_GRID x INK_GRID cells
+INK_SHIFT = 3                  # cells of page offset searched when comparing ink
+INK_TILE = 16                  # cells per side of the patches ink differences are measured over
+INK_MARGIN = 8                 # border cells ignored (scanner edges, punch holes)
+
+REUSE = "reuse"
+SEED = "seed"
+DUPLICATE_MODES = (REUSE, SEED)
+
+
+@dataclass(frozen=True)
+class PageHash:
+    """dHash and pHash of one page image, as HASH_BITS-bit integers, and its packed ink grid."""
+
+    dhash: int
+    phash: int
+    ink: bytes = field(default=b"", compare=False, repr=False)
+
+    @property
+    def dhash_hex(self) -> str:
+        return f"{self.dhash:0{HASH_BITS // 4}x}"
+
+    @property
+    def phash_hex(self) -> str:
+        return f"{self.phash:0{HASH_BITS // 4}x}"
+
+    @property
+    def ink_b64(self) -> str:
+        """The ink grid, compressed (mostly empty cells) and base64-encoded."""
+        return base64.b64encode(zlib.compress(self.ink)).decode("ascii")
+
+    @classmethod
+    def from_hex(cls, dhash: str, phash: str, ink_b64: Optional[str] = None) -> "PageHash":
+        ink = zlib.decompress(base64.b64decode(ink_b64)) if ink_b64 else b""
+        return cls(int(dhash, 16), int(phash, 16), ink)
+
+    def bands(self) -> list[str]:
+        """The dHash's BANDS bands as "index:hex" keys, for candidate lookup."""
+        mask = (1 << BAND_BITS) - 1
+        return [f"{i}:{(self.dhash >> (i * BAND_BITS)) & mask:08x}" for i in range(BANDS)]
+
+    def distance(self, other: "PageHash") -> tuple[int, int]:
+        """(dHash, pHash) Hamming distances to another page."""
+        return (self.dhash ^ other.dhash).bit_count(), (self.phash ^ other.phash).bit_count()
+
+    def ink_difference(self, other: "PageHash") -> Optional[float]:
+        """
+        Densest-patch fraction of cells well inked on one page and (nearly)
+        empty on the other, after aligning them; None if either has no ink grid.
+        """
+        if len(self.ink) != 2 * INK_GRID * INK_GRID // 8 or len(other.ink) != len(self.ink):
+            return None
+        shape = (2, INK_GRID, INK_GRID)
+        mine = np.unpackbits(np.frombuffer(self.ink, dtype=np.uint8)).reshape(shape).astype(bool)
+        theirs = np.unpackbits(np.frombuffer(other.ink, dtype=np.uint8)).reshape(shape).astype(bool)
+        # Exact overlap, nearest shift first: re-exports of one page are
+        # usually not shifted at all.
+        shifts = sorted(
+            ((dy, dx) for dy in range(-INK_SHIFT, INK_SHIFT + 1) for dx in range(-INK_SHIFT, INK_SHIFT + 1)),
+            key=lambda s: abs(s[0]) + abs(s[1]),
+        )
+        dy, dx = max(shifts, key=lambda s: np.count_nonzero(shift_mask(mine[1], *s) & theirs[1]))
+        mine = shift_mask(mine[0], dy, dx), shift_mask(mine[1], dy, dx)
+        # Cells near a level boundary flip between exports; between levels they can't.
+        differing = (mine[1] & ~theirs[0]) | (theirs[1] & ~mine[0])
+        return densest_tile(differing[INK_MARGIN:-INK_MARGIN, INK_MARGIN:-INK_MARGIN], INK_TILE)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.astype(np.uint8).ravel()).tobytes(), "big")
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II matrix (rows are basis vectors)."""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT = _dct_matrix(DCT_SIZE)
+
+
+def compute_page_hash(image_path: Path) -> PageHash:
+    """Hash a page image (grayscale, whole page, aspect ratio ignored)."""
+    from PIL import Image
+
+    # No JPEG draft decoding here: it would hash a JPEG and a PNG export
+    # of the same page a few bits apart.
+    with Image.open(image_path) as img:
+        rgb = img.convert("RGB")
+        gray = rgb.convert("L")
+        # One box reduction, then both hash grids from it.
+        small = gray.resize((DCT_SIZE * 2, DCT_SIZE * 2), Image.Resampling.BOX)
+    pixels = np.asarray(small.resize((DCT_SIZE, DCT_SIZE), Image.Resampling.BOX), dtype=np.float64)
+
+    # dHash: does brightness increase left to right between neighbouring cells?
+    grid = np.asarray(small.resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BOX), dtype=np.int16)
+    dhash = _bits_to_int(grid[:, 1:] > grid[:, :-1])
+
+    # pHash: signs of the low-frequency DCT coefficients (steadier under
+    # re-compression than comparing them to their median).
+    low = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE]
+    phash = _bits_to_int(low > 0)
+    return PageHash(dhash, phash, _ink_grid(np.asarray(rgb)))
+
+
+def _ink_grid(rgb: np.ndarray) -> bytes:
+    """
+    Packed INK_GRID x INK_GRID grids of a page's ink at two levels: cells
+    with any ink to speak of (a sixteenth of their pixels), and cells a
+    stroke crosses (a quarter).
+    """
+    mask = ink_mask(rgb)
+    height, width = mask.shape
+    if height < INK_GRID or width < INK_GRID:
+        return b""
+    # Cell edges spread over the whole page (cells differ by a pixel at most).
+    rows = np.linspace(0, height, INK_GRID + 1).astype(int)
+    cols = np.linspace(0, width, INK_GRID + 1).astype(int)
+    counts = np.add.reduceat(np.add.reduceat(mask.astype(np.int32), rows[:-1], axis=0), cols[:-1], axis=1)
+    area = np.outer(np.diff(rows), np.diff(cols))
+    return np.packbits([counts * 16 >= area, counts * 4 >= area]).tobytes()
+
+
+def page_schema_key(page_schema: Optional[PageSchema], extraction_mode: str) -> str:
+    """Key of what a page was extracted against: its page schema and extraction mode."""
+    schema_json = page_schema.model_dump_json() if page_schema is not None else ""
+    return hashlib.sha256(f"{extraction_mode}\x1f{schema_json}".encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class DuplicateMatch:
+    """An earlier extraction of the same page."""
+
+    job_id: str
+    page_number: int
+    result: PageExtractionResult
+    dhash_distance: int
+    phash_distance: int
+
+
+class DuplicatePageIndex:
+    """
+    Where page hashes and the results they point at are kept.
+
+    The pipeline only defines the interface (it has no database access);
+    the API backs it with Supabase (see job_manager.find_duplicate_page).
+    Both methods run off the event loop and may do blocking I/O.
+    """
+
+    def find(self, page_hash: PageHash, schema_key: str, detector: "DuplicatePageDetector") -> Optional[DuplicateMatch]:
+        """Closest indexed page within the detector's distances, if any."""
+        raise NotImplementedError
+
+    def add(self, page_number: int, page_hash: PageHash, schema_key: str) -> None:
+        """Index a page that was just extracted."""
+        raise NotImplementedError
+
+
+@dataclass
+class DuplicatePageDetector:
+    """
+    Decides whether a page is a near-exact copy of one extracted before.
+
+    Args:
+        enabled: Look pages up at all (DUPLICATE_PAGE_REUSE); lookups also
+            need an index passed to extract_form
+        mode: "seed" sends the earlier result to Stage 2 as the extraction
+            to verify against the new image (Stage 2 always runs for it);
+            "reuse" returns it as is (DUPLICATE_PAGE_MODE)
+        max_dhash_distance: Largest dHash distance of a duplicate, in bits
+            (at most MAX_INDEXED_DISTANCE)
+        max_phash_distance: Largest pHash distance of a duplicate, in bits
+        max_ink_difference: Largest densest-patch fraction of cells inked on
+            one page only (a cell is 1/256 of a patch; a short pen tick
+            covers three or more)
+    """
+
+    enabled: bool = True
+    mode: str = SEED
+    max_dhash_distance: int = MAX_INDEXED_DISTANCE
+    max_phash_distance: int = 8
+    max_ink_difference: float = 0.005
+
+    def __post_init__(self):
+        if self.mode not in DUPLICATE_MODES:
+            raise ValueError(f"Unknown duplicate-page mode {self.mode!r} (expected one of {DUPLICATE_MODES})")
+        if not 0 <= self.max_dhash_distance <= MAX_INDEXED_DISTANCE:
+            raise ValueError(f"max_dhash_distance must be between 0 and {MAX_INDEXED_DISTANCE}")
+
+    @classmethod
+    def from_env(cls) -> "DuplicatePageDetector":
+        """Detector from DUPLICATE_PAGE_REUSE / DUPLICATE_PAGE_MODE / DUPLICATE_MAX_*."""
+        return cls(
+            enabled=os.getenv("DUPLICATE_PAGE_REUSE", "true").lower() in ("1", "true", "yes"),
+            mode=os.getenv("DUPLICATE_PAGE_MODE", SEED).lower(),
+            max_dhash_distance=int(os.getenv("DUPLICATE_MAX_DHASH_DISTANCE", MAX_INDEXED_DISTANCE)),
+            max_phash_distance=int(os.getenv("DUPLICATE_MAX_PHASH_DISTANCE", 8)),
+            max_ink_difference=float(os.getenv("DUPLICATE_MAX_INK_DIFFERENCE", 0.005)),
+        )
+
+    def matches(self, page_hash: PageHash, other: PageHash) -> Optional[tuple[int, int]]:
+        """
+        (dHash, pHash) distances if ``other`` is a duplicate of ``page_hash``,
+        else None. Pages without an ink grid to compare never match.
+        """
+        dhash_distance, phash_distance = page_hash.distance(other)
+        if dhash_distance > self.max_dhash_distance or phash_distance > self.max_phash_distance:
+            return None
+        ink_difference = page_hash.ink_difference(other)
+        if ink_difference is None or ink_difference > self.max_ink_difference:
+            logger.debug("Hashes match but ink differs (%s)", ink_difference)
+            return None
+        return dhash_distance, phash_distance
@@ -0,0 +1,148 @@
+"""
+Ink masks of blank templates and filled pages.
+
+Differential extraction compares a filled page with its blank template. The
+classical-CV readers (mark detection, blank-page detection) work on boolean
+ink masks in the blank template's coordinates (filled pages are registered
+onto the template first): dark pixels plus clearly colored pen strokes.
+Blank masks are computed once per process.
+"""
+
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from scipy import ndimage
+
+from .page_registration import get_page_registrar
+
+INK_THRESHOLD = 160          # gray level below which a pixel counts as ink
+COLOR_INK_CHROMA = 60        # max-min channel spread of colored (red, blue...) pen ink
+COLOR_INK_MAX_GRAY = 235
+
+
+def ink_mask(rgb: np.ndarray) -> np.ndarray:
+    """Ink mask of an RGB array: dark pixels plus clearly colored pen strokes."""
+    r, g, b = (rgb[..., i].astype(np.int32) for i in range(3))
+    gray = (r * 77 + g * 150 + b * 29) >> 8
+    chroma = np.maximum(np.maximum(r, g), b) - np.minimum(np.minimum(r, g), b)
+    return (gray < INK_THRESHOLD) | ((chroma > COLOR_INK_CHROMA) & (gray < COLOR_INK_MAX_GRAY))
+
+
+def load_rgb(image_path: Path, size: Optional[tuple[int, int]] = None) -> np.ndarray:
+    """RGB array of an image, resized to (width, height) if given."""
+    from PIL import Image
+
+    with Image.open(image_path) as img:
+        img = img.convert("RGB")
+        if size and img.size != size:
+            img = img.resize(size, Image.Resampling.BILINEAR)
+        return np.asarray(img)
+
+
+def load_registered_rgb(filled_image_path: Path, blank_image_path: Path) -> np.ndarray:
+    """RGB array of a filled page registered onto its blank template (template size)."""
+    from PIL import Image
+
+    registration = get_page_registrar().register_page(filled_image_path, blank_image_path)
+    with Image.open(filled_image_path) as img:
+        return np.asarray(registration.warp(img))
+
+
+_blank_ink: dict[Path, tuple[int, np.ndarray]] = {}
+_blank_ink_lock = threading.Lock()
+
+
+def blank_ink_mask(blank_image_path: Path) -> np.ndarray:
+    """Ink mask of a blank template, cached per process by file mtime."""
+    path = Path(blank_image_path).resolve()
+    mtime_ns = path.stat().st_mtime_ns
+    with _blank_ink_lock:
+        cached = _blank_ink.get(path)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
+    mask = ink_mask(load_rgb(path))
+    with _blank_ink_lock:
+        _blank_ink[path] = (mtime_ns, mask)
+    return mask
+
+
+def dilate(mask: np.ndarray, pixels: int) -> np.ndarray:
+    """Square dilation (separable, so cheap on large windows)."""
+    return ndimage.maximum_filter(mask, size=2 * pixels + 1)
+
+
+def shift_mask(mask: np.ndarray, dy: int, dx: int) -> np.ndarray:
+    """``mask`` moved so that out[y, x] == mask[y + dy, x + dx]; uncovered pixels are False."""
+    h, w = mask.shape
+    out = np.zeros_like(mask)
+    out[max(0, -dy):h - max(0, dy), max(0, -dx):w - max(0, dx)] = (
+        mask[max(0, dy):h - max(0, -dy), max(0, dx):w - max(0, -dx)]
+    )
+    return out
+
+
+def _overlap(moving: np.ndarray, fixed: np.ndarray, dy: int, dx: int) -> int:
+    """Pixels set in both ``fixed`` and ``moving`` shifted by (dy, dx)."""
+    h, w = fixed.shape
+    a = moving[max(0, dy):h - max(0, -dy), max(0, dx):w - max(0, -dx)]
+    b = fixed[max(0, -dy):h - max(0, dy), max(0, -dx):w - max(0, dx)]
+    return int(np.count_nonzero(a & b))
+
+
+def reduce_mask(mask: np.ndarray, factor: int) -> np.ndarray:
+    """Mask downscaled by an integer factor; a cell is set if any of its pixels is."""
+    if factor <= 1:
+        return mask
+    h, w = (mask.shape[0] // factor) * factor, (mask.shape[1] // factor) * factor
+    return mask[:h, :w].reshape(h // factor, factor, w // factor, factor).any(axis=(1, 3))
+
+
+def densest_tile(mask: np.ndarray, tile: int) -> float:
+    """Fraction of set pixels in the densest tile x tile patch of a mask."""
+    rows, cols = mask.shape[0] // tile, mask.shape[1] // tile
+    if rows == 0 or cols == 0:
+        return float(mask.mean()) if mask.size else 0.0
+    # Half-tile offsets so a stroke split across a tile edge still
+    # lands whole in one tile.
+    best = 0
+    for oy in (0, tile // 2):
+        for ox in (0, tile // 2):
+            sub = mask[oy:oy + (rows - (1 if oy else 0)) * tile, ox:ox + (cols - (1 if ox else 0)) * tile]
+            if sub.size:
+                r, c = sub.shape[0] // tile, sub.shape[1] // tile
+                best = max(best, int(sub.reshape(r, tile, c, tile).sum(axis=(1, 3)).max()))
+    return best / (tile * tile)
+
+
+def page_shift(filled: np.ndarray, blank: np.ndarray, radius: int) -> tuple[int, int, float]:
+    """
+    Integer translation of a filled page's ink mask onto its blank's.
+
+    Searches every shift within ``radius`` on 4x-reduced masks, then ±4
+    pixels at full resolution around the best one.
+
+    Returns:
+        (dy, dx, alignment) — alignment is the fraction of the blank's ink
+        found on the shifted filled page (within a pixel)
+    """
+    blank_total = int(np.count_nonzero(blank))
+    if blank_total == 0:
+        return 0, 0, 0.0
+    factor = 4
+    small_f, small_b = reduce_mask(filled, factor), reduce_mask(blank, factor)
+    r = max(1, radius // factor)
+    sy, sx = max(
+        ((dy, dx) for dy in range(-r, r + 1) for dx in range(-r, r + 1)),
+        key=lambda s: _overlap(small_f, small_b, *s),
+    )
+    near = dilate(filled, 1)
+    dy, dx = max(
+        (
+            (sy * factor + dy, sx * factor + dx)
+            for dy in range(-factor, factor + 1) for dx in range(-factor, factor + 1)
+        ),
+        key=lambda s: _overlap(near, blank, *s),
+    )
+    return dy, dx, _overlap(near, blank, dy, dx) / blank_total
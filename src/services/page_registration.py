@@ -0,0 +1,418 @@
+"""
+Registration of filled pages onto their blank templates.
+
+Phone-scanned and annotator-exported pages come back shifted, rotated and
+scaled relative to the blank templates, so anything comparing the two
+(ink diffs, crops, blank-page detection, page matching) needs the filled
+page in template coordinates first. A transform is estimated once per page
+on downscaled images and cached:
+
+1. Rotation and scale from phase correlation of the log-polar magnitude
+   spectra (Fourier-Mellin), translation from phase correlation of the
+   rotated page.
+2. Local shifts from phase correlation of a grid of tiles, fitted as an
+   affine transform — or a homography when enough tiles agree and it
+   explains them clearly better (perspective from phone photos).
+
+The transform is kept only if it aligns the page's ink with the template's
+better than no transform at all, so a page that isn't an instance of the
+template is compared as-is.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from scipy import fft as sfft
+from scipy import ndimage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORK_WIDTH = 640
+DEFAULT_CACHE_SIZE = 256
+LOG_POLAR_ANGLES = 360
+LOG_POLAR_RADII = 256
+TILE_GRID = (5, 4)              # rows, cols of the local-shift grid
+MIN_TILE_PEAK = 0.08            # phase-correlation peak a tile shift needs to be trusted
+INLIER_RESIDUAL = 2.0           # work pixels
+
+
+@dataclass(frozen=True)
+class PageRegistration:
+    """
+    Transform from template pixel coordinates to filled-page pixel coordinates.
+
+    ``matrix`` is 3x3 (affine when its last row is [0, 0, 1]); ``score`` is
+    the ink correlation with the template after registration.
+    """
+
+    matrix: tuple[tuple[float, ...], ...]
+    template_size: tuple[int, int]
+    method: str = "identity"   # identity | similarity | affine | homography
+    score: float = 0.0
+    identity_score: float = 0.0
+    inliers: int = 0
+
+    @property
+    def is_identity(self) -> bool:
+        return self.method == "identity"
+
+    def to_filled(self, x: float, y: float) -> tuple[float, float]:
+        """Filled-page position of a template pixel."""
+        m = np.asarray(self.matrix)
+        px, py, pw = m @ (x, y, 1.0)
+        return px / pw, py / pw
+
+    def warp(self, image, fill=(255, 255, 255)):
+        """A filled page (PIL image) resampled into template coordinates and size."""
+        from PIL import Image
+
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if self.is_identity:
+            if image.size == self.template_size:
+                return image
+            return image.resize(self.template_size, Image.Resampling.BILINEAR)
+        m = np.asarray(self.matrix, dtype=np.float64)
+        m = m / m[2, 2]
+        if self.method == "homography":
+            coeffs = (m[0, 0], m[0, 1], m[0, 2], m[1, 0], m[1, 1], m[1, 2], m[2, 0], m[2, 1])
+            method = Image.Transform.PERSPECTIVE
+        else:
+            coeffs = (m[0, 0], m[0, 1], m[0, 2], m[1, 0], m[1, 1], m[1, 2])
+            method = Image.Transform.AFFINE
+        return image.transform(
+            self.template_size, method, coeffs, resample=Image.Resampling.BILINEAR, fillcolor=fill,
+        )
+
+
+def identity_registration(filled_size: tuple[int, int], template_size: tuple[int, int]) -> PageRegistration:
+    """Plain resize of the filled page onto the template's size."""
+    sx, sy = filled_size[0] / template_size[0], filled_size[1] / template_size[1]
+    return PageRegistration(
+        matrix=((sx, 0.0, 0.0), (0.0, sy, 0.0), (0.0, 0.0, 1.0)),
+        template_size=template_size,
+    )
+
+
+# =============================================================================
+# PHASE CORRELATION
+# =============================================================================
+
+def _hann(shape: tuple[int, int]) -> np.ndarray:
+    return np.outer(np.hanning(shape[0]), np.hanning(shape[1])).astype(np.float32)
+
+
+def _phase_correlate(a: np.ndarray, b: np.ndarray) -> tuple[float, float, float]:
+    """
+    Shift (dy, dx) with a[y, x] ≈ b[y - dy, x - dx], and the correlation peak.
+
+    Inputs are windowed by the caller. The peak is refined to subpixel by
+    a parabola through its neighbours.
+    """
+    fa, fb = sfft.rfft2(a), sfft.rfft2(b)
+    cross = fa * np.conj(fb)
+    cross /= np.abs(cross) + 1e-9
+    corr = sfft.irfft2(cross, s=a.shape)
+    py, px = np.unravel_index(int(np.argmax(corr)), corr.shape)
+    peak = float(corr[py, px])
+    h, w = corr.shape
+
+    def refine(c_minus: float, c0: float, c_plus: float) -> float:
+        denom = c_minus - 2 * c0 + c_plus
+        return 0.5 * (c_minus - c_plus) / denom if denom < 0 else 0.0
+
+    dy = py + refine(corr[(py - 1) % h, px], peak, corr[(py + 1) % h, px])
+    dx = px + refine(corr[py, (px - 1) % w], peak, corr[py, (px + 1) % w])
+    if dy > h / 2:
+        dy -= h
+    if dx > w / 2:
+        dx -= w
+    return dy, dx, peak
+
+
+def _log_polar_magnitude(img: np.ndarray) -> tuple[np.ndarray, float]:
+    """High-passed log-polar magnitude spectrum over [0, pi), and its radial log base."""
+    h, w = img.shape
+    mag = np.abs(sfft.fftshift(sfft.fft2(img * _hann(img.shape))))
+    fy = np.cos(np.pi * np.linspace(-0.5, 0.5, h))[:, None]
+    fx = np.cos(np.pi * np.linspace(-0.5, 0.5, w))[None, :]
+    x = fy * fx
+    mag *= (1.0 - x) * (2.0 - x)
+
+    radius = min(h, w) / 2
+    base = np.exp(np.log(radius) / LOG_POLAR_RADII)
+    rho = base ** np.arange(LOG_POLAR_RADII)
+    theta = np.linspace(0, np.pi, LOG_POLAR_ANGLES, endpoint=False)
+    ys = h / 2 + rho[None, :] * np.sin(theta)[:, None]
+    xs = w / 2 + rho[None, :] * np.cos(theta)[:, None]
+    lp = ndimage.map_coordinates(mag, [ys, xs], order=1)
+    return np.log1p(lp).astype(np.float32), base
+
+
+# =============================================================================
+# TRANSFORMS
+# =============================================================================
+
+def _similarity(angle: float, scale: float, centre: tuple[float, float]) -> np.ndarray:
+    """3x3 rotation+scale about a centre (x, y)."""
+    cx, cy = centre
+    c, s = scale * np.cos(angle), scale * np.sin(angle)
+    return np.array([
+        [c, -s, cx - c * cx + s * cy],
+        [s, c, cy - s * cx - c * cy],
+        [0.0, 0.0, 1.0],
+    ])
+
+
+def _translation(dx: float, dy: float) -> np.ndarray:
+    return np.array([[1.0, 0.0, dx], [0.0, 1.0, dy], [0.0, 0.0, 1.0]])
+
+
+def _warp_array(img: np.ndarray, matrix: np.ndarray, shape: tuple[int, int]) -> np.ndarray:
+    """Pull ``img`` into an array of ``shape``: out[y, x] = img[matrix @ (x, y, 1)]."""
+    if np.allclose(matrix[2], (0.0, 0.0, 1.0)):
+        # ndimage indexes (row, col): swap the axes of the affine part.
+        (a, b, c), (d, e, f) = matrix[0], matrix[1]
+        return ndimage.affine_transform(
+            img, np.array([[e, d], [b, a]]), offset=(f, c), output_shape=shape, order=1, cval=0.0,
+        )
+    ys, xs = np.mgrid[0:shape[0], 0:shape[1]].astype(np.float32)
+    pts = matrix @ np.stack([xs.ravel(), ys.ravel(), np.ones(xs.size, dtype=np.float32)])
+    px, py = pts[0] / pts[2], pts[1] / pts[2]
+    return ndimage.map_coordinates(img, [py, px], order=1, cval=0.0).reshape(shape)
+
+
+def _fit_affine(src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """Least-squares 3x3 affine mapping src (n, 2) onto dst (n, 2)."""
+    a = np.hstack([src, np.ones((len(src), 1))])
+    coef, *_ = np.linalg.lstsq(a, dst, rcond=None)
+    return np.vstack([coef.T, [0.0, 0.0, 1.0]])
+
+
+def _fit_homography(src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """Direct linear transform; points are normalized for conditioning."""
+    def normalizer(pts: np.ndarray) -> np.ndarray:
+        mean = pts.mean(axis=0)
+        scale = np.sqrt(2) / max(np.sqrt(((pts - mean) ** 2).sum(axis=1)).mean(), 1e-9)
+        return np.array([[scale, 0, -scale * mean[0]], [0, scale, -scale * mean[1]], [0, 0, 1]])
+
+    ts, td = normalizer(src), normalizer(dst)
+    s = (ts @ np.hstack([src, np.ones((len(src), 1))]).T).T
+    d = (td @ np.hstack([dst, np.ones((len(dst), 1))]).T).T
+    zeros = np.zeros((len(s), 3))
+    rows_x = np.hstack([-s, zeros, d[:, :1] * s])
+    rows_y = np.hstack([zeros, -s, d[:, 1:2] * s])
+    _, _, vt = np.linalg.svd(np.vstack([rows_x, rows_y]))
+    h = vt[-1].reshape(3, 3)
+    h = np.linalg.inv(td) @ h @ ts
+    return h / h[2, 2]
+
+
+def _apply(matrix: np.ndarray, pts: np.ndarray) -> np.ndarray:
+    out = (matrix @ np.hstack([pts, np.ones((len(pts), 1))]).T).T
+    return out[:, :2] / out[:, 2:3]
+
+
+def _rms(matrix: np.ndarray, src: np.ndarray, dst: np.ndarray) -> float:
+    return float(np.sqrt(np.mean(np.sum((_apply(matrix, src) - dst) ** 2, axis=1))))
+
+
+def _ink_correlation(a: np.ndarray, b: np.ndarray) -> float:
+    a, b = a - a.mean(), b - b.mean()
+    denom = np.sqrt((a * a).sum() * (b * b).sum())
+    return float((a * b).sum() / denom) if denom > 0 else 0.0
+
+
+# =============================================================================
+# REGISTRAR
+# =============================================================================
+
+@dataclass
+class PageRegistrar:
+    """
+    Estimates and caches filled-to-template transforms.
+
+    Args:
+        enabled: Register pages at all (PAGE_REGISTRATION); when off every
+            page is just resized onto its template
+        work_width: Width both pages are downscaled to for estimation
+        max_rotation: Largest rotation accepted, in degrees
+        max_scale_change: Largest relative scale difference accepted
+        cache_size: Registrations kept in memory
+    """
+
+    enabled: bool = True
+    work_width: int = DEFAULT_WORK_WIDTH
+    max_rotation: float = 20.0
+    max_scale_change: float = 0.25
+    cache_size: int = DEFAULT_CACHE_SIZE
+    _cache: OrderedDict = field(default_factory=OrderedDict, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    @classmethod
+    def from_env(cls) -> "PageRegistrar":
+        """Registrar configured from PAGE_REGISTRATION."""
+        return cls(enabled=os.getenv("PAGE_REGISTRATION", "true").lower() in ("1", "true", "yes"))
+
+    def register_page(self, filled_image_path: Path, blank_image_path: Path) -> PageRegistration:
+        """Registration of a filled page file onto a blank template file, cached per page."""
+        from PIL import Image
+
+        filled_image_path = Path(filled_image_path).resolve()
+        blank_image_path = Path(blank_image_path).resolve()
+        fstat, bstat = filled_image_path.stat(), blank_image_path.stat()
+        key = (
+            str(filled_image_path), fstat.st_mtime_ns, fstat.st_size,
+            str(blank_image_path), bstat.st_mtime_ns,
+        )
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        with Image.open(filled_image_path) as filled, Image.open(blank_image_path) as blank:
+            registration = self.register(filled, blank)
+        logger.debug(
+            "Registered %s -> %s: %s score=%.3f (identity %.3f, %d tiles)",
+            filled_image_path.name, blank_image_path.name, registration.method,
+            registration.score, registration.identity_score, registration.inliers,
+        )
+        with self._lock:
+            self._cache[key] = registration
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return registration
+
+    def register(self, filled, blank) -> PageRegistration:
+        """Registration of a filled page onto a blank template (both PIL images)."""
+        identity = identity_registration(filled.size, blank.size)
+        if not self.enabled:
+            return identity
+
+        tw, th = blank.size
+        k = min(1.0, self.work_width / tw)
+        work = (max(32, int(round(tw * k))), max(32, int(round(th * k))))
+        a = self._ink_array(blank, work)
+        b = self._ink_array(filled, work)
+        identity_score = _ink_correlation(a, b)
+
+        best, method, inliers = self._estimate(a, b)
+        score = _ink_correlation(a, _warp_array(b, best, a.shape)) if best is not None else -1.0
+        if best is None or score <= identity_score:
+            return PageRegistration(
+                matrix=identity.matrix, template_size=blank.size,
+                score=round(identity_score, 4), identity_score=round(identity_score, 4),
+            )
+
+        # Work pixels -> full pixels: template scaled by k, filled resized to `work`.
+        to_work = np.diag([k, k, 1.0])
+        from_work = np.diag([filled.size[0] / work[0], filled.size[1] / work[1], 1.0])
+        matrix = from_work @ best @ to_work
+        matrix = matrix / matrix[2, 2]
+        return PageRegistration(
+            matrix=tuple(tuple(float(v) for v in row) for row in matrix),
+            template_size=blank.size,
+            method=method,
+            score=round(score, 4),
+            identity_score=round(identity_score, 4),
+            inliers=inliers,
+        )
+
+    @staticmethod
+    def _ink_array(image, size: tuple[int, int]) -> np.ndarray:
+        """Inverted grayscale (ink is high) at the work size, as float32 in [0, 1]."""
+        from PIL import Image
+
+        gray = image.convert("L").resize(size, Image.Resampling.BOX)
+        return (255.0 - np.asarray(gray, dtype=np.float32)) / 255.0
+
+    def _estimate(self, a: np.ndarray, b: np.ndarray) -> tuple[Optional[np.ndarray], str, int]:
+        """Work-resolution matrix mapping template pixels of ``a`` to filled pixels of ``b``."""
+        h, w = a.shape
+        centre = (w / 2, h / 2)
+
+        # 1. Rotation and scale (Fourier-Mellin), then translation.
+        lp_a, base = _log_polar_magnitude(a)
+        lp_b, _ = _log_polar_magnitude(b)
+        d_theta, d_rho, _ = _phase_correlate(lp_b, lp_a)
+        angle = d_theta * np.pi / LOG_POLAR_ANGLES
+        scale = float(base ** d_rho)
+        if abs(np.degrees(angle)) > self.max_rotation or abs(scale - 1.0) > self.max_scale_change:
+            angle, scale = 0.0, 1.0
+
+        window = _hann(a.shape)
+        coarse, coarse_peak = None, -1.0
+        # Magnitude spectra can't tell a rotation from its opposite half-turn.
+        for candidate in (angle, angle + np.pi) if angle else (0.0,):
+            sim = _similarity(candidate, scale, centre)
+            warped = _warp_array(b, sim, a.shape)
+            dy, dx, peak = _phase_correlate(a * window, warped * window)
+            if peak > coarse_peak:
+                coarse, coarse_peak = sim @ _translation(-dx, -dy), peak
+        method = "similarity"
+
+        # 2. Local shifts on a grid of tiles, fitted as affine / homography;
+        # a second pass picks up what the first fit left (e.g. perspective).
+        best, inliers = coarse, 0
+        for _ in range(2):
+            refined, refined_method, refined_inliers = self._fit_tiles(a, b, best)
+            if refined is None:
+                break
+            best, method, inliers = refined, refined_method, refined_inliers
+        return best, method, inliers
+
+    def _fit_tiles(
+        self, a: np.ndarray, b: np.ndarray, current: np.ndarray,
+    ) -> tuple[Optional[np.ndarray], str, int]:
+        """Refit ``current`` from tile-wise phase correlation; None if too few tiles agree."""
+        h, w = a.shape
+        warped = _warp_array(b, current, a.shape)
+        rows, cols = TILE_GRID
+        th, tw = h // rows, w // cols
+        tile_window = _hann((th, tw))
+        src, dst = [], []
+        for r in range(rows):
+            for c in range(cols):
+                ta = a[r * th:(r + 1) * th, c * tw:(c + 1) * tw]
+                if ta.std() < 0.02:
+                    continue
+                tb = warped[r * th:(r + 1) * th, c * tw:(c + 1) * tw]
+                dy, dx, peak = _phase_correlate(ta * tile_window, tb * tile_window)
+                if peak < MIN_TILE_PEAK or abs(dy) > th / 4 or abs(dx) > tw / 4:
+                    continue
+                p = ((c + 0.5) * tw, (r + 0.5) * th)
+                src.append(p)
+                dst.append((p[0] - dx, p[1] - dy))
+        if len(src) < 4:
+            return None, "", 0
+
+        src_pts = np.asarray(src)
+        dst_pts = _apply(current, np.asarray(dst))
+        affine = _fit_affine(src_pts, dst_pts)
+        for _ in range(2):
+            residual = np.linalg.norm(_apply(affine, src_pts) - dst_pts, axis=1)
+            keep = residual <= max(INLIER_RESIDUAL, 2 * float(np.median(residual)))
+            if keep.sum() < 4:
+                return None, "", 0
+            affine = _fit_affine(src_pts[keep], dst_pts[keep])
+
+        if keep.sum() >= 8:
+            homography = _fit_homography(src_pts[keep], dst_pts[keep])
+            rms_affine = _rms(affine, src_pts[keep], dst_pts[keep])
+            if _rms(homography, src_pts[keep], dst_pts[keep]) < 0.75 * rms_affine and rms_affine > 0.5:
+                return homography, "homography", int(keep.sum())
+        return affine, "affine", int(keep.sum())
+
+
+@lru_cache(maxsize=1)
+def get_page_registrar() -> PageRegistrar:
+    """Process-wide page registrar (and its registration cache)."""
+    return PageRegistrar.from_env()
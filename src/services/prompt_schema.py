@@ -0,0 +1,213 @@
+"""
+Prompt-oriented projection of page schemas.
+
+``page_schema.model_dump_json(indent=2)`` is 10-40 KB per page, mostly null
+attributes, hints and descriptions the VLM never uses. The compact form
+keeps only what extraction needs — field_id, type, label, options — as
+minified JSON, with option lists shared by several fields hoisted into one
+``option_sets`` table. Pages whose projection still exceeds the token
+budget are shortened further (labels truncated, then dropped).
+"""
+
+import json
+import logging
+import math
+import os
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from ..models import PageSchema, SectionSchema, TableSchema
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOKEN_BUDGET = 2000
+
+# Degradation steps tried in order until the projection fits the budget:
+# (level name, max label length — None keeps labels whole, 0 drops them).
+_LEVELS: list[tuple[str, Optional[int]]] = [
+    ("full", None),
+    ("short_labels", 32),
+    ("ids_only", 0),
+]
+
+_MEMO_KEY = "compact_schema"
+
+
+@dataclass(frozen=True)
+class CompactSchema:
+    """Minified schema text for a prompt plus its measured token cost."""
+
+    text: str
+    level: str
+    tokens_before: int
+    tokens_after: int
+    token_budget: Optional[int]
+
+    @property
+    def over_budget(self) -> bool:
+        return self.token_budget is not None and self.tokens_after > self.token_budget
+
+
+try:
+    import tiktoken
+
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+
+    def estimate_tokens(text: str) -> int:
+        """Token count of text (cl100k_base, close enough for VLM tokenizers)."""
+        return len(_ENCODING.encode(text, disallowed_special=()))
+
+except ImportError:
+
+    def estimate_tokens(text: str) -> int:
+        """Approximate token count of text (~4 characters per token for JSON)."""
+        return math.ceil(len(text) / 4)
+
+
+def default_token_budget() -> Optional[int]:
+    """Per-page schema token budget from SCHEMA_PROMPT_TOKEN_BUDGET (0 disables)."""
+    budget = int(os.getenv("SCHEMA_PROMPT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
+    return budget if budget > 0 else None
+
+
+def _shared_option_sets(page_schema: PageSchema) -> dict[tuple[str, ...], str]:
+    """Map each option list used by 2+ fields to a short reference name."""
+    counts: Counter[tuple[str, ...]] = Counter()
+
+    def count(section: SectionSchema) -> None:
+        for field in section.fields:
+            if field.options:
+                counts[tuple(field.options)] += 1
+        for sub in section.subsections:
+            count(sub)
+
+    for field in page_schema.standalone_fields:
+        if field.options:
+            counts[tuple(field.options)] += 1
+    for section in page_schema.sections:
+        count(section)
+
+    shared = [opts for opts, n in counts.items() if n > 1]
+    return {opts: f"@opts{i + 1}" for i, opts in enumerate(shared)}
+
+
+def _project_field(field, option_refs: dict[tuple[str, ...], str], label_limit: Optional[int]) -> dict[str, Any]:
+    entry: dict[str, Any] = {"field_id": field.field_id, "type": field.field_type.value}
+    if label_limit is None:
+        entry["label"] = field.field_label
+    elif label_limit > 0:
+        label = field.field_label
+        entry["label"] = label if len(label) <= label_limit else label[: label_limit - 1] + "…"
+    if field.options:
+        entry["options"] = option_refs.get(tuple(field.options), field.options)
+    return entry
+
+
+def _project_table(table: TableSchema, label_limit: Optional[int]) -> dict[str, Any]:
+    entry: dict[str, Any] = {"table_id": table.table_id}
+    if table.table_title and label_limit != 0:
+        entry["title"] = table.table_title
+    entry["columns"] = [c.header for c in table.columns]
+    if table.row_labels:
+        entry["rows"] = table.row_labels
+    return entry
+
+
+def _project_section(
+    section: SectionSchema,
+    option_refs: dict[tuple[str, ...], str],
+    label_limit: Optional[int],
+) -> dict[str, Any]:
+    entry: dict[str, Any] = {"section_id": section.section_id}
+    if label_limit != 0:
+        entry["title"] = section.section_title
+    if section.fields:
+        entry["fields"] = [_project_field(f, option_refs, label_limit) for f in section.fields]
+    if section.tables:
+        entry["tables"] = [_project_table(t, label_limit) for t in section.tables]
+    if section.subsections:
+        entry["subsections"] = [_project_section(s, option_refs, label_limit) for s in section.subsections]
+    return entry
+
+
+def _render(page_schema: PageSchema, label_limit: Optional[int]) -> str:
+    option_refs = _shared_option_sets(page_schema)
+    doc: dict[str, Any] = {"page": page_schema.page_number}
+    if page_schema.page_title:
+        doc["title"] = page_schema.page_title
+    if option_refs:
+        doc["option_sets"] = {ref: list(opts) for opts, ref in option_refs.items()}
+    if page_schema.standalone_fields:
+        doc["fields"] = [_project_field(f, option_refs, label_limit) for f in page_schema.standalone_fields]
+    if page_schema.standalone_tables:
+        doc["tables"] = [_project_table(t, label_limit) for t in page_schema.standalone_tables]
+    if page_schema.sections:
+        doc["sections"] = [_project_section(s, option_refs, label_limit) for s in page_schema.sections]
+    return json.dumps(doc, separators=(",", ":"), ensure_ascii=False)
+
+
+def compact_page_schema(
+    page_schema: PageSchema,
+    token_budget: Optional[int] = None,
+) -> CompactSchema:
+    """
+    Render the prompt projection of a page schema within a token budget.
+
+    Results are memoized on the PageSchema instance per budget.
+
+    Args:
+        page_schema: Page to project
+        token_budget: Max schema tokens; defaults to SCHEMA_PROMPT_TOKEN_BUDGET
+    """
+    if token_budget is None:
+        token_budget = default_token_budget()
+
+    memo = page_schema._prompt_memo
+    cached = memo.get((_MEMO_KEY, token_budget))
+    if cached is not None:
+        return cached
+
+    tokens_before = estimate_tokens(page_schema.model_dump_json(indent=2))
+    text, level = "", "full"
+    for level, label_limit in _LEVELS:
+        text = _render(page_schema, label_limit)
+        if token_budget is None or estimate_tokens(text) <= token_budget:
+            break
+
+    compact = CompactSchema(
+        text=text,
+        level=level,
+        tokens_before=tokens_before,
+        tokens_after=estimate_tokens(text),
+        token_budget=token_budget,
+    )
+    log = logger.warning if compact.over_budget else logger.info
+    log(
+        "Page %d schema prompt: %d → %d tokens (%s%s)",
+        page_schema.page_number, compact.tokens_before, compact.tokens_after, compact.level,
+        f", over budget {token_budget}" if compact.over_budget else "",
+    )
+    memo[(_MEMO_KEY, token_budget)] = compact
+    return compact
+
+
+def page_schema_without(page_schema: PageSchema, field_ids: set[str]) -> PageSchema:
+    """
+    Copy of a page schema with the given fields removed.
+
+    Used to leave fields that were already read locally out of the VLM
+    prompt. The copy gets its own (empty) prompt memo.
+    """
+    reduced = page_schema.model_copy(deep=True)
+    reduced._prompt_memo = {}
+
+    def prune(section: SectionSchema) -> None:
+        section.fields = [f for f in section.fields if f.field_id not in field_ids]
+        for sub in section.subsections:
+            prune(sub)
+
+    reduced.standalone_fields = [f for f in reduced.standalone_fields if f.field_id not in field_ids]
+    for section in reduced.sections:
+        prune(section)
+    return reduced
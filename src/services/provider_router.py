@@ -0,0 +1,278 @@
+"""
+Provider routing with health tracking and circuit breakers.
+
+Every VLM call is recorded against its provider: latency, success, and
+whether it was rate limited (HTTP 429). From a rolling window of those
+calls the router keeps a circuit breaker per provider:
+
+- closed: calls flow normally
+- open: the provider failed repeatedly (or most of its recent calls did);
+  it is skipped until a cooldown passes, doubling on each repeated trip
+- half-open: after the cooldown one probe call is let through; success
+  closes the breaker, failure reopens it
+
+The pipeline asks the router for an order of providers for each call and
+falls through to the next one when a call fails. The order follows a
+configurable policy (configured priority, cheapest or fastest first), with
+open breakers always last. A provider the caller pinned (a forced provider)
+stays first while its breaker admits calls; the policy only orders the
+fallbacks behind it.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+ROUTING_POLICIES = ("priority", "cost", "latency")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+WINDOW_MAX_CALLS = 200
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Whether an exception (or one it wraps) is an HTTP 429 from a provider."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError":
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+@dataclass
+class _CallRecord:
+    at: float
+    latency: float
+    ok: bool
+    rate_limited: bool
+
+
+@dataclass
+class ProviderHealth:
+    """Rolling call statistics and breaker state of one provider."""
+
+    provider: str
+    model: Optional[str] = None
+    cost: float = 0.0
+    state: str = CLOSED
+    consecutive_failures: int = 0
+    trips: int = 0
+    opened_at: float = 0.0
+    cooldown: float = 0.0
+    probe_in_flight: bool = False
+    calls: deque = field(default_factory=lambda: deque(maxlen=WINDOW_MAX_CALLS))
+
+    def window(self, now: float, seconds: float) -> list[_CallRecord]:
+        while self.calls and now - self.calls[0].at > seconds:
+            self.calls.popleft()
+        return list(self.calls)
+
+    def latency_p50(self, records: list[_CallRecord]) -> Optional[float]:
+        return latency_quantile(records, 0.5)
+
+
+def latency_quantile(records: list[_CallRecord], q: float, min_samples: int = 1) -> Optional[float]:
+    """Quantile of successful-call latencies, or None with fewer than ``min_samples``."""
+    latencies = sorted(r.latency for r in records if r.ok)
+    if len(latencies) < max(1, min_samples):
+        return None
+    return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+
+@dataclass
+class ProviderRouter:
+    """
+    Orders providers for each call and trips breakers on failing ones.
+
+    Args:
+        policy: "priority" (configured order), "cost" (cheapest first) or
+            "latency" (lowest recent median latency first) (PROVIDER_ROUTING_POLICY)
+        window_seconds: Age of the calls the error rate and latency are measured over
+        min_calls: Calls in the window before the error rate can trip a breaker
+        error_rate_threshold: Error rate (429s included) in the window that trips a breaker
+        failure_threshold: Consecutive failures that trip a breaker (PROVIDER_BREAKER_FAILURES)
+        cooldown_seconds: First open period; doubles on each repeated trip
+            (PROVIDER_BREAKER_COOLDOWN_SECONDS)
+        max_cooldown_seconds: Cap on the open period
+    """
+
+    policy: str = "priority"
+    window_seconds: float = 300.0
+    min_calls: int = 6
+    error_rate_threshold: float = 0.5
+    failure_threshold: int = 3
+    cooldown_seconds: float = 30.0
+    max_cooldown_seconds: float = 300.0
+
+    def __post_init__(self):
+        if self.policy not in ROUTING_POLICIES:
+            raise ValueError(f"Unknown routing policy {self.policy!r}; expected one of {ROUTING_POLICIES}")
+        self._health: dict[str, ProviderHealth] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ProviderRouter":
+        """Router configured from PROVIDER_ROUTING_POLICY and PROVIDER_BREAKER_*."""
+        return cls(
+            policy=os.getenv("PROVIDER_ROUTING_POLICY", "priority").lower(),
+            failure_threshold=int(os.getenv("PROVIDER_BREAKER_FAILURES", 3)),
+            cooldown_seconds=float(os.getenv("PROVIDER_BREAKER_COOLDOWN_SECONDS", 30)),
+        )
+
+    def register(self, provider: str, model: Optional[str], cost: float = 0.0) -> None:
+        """Declare a provider (its model and relative cost) so it shows up in snapshots."""
+        with self._lock:
+            health = self._health.setdefault(provider, ProviderHealth(provider))
+            health.model, health.cost = model, cost
+
+    def route(self, providers: list[str], pinned: Optional[str] = None) -> list[str]:
+        """
+        Order of providers to try for one call.
+
+        Providers whose breaker admits a call come first, in policy order;
+        open ones follow (so a call is never refused outright when every
+        breaker is open, it just tries the one closest to its probe).
+
+        Args:
+            providers: Candidate providers in configured priority order
+            pinned: Provider kept first while its breaker admits calls
+                (a forced provider); only the others are ordered by policy
+        """
+        now = time.monotonic()
+        with self._lock:
+            healths = [self._health.setdefault(p, ProviderHealth(p)) for p in providers]
+            ready = [h for h in healths if self._admits(h, now)]
+            blocked = [h for h in healths if h not in ready]
+
+            def key(h: ProviderHealth):
+                rank = providers.index(h.provider)
+                if self.policy == "cost":
+                    return (h.cost, rank)
+                if self.policy == "latency":
+                    p50 = h.latency_p50(h.window(now, self.window_seconds))
+                    return (p50 if p50 is not None else 0.0, rank)
+                return (rank,)
+
+            ready.sort(key=lambda h: (h.provider != pinned, key(h)))
+            blocked.sort(key=lambda h: h.opened_at + h.cooldown)
+            return [h.provider for h in ready + blocked]
+
+    def _admits(self, health: ProviderHealth, now: float) -> bool:
+        if health.state == CLOSED:
+            return True
+        if health.state == OPEN and now - health.opened_at >= health.cooldown:
+            health.state = HALF_OPEN
+            health.probe_in_flight = False
+        return health.state == HALF_OPEN and not health.probe_in_flight
+
+    def available(self, provider: str) -> bool:
+        """Whether a provider's breaker would admit a call now."""
+        with self._lock:
+            health = self._health.get(provider)
+            return health is None or self._admits(health, time.monotonic())
+
+    def acquire(self, provider: str) -> None:
+        """Mark a call as starting; a half-open provider takes one probe at a time."""
+        with self._lock:
+            health = self._health.setdefault(provider, ProviderHealth(provider))
+            if health.state == HALF_OPEN:
+                health.probe_in_flight = True
+
+    def release(self, provider: str) -> None:
+        """A call was cancelled before finishing (e.g. a lost hedge); records nothing."""
+        with self._lock:
+            health = self._health.get(provider)
+            if health is not None:
+                health.probe_in_flight = False
+
+    def latency_quantile(self, provider: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """Recent latency quantile of a provider's successful calls (None until enough calls)."""
+        with self._lock:
+            health = self._health.get(provider)
+            if health is None:
+                return None
+            return latency_quantile(health.window(time.monotonic(), self.window_seconds), q, min_samples)
+
+    def record_success(self, provider: str, latency: float) -> None:
+        with self._lock:
+            health = self._health.setdefault(provider, ProviderHealth(provider))
+            health.calls.append(_CallRecord(time.monotonic(), latency, True, False))
+            health.consecutive_failures = 0
+            if health.state != CLOSED:
+                logger.info("Provider %s recovered; closing its circuit breaker", provider)
+            health.state, health.trips, health.probe_in_flight = CLOSED, 0, False
+
+    def record_failure(self, provider: str, latency: float, error: BaseException) -> None:
+        now = time.monotonic()
+        rate_limited = is_rate_limited(error)
+        with self._lock:
+            health = self._health.setdefault(provider, ProviderHealth(provider))
+            health.calls.append(_CallRecord(now, latency, False, rate_limited))
+            health.consecutive_failures += 1
+            health.probe_in_flight = False
+            records = health.window(now, self.window_seconds)
+            error_rate = sum(not r.ok for r in records) / len(records)
+            if health.state == HALF_OPEN or (
+                health.state == CLOSED and (
+                    health.consecutive_failures >= self.failure_threshold
+                    or (len(records) >= self.min_calls and error_rate >= self.error_rate_threshold)
+                )
+            ):
+                health.trips += 1
+                health.state, health.opened_at = OPEN, now
+                health.cooldown = min(self.max_cooldown_seconds, self.cooldown_seconds * 2 ** (health.trips - 1))
+                logger.warning(
+                    "Circuit breaker opened for %s for %.0fs (%d consecutive failures, %.0f%% errors; last: %s)",
+                    provider, health.cooldown, health.consecutive_failures, error_rate * 100, error,
+                )
+
+    def snapshot(self) -> dict:
+        """Breaker state and rolling statistics of every provider seen."""
+        now = time.monotonic()
+        providers = {}
+        with self._lock:
+            for name, health in self._health.items():
+                records = health.window(now, self.window_seconds)
+                errors = sum(not r.ok for r in records)
+                error_rate = errors / len(records) if records else 0.0
+                p50 = health.latency_p50(records)
+                p95 = latency_quantile(records, 0.95)
+                availability = {CLOSED: 1.0, HALF_OPEN: 0.5, OPEN: 0.0}[health.state]
+                providers[name] = {
+                    "model": health.model,
+                    "state": health.state,
+                    "health_score": round(availability * (1.0 - error_rate), 3),
+                    "calls": len(records),
+                    "error_rate": round(error_rate, 3),
+                    "rate_limited": sum(r.rate_limited for r in records),
+                    "latency_p50_ms": round(p50 * 1000) if p50 is not None else None,
+                    "latency_p95_ms": round(p95 * 1000) if p95 is not None else None,
+                    "consecutive_failures": health.consecutive_failures,
+                    "retry_in_seconds": (
+                        round(max(0.0, health.opened_at + health.cooldown - now), 1)
+                        if health.state == OPEN else None
+                    ),
+                    "cost": health.cost,
+                }
+        return {
+            "policy": self.policy,
+            "window_seconds": self.window_seconds,
+            "providers": providers,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_provider_router() -> ProviderRouter:
+    """Process-wide provider router (PROVIDER_ROUTING_POLICY, PROVIDER_BREAKER_*)."""
+    return ProviderRouter.from_env()
@@ -0,0 +1,472 @@
+"""
+Process-wide, rate-limit-aware scheduling of VLM calls per provider.
+
+Every job's calls to a provider go through that provider's scheduler, which
+admits a call only when all of these hold:
+
+- fewer than max_concurrency calls are in flight
+- the requests-per-minute and tokens-per-minute buckets have room
+- the provider hasn't asked us to back off (Retry-After, or ratelimit
+  headers showing the window is used up)
+
+Waiting calls are queued per job and admitted round-robin across jobs, so
+five simultaneous uploads share the provider's ceiling instead of the first
+job's pages going out before anyone else's.
+
+The SDK clients' own retries are turned off; ProviderScheduler.call retries
+429s, overloads and transient errors with jittered backoff, honoring
+Retry-After, and pauses the whole provider while it is rate limited rather
+than letting every caller hammer it. Responses are observed through an httpx
+event hook so ratelimit headers are seen on every call, successful or not.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Iterator, Mapping, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Per-provider caps on in-flight calls; override with <PROVIDER>_MAX_CONCURRENCY.
+DEFAULT_PROVIDER_CONCURRENCY = {"together": 32, "fireworks": 32, "claude": 8}
+DEFAULT_PROVIDER_MAX_CONCURRENCY = 16
+BURST_SECONDS = 1.0           # bucket capacity, in seconds of the per-minute rate
+DEFAULT_MAX_RETRIES = 4
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_CAP_SECONDS = 60.0
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout", "RemoteProtocolError"}
+IMAGE_TOKENS = 1600           # rough input tokens of one page image (TPM estimate)
+EXPECTED_OUTPUT_TOKENS = 2000
+
+# Requests are queued per job; pages of one extract_form run share a job key.
+_current_job: ContextVar[str] = ContextVar("llm_job", default="default")
+
+
+@contextlib.contextmanager
+def job_scope(job: str) -> Iterator[None]:
+    """Attribute LLM calls made in this context (and tasks it spawns) to ``job``."""
+    token = _current_job.set(job)
+    try:
+        yield
+    finally:
+        _current_job.reset(token)
+
+
+def current_job() -> str:
+    """The job LLM calls in this context are attributed to."""
+    return _current_job.get()
+
+
+# =============================================================================
+# HEADER PARSING
+# =============================================================================
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def _parse_reset(value: str, now: float) -> Optional[float]:
+    """Seconds until a ratelimit reset given as "6m0s"/"20ms", seconds, epoch or RFC 3339."""
+    value = value.strip()
+    if not value:
+        return None
+    parts = _DURATION.findall(value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+        return sum(float(n) * scale[u] for n, u in parts)
+    try:
+        number = float(value)
+    except ValueError:
+        try:
+            at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        return max(0.0, (at - datetime.now(timezone.utc)).total_seconds())
+    # Large numbers are epoch timestamps, small ones are seconds from now.
+    return max(0.0, number - now) if number > 1e9 else number
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Seconds to wait from retry-after-ms / Retry-After (seconds or HTTP date)."""
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_exhausted_window(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Seconds until a used-up ratelimit window resets, from response headers.
+
+    Understands the OpenAI-compatible ``x-ratelimit-remaining-{requests,tokens}``
+    / ``x-ratelimit-reset-*`` pairs (Together, Fireworks), their unsuffixed
+    form, and Anthropic's ``anthropic-ratelimit-*-remaining`` / ``-reset``.
+    """
+    now = time.time()
+    pairs = [
+        ("x-ratelimit-remaining-requests", "x-ratelimit-reset-requests"),
+        ("x-ratelimit-remaining-tokens", "x-ratelimit-reset-tokens"),
+        ("x-ratelimit-remaining", "x-ratelimit-reset"),
+    ] + [
+        (f"anthropic-ratelimit-{kind}-remaining", f"anthropic-ratelimit-{kind}-reset")
+        for kind in ("requests", "tokens", "input-tokens", "output-tokens")
+    ]
+    wait = None
+    for remaining_key, reset_key in pairs:
+        remaining, reset = headers.get(remaining_key), headers.get(reset_key)
+        if remaining is None or reset is None:
+            continue
+        try:
+            exhausted = float(remaining) <= 0
+        except ValueError:
+            continue
+        if exhausted:
+            seconds = _parse_reset(reset, now)
+            if seconds is not None:
+                wait = max(wait or 0.0, seconds)
+    return wait
+
+
+def _error_response(error: BaseException) -> tuple[Optional[int], Mapping[str, str]]:
+    """(HTTP status, response headers) of an SDK error or anything it wraps."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        status = getattr(error, "status_code", None)
+        response = getattr(error, "response", None)
+        if status is not None or response is not None:
+            headers = getattr(response, "headers", None) or {}
+            return status or getattr(response, "status_code", None), headers
+        error = error.__cause__ or error.__context__
+    return None, {}
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Rate limits, overloads, 5xx and connection/timeouts are worth retrying."""
+    status, _ = _error_response(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if type(error).__name__ in RETRYABLE_ERRORS:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def estimate_request_tokens(prompt: str, images: int) -> int:
+    """Tokens a request is charged against a TPM bucket before its real usage is known."""
+    return len(prompt) // 4 + images * IMAGE_TOKENS + EXPECTED_OUTPUT_TOKENS
+
+
+# =============================================================================
+# TOKEN BUCKETS AND THE SCHEDULER
+# =============================================================================
+
+class TokenBucket:
+    """Per-minute token bucket that lets one oversized request through on a full bucket."""
+
+    def __init__(self, per_minute: float, burst_seconds: float = BURST_SECONDS):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self._at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._at) * self.rate)
+        self._at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` can be taken (0 if now)."""
+        self._refill(now)
+        need = min(amount, self.capacity)
+        return 0.0 if self.level >= need else (need - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        """Debit ``amount``; the level may go negative (debt repaid by refill)."""
+        self.level -= amount
+
+
+@dataclass
+class _Waiter:
+    loop: asyncio.AbstractEventLoop
+    future: asyncio.Future
+    tokens: int
+    job: str
+
+
+class ProviderScheduler:
+    """
+    Fair, rate-limited admission of calls to one provider.
+
+    Shared by every thread and event loop in the process (like
+    async_engine.ConcurrencyLimiter); waiters are woken on their own loop.
+
+    Args:
+        provider: Route name ("together", "fireworks", "claude")
+        max_concurrency: Calls in flight at once (<PROVIDER>_MAX_CONCURRENCY)
+        requests_per_minute: RPM bucket, None for unlimited (<PROVIDER>_RPM)
+        tokens_per_minute: TPM bucket (input + expected output), None for
+            unlimited (<PROVIDER>_TPM)
+        max_retries: Retries of a retryable failure (PROVIDER_MAX_RETRIES)
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        max_concurrency: int,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be >= 1")
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._queues: OrderedDict[str, deque[_Waiter]] = OrderedDict()
+        self._timer_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self.stats: dict[str, int] = {"admitted": 0, "retries": 0, "rate_limited": 0, "paused": 0}
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    # ---- admission ----------------------------------------------------------
+
+    async def acquire(self, tokens: int = 0) -> None:
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(loop, loop.create_future(), tokens, _current_job.get())
+        with self._lock:
+            self._queues.setdefault(waiter.job, deque()).append(waiter)
+        self._pump()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                owns_slot = waiter.future.done() and not waiter.future.cancelled()
+                queue = self._queues.get(waiter.job)
+                if queue is not None and waiter in queue:
+                    queue.remove(waiter)
+                    if not queue:
+                        del self._queues[waiter.job]
+            if owns_slot:
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._pump()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, tokens: int = 0):
+        """Hold one admitted call for the duration of the block."""
+        await self.acquire(tokens)
+        try:
+            yield self
+        finally:
+            self.release()
+
+    def _pump(self) -> None:
+        """Admit waiters round-robin across jobs while limits allow; re-arm a timer otherwise."""
+        wake: list[_Waiter] = []
+        timer_delay = None
+        timer_loop = None
+        with self._lock:
+            while self._queues and self._in_flight < self.max_concurrency:
+                job, queue = next(iter(self._queues.items()))
+                waiter = queue[0]
+                if waiter.future.done():
+                    queue.popleft()
+                    if not queue:
+                        del self._queues[job]
+                    continue
+                now = time.monotonic()
+                wait = max(
+                    self._paused_until - now,
+                    self._requests.wait_time(1, now) if self._requests else 0.0,
+                    self._tokens.wait_time(waiter.tokens, now) if self._tokens else 0.0,
+                )
+                if wait > 0:
+                    if self._timer_at is None or now + wait < self._timer_at - 0.001:
+                        self._timer_at = now + wait
+                        timer_delay, timer_loop = wait, waiter.loop
+                    break
+                queue.popleft()
+                # This job goes to the back of the rotation.
+                del self._queues[job]
+                if queue:
+                    self._queues[job] = queue
+                if self._requests:
+                    self._requests.take(1)
+                if self._tokens:
+                    self._tokens.take(waiter.tokens)
+                self._in_flight += 1
+                self.stats["admitted"] += 1
+                wake.append(waiter)
+        for waiter in wake:
+            waiter.loop.call_soon_threadsafe(self._wake, waiter.future)
+        if timer_delay is not None and not timer_loop.is_closed():
+            timer_loop.call_soon_threadsafe(timer_loop.call_later, timer_delay, self._on_timer)
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer_at = None
+        self._pump()
+
+    def _wake(self, future: asyncio.Future) -> None:
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    # ---- provider feedback --------------------------------------------------
+
+    def pause(self, seconds: float) -> None:
+        """Admit nothing for ``seconds`` (the provider asked us to back off)."""
+        if seconds <= 0:
+            return
+        with self._lock:
+            until = time.monotonic() + seconds
+            if until > self._paused_until:
+                self._paused_until = until
+                self.stats["paused"] += 1
+        logger.info("Pausing %s calls for %.1fs (rate limited)", self.provider, seconds)
+
+    def observe(self, status: Optional[int], headers: Mapping[str, str]) -> None:
+        """Learn from one response: back off on 429s and exhausted ratelimit windows."""
+        wait = parse_retry_after(headers) if status in (429, 503, 529) else None
+        exhausted = parse_exhausted_window(headers)
+        self.pause(max(wait or 0.0, exhausted or 0.0))
+
+    async def httpx_response_hook(self, response: Any) -> None:
+        """httpx event hook: observe every HTTP response of this provider's client."""
+        self.observe(response.status_code, response.headers)
+
+    def observe_response(self, response: Any) -> None:
+        """Sync httpx event hook (clients outside the engine loop share what they learn)."""
+        self.observe(response.status_code, response.headers)
+
+    # ---- calls --------------------------------------------------------------
+
+    async def call(
+        self,
+        attempt: Callable[[], Awaitable[T]],
+        tokens: int = 0,
+    ) -> T:
+        """
+        Run ``attempt`` in an admitted slot, retrying retryable failures.
+
+        Backoff is full-jitter exponential, or Retry-After plus a second of
+        jitter when the provider sent one; each retry queues for a slot again.
+        """
+        for retry in range(self.max_retries + 1):
+            async with self.slot(tokens):
+                try:
+                    return await attempt()
+                except Exception as e:
+                    if retry >= self.max_retries or not is_retryable(e):
+                        raise
+                    status, headers = _error_response(e)
+                    retry_after = parse_retry_after(headers)
+                    if retry_after is not None:
+                        delay = retry_after + random.uniform(0, 1.0)
+                    else:
+                        delay = random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** retry))
+                    if status == 429:
+                        self.pause(delay)
+                    with self._lock:
+                        self.stats["retries"] += 1
+                        self.stats["rate_limited"] += status == 429
+                    logger.warning(
+                        "%s call failed (%s); retry %d/%d in %.1fs",
+                        self.provider, status or type(e).__name__, retry + 1, self.max_retries, delay,
+                    )
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "requests_per_minute": round(self._requests.rate * 60) if self._requests else None,
+                "tokens_per_minute": round(self._tokens.rate * 60) if self._tokens else None,
+                "in_flight": self._in_flight,
+                "waiting": sum(len(q) for q in self._queues.values()),
+                "jobs_waiting": len(self._queues),
+                "paused_for_seconds": round(max(0.0, self._paused_until - now), 1),
+                **self.stats,
+            }
+
+
+def _env_number(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+_schedulers: dict[str, ProviderScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_provider_scheduler(provider: str) -> ProviderScheduler:
+    """Process-wide scheduler of one provider (<PROVIDER>_MAX_CONCURRENCY, _RPM, _TPM)."""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(provider)
+        if scheduler is None:
+            prefix = provider.upper()
+            scheduler = ProviderScheduler(
+                provider,
+                max_concurrency=int(os.getenv(
+                    f"{prefix}_MAX_CONCURRENCY",
+                    DEFAULT_PROVIDER_CONCURRENCY.get(provider, DEFAULT_PROVIDER_MAX_CONCURRENCY),
+                )),
+                requests_per_minute=_env_number(f"{prefix}_RPM"),
+                tokens_per_minute=_env_number(f"{prefix}_TPM"),
+                max_retries=int(os.getenv("PROVIDER_MAX_RETRIES", DEFAULT_MAX_RETRIES)),
+            )
+            _schedulers[provider] = scheduler
+            logger.info("%s scheduler: %s", provider, scheduler.snapshot())
+        return scheduler
+
+
+def rate_limit_snapshot() -> dict:
+    """State of every provider scheduler created so far."""
+    with _schedulers_lock:
+        schedulers = dict(_schedulers)
+    return {provider: scheduler.snapshot() for provider, scheduler in schedulers.items()}
@@ -0,0 +1,210 @@
+"""
+Content-addressed cache for structured VLM responses.
+
+Entries are keyed by what the model actually sees — the filled image
+payload, the blank template payload, the rendered prompt — plus the model
+id and response model name. A byte-identical page re-sent with the same
+prompt (re-analysis, e2e scripts, training runs) is answered from a local
+SQLite file instead of a paid provider call.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, TypeVar
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=BaseModel)
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parents[2] / ".cache" / "vlm_responses.sqlite3"
+DEFAULT_MAX_MB = 512
+DEFAULT_TTL_DAYS = 30
+
+
+def content_hash(data: Optional[str | bytes]) -> str:
+    """sha256 hex digest of a payload; empty string for None."""
+    if data is None:
+        return ""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_cache_key(
+    image_data: str,
+    blank_image_data: Optional[str],
+    prompt: str,
+    model_id: str,
+    response_model: type[BaseModel],
+) -> str:
+    """Build the content address for one LLM call."""
+    parts = [
+        content_hash(image_data),
+        content_hash(blank_image_data),
+        content_hash(prompt),
+        model_id,
+        response_model.__name__,
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed response store with TTL and size-bounded LRU eviction.
+
+    Safe to share across threads; every operation takes a short lock.
+    """
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_CACHE_PATH,
+        max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+        ttl_seconds: Optional[float] = DEFAULT_TTL_DAYS * 86400,
+    ):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model_id TEXT NOT NULL,
+                response_model TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_lru ON responses(last_access)")
+
+    def get(self, key: str, response_model: type[M]) -> Optional[M]:
+        """Return the cached response for key, or None on miss / expiry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            payload, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+
+        try:
+            result = response_model.model_validate_json(payload)
+        except Exception as e:
+            # Schema of the response model changed since the entry was written.
+            logger.warning("Dropping unreadable cache entry %s: %s", key[:12], e)
+            self.delete(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def put(self, key: str, model_id: str, response: BaseModel) -> None:
+        """Store a response and evict least-recently-used entries past max_bytes."""
+        payload = response.model_dump_json()
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, model_id, response_model, payload, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model_id, type(response).__name__, payload, size, now, now),
+            )
+            self._evict_locked()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def _evict_locked(self) -> None:
+        if self.ttl_seconds is not None:
+            self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Trim to 90% so eviction doesn't run on every subsequent put.
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= target:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        logger.info("VLM cache evicted %d entries (now %.1f MB)", evicted, total / 1024 / 1024)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "size_bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Process-wide response cache configured from the environment.
+
+    Returns None when VLM_CACHE_DISABLED is set or the store can't be opened.
+    """
+    if os.getenv("VLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        logger.info("VLM response cache disabled")
+        return None
+
+    path = Path(os.getenv("VLM_CACHE_PATH", str(DEFAULT_CACHE_PATH)))
+    max_mb = float(os.getenv("VLM_CACHE_MAX_MB", DEFAULT_MAX_MB))
+    ttl_days = float(os.getenv("VLM_CACHE_TTL_DAYS", DEFAULT_TTL_DAYS))
+    try:
+        cache = ResponseCache(
+            path=path,
+            max_bytes=int(max_mb * 1024 * 1024),
+            ttl_seconds=ttl_days * 86400 if ttl_days > 0 else None,
+        )
+    except (sqlite3.Error, OSError) as e:
+        logger.warning("VLM response cache unavailable at %s: %s", path, e)
+        return None
+    logger.info("VLM response cache: %s (max %.0f MB, ttl %.0f days)", path, max_mb, ttl_days)
+    return cache
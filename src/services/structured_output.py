@@ -0,0 +1,344 @@
+"""
+Local repair of structured VLM output that failed validation.
+
+instructor re-sends the whole prompt (every page image included) when a
+response does not validate against its response model. Most failures are
+cheap to fix locally: a markdown fence around the JSON, a trailing comma,
+Python literals, an output cut off by the token limit, confidence as a
+string or a percentage, one malformed item in a long list. This module
+parses the raw completion tolerantly and coerces it onto the response
+model, so only a response with nothing usable left costs a re-call.
+
+Repairs are conservative. A truncated output is cut back to its last
+complete list item rather than closing a half-written string, so a partial
+value is never passed off as a reading; list items that still fail
+validation are dropped individually instead of failing the response.
+"""
+
+import json
+import logging
+import re
+import typing
+from typing import Any, Optional, Union
+
+from pydantic import BaseModel, ValidationError
+
+logger = logging.getLogger(__name__)
+
+_FENCE = re.compile(r"^\s*```[\w-]*\s*\n?|\n?\s*```\s*$")
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_TRUE = {"true", "yes", "y", "1", "checked", "x"}
+_FALSE = {"false", "no", "n", "0", "unchecked"}
+_NULL = {"", "null", "none", "n/a"}
+_CONFIDENCE_WORDS = {"very high": 0.95, "high": 0.9, "medium": 0.7, "moderate": 0.7, "low": 0.4, "very low": 0.2}
+
+
+class StructuredOutputError(ValueError):
+    """A response that could not be repaired into its response model."""
+
+
+# =============================================================================
+# TOLERANT JSON PARSING
+# =============================================================================
+
+def _scan(text: str) -> tuple[str, list[str], Optional[tuple[int, list[str]]]]:
+    """
+    One pass over JSON-ish text: drop trailing commas, map Python literals.
+
+    Returns:
+        (cleaned text, containers still open at the end, last safe cut point
+        as (length of cleaned text, containers open there)). A cut is safe
+        between list items or between the keys of an object that is not a
+        list item, so cutting there never keeps a partial value or a
+        partial list item.
+    """
+    out: list[str] = []
+    stack: list[str] = []
+    cut: Optional[tuple[int, list[str]]] = None  # (index into out, open containers)
+    i, n = 0, len(text)
+
+    def safe() -> bool:
+        return bool(stack) and (stack[-1] == "[" or "[" not in stack)
+
+    while i < n:
+        ch = text[i]
+        if ch == '"':
+            j = i + 1
+            while j < n and text[j] != '"':
+                j += 2 if text[j] == "\\" else 1
+            if j >= n:
+                break  # unterminated string: everything from here is dropped
+            out.append(text[i:j + 1])
+            i = j + 1
+            continue
+        if ch in "{[":
+            stack.append(ch)
+            out.append(ch)
+            if ch == "[":
+                cut = (len(out), list(stack))
+        elif ch in "}]":
+            # A trailing comma before a closer is dropped.
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if stack:
+                stack.pop()
+            out.append(ch)
+            if safe():
+                cut = (len(out), list(stack))
+            if not stack:
+                break  # end of the top-level value; anything after is chatter
+        elif ch == ",":
+            if safe():
+                cut = (len(out), list(stack))
+            out.append(ch)
+        elif ch.isalpha():
+            j = i
+            while j < n and text[j].isalnum():
+                j += 1
+            word = text[i:j]
+            out.append(_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+    if cut is not None:
+        cut = (len("".join(out[:cut[0]])), cut[1])
+    return "".join(out), stack, cut
+
+
+def repair_json(text: str, repairs: Optional[list[str]] = None) -> Any:
+    """
+    Parse JSON from a model's text output, repairing what can be repaired.
+
+    Args:
+        text: Raw completion text (may be fenced, chatty, or truncated)
+        repairs: If given, gets one entry per repair that was needed
+
+    Raises:
+        StructuredOutputError: No JSON value could be recovered
+    """
+    repairs = repairs if repairs is not None else []
+    stripped = _FENCE.sub("", text).strip()
+    if stripped != text.strip():
+        repairs.append("code_fence")
+    try:
+        return json.loads(stripped, strict=False)
+    except json.JSONDecodeError:
+        pass
+
+    start = min((i for i in (stripped.find("{"), stripped.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        raise StructuredOutputError("no JSON object or array in the response")
+    if start > 0:
+        repairs.append("leading_text")
+    cleaned, open_containers, cut = _scan(stripped[start:])
+    if open_containers:
+        if cut is None:
+            raise StructuredOutputError("response truncated before any complete value")
+        cleaned, open_containers = cleaned[:cut[0]].rstrip().rstrip(","), cut[1]
+        cleaned += "".join("}" if c == "{" else "]" for c in reversed(open_containers))
+        repairs.append("truncated")
+    else:
+        repairs.append("syntax")
+    try:
+        return json.loads(cleaned, strict=False)
+    except json.JSONDecodeError as e:
+        raise StructuredOutputError(f"unparseable JSON after repair: {e}") from e
+
+
+def completion_payload(completion: Any) -> Any:
+    """
+    The structured part of a raw completion: the message text of an OpenAI
+    chat completion, or the tool input (else text) of an Anthropic message.
+    """
+    choices = getattr(completion, "choices", None)
+    if choices:
+        message = choices[0].message
+        tool_calls = getattr(message, "tool_calls", None)
+        if tool_calls:
+            return tool_calls[0].function.arguments
+        return message.content or ""
+    content = getattr(completion, "content", None)
+    if isinstance(content, list):
+        for block in content:
+            if getattr(block, "type", None) == "tool_use":
+                return block.input
+        return "".join(getattr(block, "text", "") for block in content)
+    if isinstance(completion, (str, dict, list)):
+        return completion
+    raise StructuredOutputError(f"unrecognized completion type {type(completion).__name__}")
+
+
+# =============================================================================
+# COERCION ONTO THE RESPONSE MODEL
+# =============================================================================
+
+def _bounds(metadata: list) -> tuple[Optional[float], Optional[float]]:
+    ge = next((m.ge for m in metadata if hasattr(m, "ge")), None)
+    le = next((m.le for m in metadata if hasattr(m, "le")), None)
+    return ge, le
+
+
+def _to_float(value: Any, metadata: list) -> Any:
+    ge, le = _bounds(metadata)
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in _CONFIDENCE_WORDS and le == 1:
+            return _CONFIDENCE_WORDS[text]
+        percent = text.endswith("%")
+        try:
+            value = float(text.rstrip("%").strip())
+        except ValueError:
+            return value
+        if percent:
+            value /= 100
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value
+    if le == 1 and 1 < value <= 100:
+        value /= 100  # a 0-100 score where a 0-1 one was asked for
+    if ge is not None:
+        value = max(ge, value)
+    if le is not None:
+        value = min(le, value)
+    return float(value)
+
+
+def _coerce_scalar(value: Any, target: type, metadata: list) -> Any:
+    if target is float:
+        return _to_float(value, metadata)
+    if target is int and not isinstance(value, bool):
+        if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+            return int(value.strip())
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+    if target is bool and isinstance(value, (str, int)) and not isinstance(value, bool):
+        text = str(value).strip().lower()
+        if text in _TRUE:
+            return True
+        if text in _FALSE:
+            return False
+    if target is str:
+        if isinstance(value, (bool, int, float)):
+            return json.dumps(value) if isinstance(value, bool) else str(value)
+        if isinstance(value, (list, dict)):
+            return json.dumps(value)
+    return value
+
+
+def _coerce(
+    value: Any,
+    annotation: Any,
+    metadata: list,
+    path: str,
+    repairs: list[str],
+    defaults: dict[type[BaseModel], dict[str, Any]],
+) -> Any:
+    origin, args = typing.get_origin(annotation), typing.get_args(annotation)
+    if origin is Union:
+        options = [a for a in args if a is not type(None)]
+        if type(None) in args and isinstance(value, str):
+            text = value.strip().lower()
+            # "null" is never a reading; "" is one only where a string is expected.
+            if text in ("null", "none") or (text in _NULL and str not in options):
+                repairs.append(f"coerced:{path}")
+                return None
+        if value is None or len(options) != 1:
+            return value
+        return _coerce(value, options[0], metadata, path, repairs, defaults)
+    if origin is list:
+        item_type = args[0] if args else Any
+        if value is None:
+            return []
+        if not isinstance(value, list):
+            value = [value]
+            repairs.append(f"wrapped_in_list:{path}")
+        items = []
+        for i, item in enumerate(value):
+            item = _coerce(item, item_type, [], f"{path}[{i}]", repairs, defaults)
+            if isinstance(item_type, type) and issubclass(item_type, BaseModel):
+                try:
+                    item_type.model_validate(item)
+                except ValidationError:
+                    repairs.append(f"dropped_item:{path}[{i}]")
+                    continue
+            items.append(item)
+        return items
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _coerce_model(value, annotation, path, repairs, defaults)
+    if annotation in (float, int, bool, str):
+        coerced = _coerce_scalar(value, annotation, metadata)
+        if coerced != value or type(coerced) is not type(value):
+            repairs.append(f"coerced:{path}")
+        return coerced
+    return value
+
+
+def _coerce_model(
+    data: Any,
+    model: type[BaseModel],
+    path: str,
+    repairs: list[str],
+    defaults: dict[type[BaseModel], dict[str, Any]],
+) -> Any:
+    list_fields = [
+        name for name, info in model.model_fields.items()
+        if typing.get_origin(info.annotation) is list and info.is_required()
+    ]
+    if isinstance(data, list) and len(list_fields) == 1:
+        # A bare list where an object with one list field was asked for.
+        data = {list_fields[0]: data}
+        repairs.append(f"wrapped_in_object:{path or model.__name__}")
+    if not isinstance(data, dict):
+        return data
+    data = dict(data)
+    for name, info in model.model_fields.items():
+        field_path = f"{path}.{name}" if path else name
+        key = name if name in data else info.alias if info.alias in data else None
+        if key is None:
+            if name in defaults.get(model, {}):
+                data[name] = defaults[model][name]
+                repairs.append(f"default:{field_path}")
+            continue
+        data[key] = _coerce(data[key], info.annotation, info.metadata, field_path, repairs, defaults)
+    return data
+
+
+def repair_structured_output(
+    payload: Any,
+    response_model: type[BaseModel],
+    defaults: Optional[dict[type[BaseModel], dict[str, Any]]] = None,
+) -> tuple[BaseModel, list[str]]:
+    """
+    Validate a raw response against ``response_model``, repairing it first
+    if it doesn't validate as is.
+
+    Args:
+        payload: Completion text, or already-parsed JSON (e.g. a tool input)
+        response_model: The model the response was asked to follow
+        defaults: Per model, values for required keys a truncated response
+            may have lost (e.g. the trailing page_legibility of a page)
+
+    Returns:
+        (validated response, repairs made; empty if none were needed)
+
+    Raises:
+        StructuredOutputError: Nothing valid could be recovered
+    """
+    repairs: list[str] = []
+    data = repair_json(payload, repairs) if isinstance(payload, str) else payload
+    try:
+        return response_model.model_validate(data), repairs
+    except ValidationError:
+        pass
+    data = _coerce_model(data, response_model, "", repairs, defaults or {})
+    try:
+        result = response_model.model_validate(data)
+    except ValidationError as e:
+        raise StructuredOutputError(
+            f"{response_model.__name__} still invalid after repair ({e.error_count()} errors): {e.errors()[0]['msg']}"
+        ) from e
+    logger.info("Repaired %s response locally: %s", response_model.__name__, ", ".join(repairs[:10]))
+    return result, repairs
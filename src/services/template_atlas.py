@@ -0,0 +1,553 @@
+"""
+Offline builder for per-field region atlases of blank template pages.
+
+Schema fields only carry a free-text ``position_description``, so this
+locates each field on its ``*_blank_page_N.png`` once:
+
+  1. OCR text segments (pytesseract by default; any segment source works).
+  2. Classical CV on the binarized page — segments are split into word boxes
+     at ink-column gaps, words are grouped into text rows, and printed
+     underline rules are found by horizontal morphological opening.
+  3. Schema labels are fuzzy-matched against word windows in reading order;
+     option words (YES/NO, scale numbers, listed choices) are located next
+     to the label, and free-text answer areas extend along their rule.
+
+The result is saved as a ``.regions/`` sidecar (see field_regions). Each
+atlas records the template and page-schema hashes it was built from, so
+rebuilding only touches pages whose template or schema changed.
+"""
+
+import difflib
+import hashlib
+import logging
+import re
+import statistics
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterable, Optional
+
+import numpy as np
+from rich.console import Console
+from scipy import ndimage
+
+from ..models import FormFieldSchema, FormSchema, PageSchema, SectionSchema, TableSchema
+from .field_regions import FieldRegion, FieldRegionAtlas, NormBox, get_field_regions, save_field_regions
+from .mark_detector import YES_NO_OPTIONS, field_options
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+console = Console()
+logger = logging.getLogger(__name__)
+
+INK_THRESHOLD = 160           # gray level below which a pixel counts as ink
+MIN_LABEL_SCORE = 0.72        # fuzzy-match ratio needed to accept a label
+MIN_OPTION_SCORE = 0.8
+RULE_MIN_LENGTH = 0.04        # underline rules at least this fraction of page width
+
+YES_NO_TYPES = tuple(YES_NO_OPTIONS)
+
+
+@dataclass
+class TextSegment:
+    """A piece of recognized text and its pixel box (x0, y0, x1, y1)."""
+
+    text: str
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+
+
+SegmentSource = Callable[["Image.Image"], list[TextSegment]]
+
+
+def tesseract_segments(img) -> list[TextSegment]:
+    """Word segments from Tesseract (needs pytesseract and the tesseract binary)."""
+    try:
+        import pytesseract
+    except ImportError as e:
+        raise RuntimeError(
+            "Building template atlases needs OCR: pip install pytesseract and install tesseract"
+        ) from e
+
+    data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT)
+    segments = []
+    for text, conf, left, top, width, height in zip(
+        data["text"], data["conf"], data["left"], data["top"], data["width"], data["height"]
+    ):
+        if text.strip() and float(conf) >= 0:
+            segments.append(TextSegment(text.strip(), left, top, left + width, top + height))
+    return segments
+
+
+@lru_cache(maxsize=1)
+def _rapidocr_engine():
+    try:
+        from rapidocr_onnxruntime import RapidOCR
+    except ImportError as e:
+        raise RuntimeError("RapidOCR segment source needs: pip install rapidocr_onnxruntime") from e
+    return RapidOCR()
+
+
+def rapidocr_segments(img) -> list[TextSegment]:
+    """
+    Line segments from RapidOCR (pip-installable, models bundled; no system
+    binary needed). Lines are split into words by the layout step.
+    """
+    result, _ = _rapidocr_engine()(np.asarray(img.convert("RGB")))
+    segments = []
+    for box, text, _score in result or []:
+        xs = [int(round(x)) for x, _ in box]
+        ys = [int(round(y)) for _, y in box]
+        if text.strip():
+            segments.append(TextSegment(text.strip(), min(xs), min(ys), max(xs), max(ys)))
+    return segments
+
+
+OCR_SOURCES: dict[str, SegmentSource] = {
+    "tesseract": tesseract_segments,
+    "rapidocr": rapidocr_segments,
+}
+
+
+# =============================================================================
+# LAYOUT (classical CV)
+# =============================================================================
+
+@dataclass
+class _Word:
+    text: str
+    key: str
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+    row: int = -1
+    index: int = -1   # position within its row
+
+    @property
+    def cy(self) -> float:
+        return (self.y0 + self.y1) / 2
+
+    @property
+    def height(self) -> int:
+        return self.y1 - self.y0
+
+
+def _key(text: str) -> str:
+    """Comparison key: lowercase alphanumerics only (OCR often drops spaces)."""
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+
+def _ink_mask(img) -> np.ndarray:
+    gray = np.asarray(img.convert("L"))
+    return gray < INK_THRESHOLD
+
+
+def _split_segment(ink: np.ndarray, seg: TextSegment) -> list[_Word]:
+    """Split an OCR segment into word boxes at ink-column gaps."""
+    tokens = seg.text.split()
+    if len(tokens) <= 1:
+        return [_Word(seg.text, _key(seg.text), seg.x0, seg.y0, seg.x1, seg.y1)]
+
+    cols = ink[max(seg.y0, 0):seg.y1, max(seg.x0, 0):seg.x1].any(axis=0)
+    min_gap = max(6, int(0.3 * (seg.y1 - seg.y0)))
+    runs: list[tuple[int, int]] = []
+    start, gap = None, 0
+    for i, on in enumerate(cols):
+        if on:
+            if start is None:
+                start = i
+            elif gap >= min_gap:
+                runs.append((start, i - gap))
+                start = i
+            gap = 0
+        elif start is not None:
+            gap += 1
+    if start is not None:
+        runs.append((start, len(cols) - gap))
+
+    if len(runs) == len(tokens):
+        spans = [(seg.x0 + a, seg.x0 + b) for a, b in runs]
+    else:
+        # Fall back to splitting the box in proportion to character positions.
+        width, n = seg.x1 - seg.x0, len(seg.text)
+        spans, pos = [], 0
+        for token in tokens:
+            a = seg.text.index(token, pos)
+            pos = a + len(token)
+            spans.append((seg.x0 + width * a // n, seg.x0 + width * pos // n))
+    return [_Word(t, _key(t), a, seg.y0, b, seg.y1) for t, (a, b) in zip(tokens, spans)]
+
+
+def _group_rows(words: list[_Word]) -> list[list[_Word]]:
+    """Group words into text rows by vertical center, each row sorted by x."""
+    if not words:
+        return []
+    tolerance = 0.5 * statistics.median(w.height for w in words)
+    rows: list[list[_Word]] = []
+    for word in sorted(words, key=lambda w: w.cy):
+        if rows and abs(word.cy - statistics.fmean(w.cy for w in rows[-1])) <= tolerance:
+            rows[-1].append(word)
+        else:
+            rows.append([word])
+    for r, row in enumerate(rows):
+        row.sort(key=lambda w: w.x0)
+        for i, word in enumerate(row):
+            word.row, word.index = r, i
+    return rows
+
+
+def _find_rules(ink: np.ndarray) -> list[tuple[int, int, int, int]]:
+    """Horizontal printed rules (answer underlines) as pixel boxes."""
+    length = max(20, int(RULE_MIN_LENGTH * ink.shape[1]))
+    rules = ndimage.binary_opening(ink, structure=np.ones((1, length), dtype=bool))
+    labels, _ = ndimage.label(rules)
+    boxes = []
+    for sl in ndimage.find_objects(labels):
+        if sl is None:
+            continue
+        y, x = sl
+        if y.stop - y.start <= 8:
+            boxes.append((x.start, y.start, x.stop, y.stop))
+    return boxes
+
+
+# =============================================================================
+# MATCHING
+# =============================================================================
+
+_NUMBERING = re.compile(r"^\s*(\d{1,2})[.)]\s*")
+NUMBERING_BONUS = 0.1
+MAX_CANDIDATES = 5
+
+# A label candidate: (score, row index, first word index, last word index).
+_Candidate = tuple[float, int, int, int]
+
+
+class _PageLayout:
+    def __init__(self, img, segments: list[TextSegment]):
+        self.width, self.height = img.size
+        self.ink = _ink_mask(img)
+        words = [w for seg in segments for w in _split_segment(self.ink, seg) if w.key]
+        self.rows = _group_rows(words)
+        self.rules = _find_rules(self.ink)
+        cols = np.flatnonzero(self.ink.sum(axis=0) > 2)
+        self.content_x1 = int(cols[-1]) if cols.size else self.width
+        self.used: set[tuple[int, int]] = set()
+
+    def norm(self, x0: float, y0: float, x1: float, y1: float) -> NormBox:
+        return (
+            max(0.0, x0 / self.width), max(0.0, y0 / self.height),
+            min(1.0, x1 / self.width), min(1.0, y1 / self.height),
+        )
+
+    def words(self, candidate: _Candidate) -> list[_Word]:
+        _, r, i, j = candidate
+        return self.rows[r][i:j + 1]
+
+    def label_candidates(self, label: str) -> list[_Candidate]:
+        """Best-scoring word windows for a printed label.
+        
+        A leading question number ("3. Do you ...") is matched separately:
+        on these forms it is often printed apart from the question text.
+        """
+        numbering = _NUMBERING.match(label)
+        number = numbering.group(1) if numbering else None
+        target = _key(label[numbering.end():] if numbering else label)
+        if len(target) < 2:
+            return []
+
+        candidates: list[_Candidate] = []
+        for r, row in enumerate(self.rows):
+            for i in range(len(row)):
+                text = ""
+                for j in range(i, len(row)):
+                    text += row[j].key
+                    if len(text) > 1.4 * len(target) + 3:
+                        break
+                    if len(text) < min(len(target), max(10, 0.4 * len(target))):
+                        continue
+                    # Multi-line labels only show their first line in a row.
+                    compare = target if len(text) >= len(target) else target[:len(text)]
+                    matcher = difflib.SequenceMatcher(None, compare, text, autojunk=False)
+                    if matcher.real_quick_ratio() < MIN_LABEL_SCORE or matcher.quick_ratio() < MIN_LABEL_SCORE:
+                        continue
+                    score = matcher.ratio() * (0.6 + 0.4 * min(1.0, len(text) / len(target)))
+                    if score < MIN_LABEL_SCORE:
+                        continue
+                    if number and any(w.key == number for w in row[max(0, i - 4):i]):
+                        score += NUMBERING_BONUS
+                    candidates.append((score, r, i, j))
+        # Best score first, then reading order.
+        candidates.sort(key=lambda c: (-c[0], c[1], c[2]))
+        return candidates[:MAX_CANDIDATES]
+
+    def assign_labels(self, labels: dict[str, str]) -> dict[str, tuple[list[_Word], float]]:
+        """Match labels to word windows, best matches first, no word used twice.
+        
+        On equal scores longer labels go first, so "Birth Date:" claims its
+        words before a bare "DATE:" can.
+        """
+        ranked = [
+            (candidate, len(label), item_id)
+            for item_id, label in labels.items()
+            for candidate in self.label_candidates(label)
+        ]
+        ranked.sort(key=lambda c: (-c[0][0], -c[1]))
+
+        assigned: dict[str, tuple[list[_Word], float]] = {}
+        for candidate, _, item_id in ranked:
+            if item_id in assigned:
+                continue
+            words = self.words(candidate)
+            keys = {(w.row, w.index) for w in words}
+            if keys & self.used:
+                continue
+            self.used |= keys
+            assigned[item_id] = (words, min(candidate[0], 1.0))
+        return assigned
+
+    def match_options(
+        self,
+        options: list[str],
+        rows: Iterable[int],
+        near_x: float,
+    ) -> dict[str, NormBox]:
+        """Locate printed option words, trying the given rows in order.
+        
+        Each option is taken from the first row that has it, nearest to near_x.
+        """
+        rows = [r for r in rows if 0 <= r < len(self.rows)]
+        found: dict[str, NormBox] = {}
+        for option in options:
+            target = _key(option)
+            if not target:
+                continue
+            for r in rows:
+                candidates: list[tuple[float, tuple[float, float, float, float]]] = []
+                for w in self.rows[r]:
+                    if w.key == target:
+                        box = (w.x0, w.y0, w.x1, w.y1)
+                    elif len(target) >= 3 and target in w.key:
+                        # Option merged into a longer OCR word — take its share of the box.
+                        start = w.key.index(target)
+                        span = (w.x1 - w.x0) / len(w.key)
+                        box = (w.x0 + start * span, w.y0, w.x0 + (start + len(target)) * span, w.y1)
+                    elif len(target) >= 3 and difflib.SequenceMatcher(None, target, w.key).ratio() >= MIN_OPTION_SCORE:
+                        box = (w.x0, w.y0, w.x1, w.y1)
+                    else:
+                        continue
+                    candidates.append((abs((box[0] + box[2]) / 2 - near_x), box))
+                if candidates:
+                    found[option] = self.norm(*min(candidates)[1])
+                    break
+        return found
+
+    def answer_right_edge(self, words: list[_Word]) -> int:
+        """Right end of a free-text answer area that starts after a label."""
+        x1 = max(w.x1 for w in words)
+        y0, y1 = min(w.y0 for w in words), max(w.y1 for w in words)
+        h = y1 - y0
+        rule_ends = [
+            rx1 for rx0, ry0, rx1, ry1 in self.rules
+            if y0 <= ry0 <= y1 + h and x1 - h <= rx0 <= x1 + 3 * h
+        ]
+        if rule_ends:
+            return max(rule_ends)
+        row = self.rows[words[-1].row]
+        following = [w for w in row[words[-1].index + 1:] if (w.row, w.index) not in self.used]
+        return following[0].x0 - h // 2 if following else self.content_x1
+
+
+def _iter_items(page_schema: PageSchema) -> Iterable[FormFieldSchema | TableSchema]:
+    def walk(section: SectionSchema):
+        yield from section.fields
+        yield from section.tables
+        for sub in section.subsections:
+            yield from walk(sub)
+
+    yield from page_schema.standalone_fields
+    yield from page_schema.standalone_tables
+    for section in page_schema.sections:
+        yield from walk(section)
+
+
+def _locate_field(
+    layout: _PageLayout,
+    field: FormFieldSchema,
+    label: Optional[tuple[list[_Word], float]],
+) -> Optional[FieldRegion]:
+    options = field_options(field)
+
+    if label:
+        words, score = label
+        row = words[0].row
+        lx0, lx1 = min(w.x0 for w in words), max(w.x1 for w in words)
+        y0, y1 = min(w.y0 for w in words), max(w.y1 for w in words)
+        option_boxes = layout.match_options(options, (row, row + 1), (lx0 + lx1) / 2) if options else {}
+        if option_boxes:
+            x0 = min([b[0] * layout.width for b in option_boxes.values()] + [lx0])
+            x1 = max([b[2] * layout.width for b in option_boxes.values()] + [lx1])
+            y1 = max([b[3] * layout.height for b in option_boxes.values()] + [y1])
+        else:
+            x0, x1 = lx0, layout.answer_right_edge(words)
+    elif len(options) >= 2 and field.field_type not in YES_NO_TYPES:
+        # No printed label (e.g. a sub-list under a question): take the row
+        # holding most of the options. YES/NO pairs are on every row, so
+        # they can't place a field on their own.
+        option_boxes = {}
+        for r in range(len(layout.rows)):
+            boxes = layout.match_options(options, (r,), 0.0)
+            if len(boxes) > len(option_boxes):
+                option_boxes = boxes
+        if len(option_boxes) < max(2, int(0.6 * len(options))):
+            return None
+        score = len(option_boxes) / len(options)
+        x0 = min(b[0] for b in option_boxes.values()) * layout.width
+        x1 = max(b[2] for b in option_boxes.values()) * layout.width
+        y0 = min(b[1] for b in option_boxes.values()) * layout.height
+        y1 = max(b[3] for b in option_boxes.values()) * layout.height
+    else:
+        return None
+
+    # Leave room for handwriting above and below the printed line.
+    h = y1 - y0
+    return FieldRegion(
+        box=layout.norm(x0, y0 - 0.4 * h, x1, y1 + 0.3 * h),
+        options=option_boxes,
+        score=score,
+    )
+
+
+def _locate_table(
+    layout: _PageLayout,
+    matches: list[tuple[list[_Word], float]],
+) -> Optional[FieldRegion]:
+    if not matches:
+        return None
+    words = [w for found, _ in matches for w in found]
+    return FieldRegion(
+        box=layout.norm(
+            min(w.x0 for w in words), min(w.y0 for w in words),
+            layout.content_x1, max(w.y1 for w in words),
+        ),
+        score=statistics.fmean(score for _, score in matches),
+    )
+
+
+# =============================================================================
+# PUBLIC API
+# =============================================================================
+
+def file_sha256(path: Path) -> str:
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def page_schema_sha256(page_schema: PageSchema) -> str:
+    return hashlib.sha256(page_schema.model_dump_json().encode("utf-8")).hexdigest()
+
+
+def build_atlas(
+    blank_image_path: Path,
+    page_schema: PageSchema,
+    segment_source: Optional[SegmentSource] = None,
+) -> FieldRegionAtlas:
+    """
+    Locate every field and table of a page on its blank template.
+
+    Args:
+        blank_image_path: Blank template page image
+        page_schema: Schema of that page
+        segment_source: OCR function returning text segments; Tesseract by default
+    """
+    from PIL import Image
+
+    blank_image_path = Path(blank_image_path)
+    with Image.open(blank_image_path) as img:
+        img = img.convert("RGB")
+        layout = _PageLayout(img, (segment_source or tesseract_segments)(img))
+
+    items = list(_iter_items(page_schema))
+    labels: dict[str, str] = {}
+    for item in items:
+        if isinstance(item, TableSchema):
+            if item.table_title:
+                labels[f"{item.table_id}#title"] = item.table_title
+            for n, row_label in enumerate(item.row_labels or []):
+                labels[f"{item.table_id}#row{n}"] = row_label
+        else:
+            labels[item.field_id] = item.field_label
+    assigned = layout.assign_labels(labels)
+
+    regions: dict[str, FieldRegion] = {}
+    unmatched: list[str] = []
+    for item in items:
+        if isinstance(item, TableSchema):
+            item_id = item.table_id
+            region = _locate_table(layout, [m for key, m in assigned.items() if key.startswith(f"{item_id}#")])
+        else:
+            item_id = item.field_id
+            region = _locate_field(layout, item, assigned.get(item_id))
+        if region:
+            regions[item_id] = region
+        else:
+            unmatched.append(item_id)
+
+    return FieldRegionAtlas(
+        template=blank_image_path.name,
+        width=layout.width,
+        height=layout.height,
+        regions=regions,
+        source_sha256=file_sha256(blank_image_path),
+        schema_sha256=page_schema_sha256(page_schema),
+        unmatched=unmatched,
+    )
+
+
+def atlas_is_current(blank_image_path: Path, page_schema: PageSchema) -> bool:
+    """True if the saved atlas was built from this template and page schema."""
+    atlas = get_field_regions(blank_image_path)
+    return bool(
+        atlas
+        and atlas.schema_sha256 == page_schema_sha256(page_schema)
+        and atlas.source_sha256 == file_sha256(blank_image_path)
+    )
+
+
+def build_form_atlases(
+    form_schema: FormSchema,
+    schema_dir: Path,
+    force: bool = False,
+    segment_source: Optional[SegmentSource] = None,
+) -> dict[int, str]:
+    """
+    Build atlases for every page of a form whose template or schema changed.
+
+    Returns:
+        page_number -> "built", "current" or "no_template"
+    """
+    statuses: dict[int, str] = {}
+    for page in form_schema.pages:
+        filename = form_schema.get_blank_image_filename(page.page_number)
+        blank_path = Path(schema_dir) / filename if filename else None
+        if not blank_path or not blank_path.exists():
+            statuses[page.page_number] = "no_template"
+            continue
+        if not force and atlas_is_current(blank_path, page):
+            statuses[page.page_number] = "current"
+            continue
+
+        atlas = build_atlas(blank_path, page, segment_source)
+        save_field_regions(blank_path, atlas)
+        total = len(atlas.regions) + len(atlas.unmatched)
+        console.print(
+            f"  Page {page.page_number}: located {len(atlas.regions)}/{total} "
+            f"fields on {blank_path.name}"
+        )
+        if atlas.unmatched:
+            logger.info("Page %d unmatched: %s", page.page_number, ", ".join(atlas.unmatched))
+        statuses[page.page_number] = "built"
+    return statuses
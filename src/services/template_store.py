@@ -0,0 +1,139 @@
+"""
+Precomputed image payloads for blank template pages.
+
+Every differential page call sends the same blank template image. Encoding
+it (PNG decode, resize, JPEG encode, base64; see image_encoding) is pure CPU
+waste after the first time, so payloads are encoded once per profile and
+process, kept in memory,
+and persisted in a ``.payloads/`` directory next to the templates so a
+restarted worker doesn't repeat the work either. Entries are validated
+against the source file's mtime/size and, failing that, its sha256.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional
+
+from .image_encoding import EncodingProfile, encode_image, get_encoding_profile
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_DIR_NAME = ".payloads"
+
+
+@dataclass
+class TemplatePayload:
+    data: str
+    media_type: str
+    source_sha256: str
+    mtime_ns: int
+    size: int
+
+
+class TemplatePayloadStore:
+    """In-memory + on-disk store of encoded blank template payloads."""
+
+    def __init__(self):
+        self._payloads: dict[tuple[str, str], TemplatePayload] = {}
+        self._lock = threading.Lock()
+        self._key_locks: dict[tuple[str, str], threading.Lock] = {}
+
+    def get(self, image_path: Path, profile: Optional[EncodingProfile] = None) -> tuple[str, str]:
+        """
+        Return (base64 data, media type) for a template, encoding at most once.
+
+        Args:
+            profile: Encoding profile; defaults to get_encoding_profile().
+                Pages and their templates should be encoded with the same one.
+        """
+        profile = profile or get_encoding_profile()
+        image_path = Path(image_path).resolve()
+        key = (str(image_path), profile.key)
+        stat = image_path.stat()
+
+        payload = self._payloads.get(key)
+        if payload and payload.mtime_ns == stat.st_mtime_ns and payload.size == stat.st_size:
+            return payload.data, payload.media_type
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # Concurrent jobs asking for the same template wait for one encode.
+        with key_lock:
+            payload = self._payloads.get(key)
+            if payload and payload.mtime_ns == stat.st_mtime_ns and payload.size == stat.st_size:
+                return payload.data, payload.media_type
+            payload = self._load_or_encode(image_path, stat, profile)
+            self._payloads[key] = payload
+        return payload.data, payload.media_type
+
+    def warm(self, image_paths: Iterable[Optional[Path]], profile: Optional[EncodingProfile] = None) -> int:
+        """Encode (or load from disk) every given template. Returns the count loaded."""
+        loaded = 0
+        for path in image_paths:
+            if not path or not Path(path).exists():
+                continue
+            try:
+                self.get(path, profile)
+                loaded += 1
+            except Exception as e:
+                logger.warning("Failed to warm template payload %s: %s", path, e)
+        return loaded
+
+    def _sidecar_path(self, image_path: Path, profile: EncodingProfile) -> Path:
+        return image_path.parent / PAYLOAD_DIR_NAME / f"{image_path.stem}.{profile.key}.json"
+
+    def _load_or_encode(self, image_path: Path, stat, profile: EncodingProfile) -> TemplatePayload:
+        sidecar = self._sidecar_path(image_path, profile)
+        cached = self._read_sidecar(sidecar)
+        if cached and cached.mtime_ns == stat.st_mtime_ns and cached.size == stat.st_size:
+            return cached
+
+        source_sha256 = hashlib.sha256(image_path.read_bytes()).hexdigest()
+        if cached and cached.source_sha256 == source_sha256:
+            # Same content, touched file (e.g. fresh checkout) — just refresh the stamp.
+            cached.mtime_ns, cached.size = stat.st_mtime_ns, stat.st_size
+            self._write_sidecar(sidecar, cached)
+            return cached
+
+        encoded = encode_image(image_path, profile)
+        payload = TemplatePayload(
+            data=encoded.data,
+            media_type=encoded.media_type,
+            source_sha256=source_sha256,
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+        )
+        self._write_sidecar(sidecar, payload)
+        logger.info("Encoded template payload %s (%d KB)", image_path.name, encoded.size_bytes // 1024)
+        return payload
+
+    def _read_sidecar(self, sidecar: Path) -> Optional[TemplatePayload]:
+        if not sidecar.exists():
+            return None
+        try:
+            return TemplatePayload(**json.loads(sidecar.read_text(encoding="utf-8")))
+        except Exception as e:
+            logger.warning("Ignoring unreadable template payload %s: %s", sidecar, e)
+            return None
+
+    def _write_sidecar(self, sidecar: Path, payload: TemplatePayload) -> None:
+        try:
+            sidecar.parent.mkdir(parents=True, exist_ok=True)
+            tmp = sidecar.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(payload.__dict__), encoding="utf-8")
+            tmp.replace(sidecar)
+        except OSError as e:
+            # Read-only template dirs still get the in-memory copy.
+            logger.debug("Could not persist template payload %s: %s", sidecar, e)
+
+
+@lru_cache(maxsize=1)
+def get_template_store() -> TemplatePayloadStore:
+    """Process-wide template payload store."""
+    return TemplatePayloadStore()
@@ -0,0 +1,146 @@
+"""
+Confidence-gated policy for Stage 2 (verification).
+
+Stage 2 re-sends the page image plus the Stage 1 results to a second model,
+roughly doubling cost and latency per page. Pages Stage 1 read cleanly
+don't need it; on the rest only the low-confidence and legally significant
+fields are worth re-checking. Every decision is logged (and counted on the
+pipeline) so throughput gains can be weighed against accuracy.
+
+The default stays "always" (every page verified, as before the policy
+existed) until selective mode's thresholds are benchmarked against it;
+EXTRACTION_VERIFY_MODE=selective opts in.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+VERIFY_ALWAYS = "always"
+VERIFY_SELECTIVE = "selective"
+VERIFY_NEVER = "never"
+VERIFY_MODES = (VERIFY_ALWAYS, VERIFY_SELECTIVE, VERIFY_NEVER)
+
+DEFAULT_SKIP_PAGE_CONFIDENCE = 0.9
+DEFAULT_FIELD_CONFIDENCE = 0.85
+DEFAULT_CROPS_PER_REQUEST = 6
+DEFAULT_MAX_CROP_FIELDS = 24
+
+# Fields whose misread has legal consequences in the generated report.
+LEGALLY_SIGNIFICANT_FIELDS = frozenset({
+    "date_of_injury", "case_number", "claim_number", "patient_dob",
+    "p1_birth_date", "p5_date_of_injury", "p1_date",
+})
+LEGALLY_SIGNIFICANT_KEYWORDS = ("date_of_injury", "birth", "dob", "case_number", "claim_number")
+
+
+@dataclass(frozen=True)
+class VerificationDecision:
+    """What Stage 2 should do for one page."""
+
+    action: str  # "full", "subset" or "skip"
+    field_ids: list[str]
+    total_fields: int
+    reason: str
+
+    @property
+    def skipped(self) -> bool:
+        return self.action == "skip"
+
+
+@dataclass
+class VerificationPolicy:
+    """
+    Decides per page whether to verify, and which fields.
+
+    Args:
+        mode: "always" (verify every field; the default), "selective" or "never"
+        skip_page_confidence: In selective mode, skip pages whose fields are
+            all at or above this confidence
+        skip_legibility: Stage 1 legibility values that allow a skip
+        field_confidence: Fields below this are sent to the verifier
+        legally_significant_fields: Field IDs always sent when a page is verified
+        crop_verification: Verify a field subset from labelled crops of the
+            fields' template regions instead of the full page, when every
+            selected field has a region
+        crops_per_request: Crops sent in one verification request
+        max_crop_fields: Subsets larger than this use the full page instead
+    """
+
+    mode: str = VERIFY_ALWAYS
+    skip_page_confidence: float = DEFAULT_SKIP_PAGE_CONFIDENCE
+    skip_legibility: tuple[str, ...] = ("excellent",)
+    field_confidence: float = DEFAULT_FIELD_CONFIDENCE
+    legally_significant_fields: frozenset[str] = LEGALLY_SIGNIFICANT_FIELDS
+    crop_verification: bool = True
+    crops_per_request: int = DEFAULT_CROPS_PER_REQUEST
+    max_crop_fields: int = DEFAULT_MAX_CROP_FIELDS
+
+    def __post_init__(self):
+        if self.mode not in VERIFY_MODES:
+            raise ValueError(f"Unknown verification mode {self.mode!r} (expected one of {VERIFY_MODES})")
+
+    @classmethod
+    def from_env(cls) -> "VerificationPolicy":
+        """Policy from EXTRACTION_VERIFY_MODE / VERIFY_* environment variables."""
+        return cls(
+            mode=os.getenv("EXTRACTION_VERIFY_MODE", VERIFY_ALWAYS).lower(),
+            skip_page_confidence=float(os.getenv("VERIFY_SKIP_CONFIDENCE", DEFAULT_SKIP_PAGE_CONFIDENCE)),
+            field_confidence=float(os.getenv("VERIFY_FIELD_CONFIDENCE", DEFAULT_FIELD_CONFIDENCE)),
+            crop_verification=os.getenv("VERIFY_CROPS", "true").lower() in ("1", "true", "yes"),
+            crops_per_request=int(os.getenv("VERIFY_CROPS_PER_REQUEST", DEFAULT_CROPS_PER_REQUEST)),
+        )
+
+    def use_crops(self, decision: VerificationDecision, covered: bool) -> bool:
+        """Whether a decision's fields should be verified from crops."""
+        return (
+            self.crop_verification
+            and covered
+            and decision.action == "subset"
+            and 0 < len(decision.field_ids) <= self.max_crop_fields
+        )
+
+    def is_legally_significant(self, field_id: str) -> bool:
+        fid = field_id.lower()
+        return fid in self.legally_significant_fields or any(k in fid for k in LEGALLY_SIGNIFICANT_KEYWORDS)
+
+    def decide(self, fields: list, page_legibility: Optional[str]) -> VerificationDecision:
+        """
+        Choose the Stage 2 action for a page from its Stage 1 fields.
+
+        Args:
+            fields: Stage 1 extracted fields (anything with field_id and confidence)
+            page_legibility: Stage 1's legibility assessment
+        """
+        all_ids = [f.field_id for f in fields]
+        total = len(all_ids)
+
+        if self.mode == VERIFY_NEVER:
+            return VerificationDecision("skip", [], total, "verification disabled")
+        if self.mode == VERIFY_ALWAYS:
+            return VerificationDecision("full", all_ids, total, "policy verifies every page")
+        if not fields:
+            return VerificationDecision("full", all_ids, total, "no fields extracted")
+
+        min_confidence = min(f.confidence for f in fields)
+        if (
+            (page_legibility or "").lower() in self.skip_legibility
+            and min_confidence >= self.skip_page_confidence
+        ):
+            return VerificationDecision(
+                "skip", [], total,
+                f"legibility {page_legibility}, min confidence {min_confidence:.2f}",
+            )
+
+        low = [f.field_id for f in fields if f.confidence < self.field_confidence]
+        legal = [f.field_id for f in fields if self.is_legally_significant(f.field_id) and f.field_id not in low]
+        selected = low + legal
+        if not selected:
+            return VerificationDecision(
+                "skip", [], total,
+                f"no field below {self.field_confidence:.2f} and no legally significant fields",
+            )
+        return VerificationDecision(
+            "subset", selected, total,
+            f"{len(low)} low-confidence, {len(legal)} legally significant",
+        )
@@ -0,0 +1,15 @@
+-- One extraction result per page of a job.
+--
+-- Pages are saved as they finish and saved again for any the streaming save
+-- missed, so job_manager.save_page_result upserts on (job_id, page_number).
+-- PostgREST's on_conflict needs a unique index on exactly those columns.
+
+-- Keep only the newest row of any page saved more than once before this index.
+DELETE FROM extraction_results a
+USING extraction_results b
+WHERE a.job_id = b.job_id
+  AND a.page_number = b.page_number
+  AND (a.created_at, a.id) < (b.created_at, b.id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS extraction_results_job_page_key
+    ON extraction_results (job_id, page_number);
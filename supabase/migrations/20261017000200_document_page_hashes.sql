@@ -0,0 +1,34 @@
+-- Perceptual hashes of extracted pages, for reusing the results of duplicate
+-- pages (src/services/page_hash.py, job_manager.save_page_hash and
+-- find_duplicate_page).
+--
+-- One row per extracted page, keyed like extraction_results. A page is looked
+-- up by the 32-bit bands of its 256-bit dHash: any stored page sharing a band
+-- is a candidate (array overlap, served by the GIN index); distances and the
+-- ink grid are checked in Python.
+
+CREATE TABLE IF NOT EXISTS document_page_hashes (
+    id          uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    job_id      uuid NOT NULL REFERENCES extraction_jobs (id) ON DELETE CASCADE,
+    document_id uuid REFERENCES documents (id) ON DELETE CASCADE,
+    owner_id    uuid,
+    page_number integer NOT NULL,
+    schema_key  text NOT NULL,
+    dhash       text NOT NULL,   -- 256-bit dHash, hex
+    phash       text NOT NULL,   -- 256-bit pHash, hex
+    dhash_bands text[] NOT NULL, -- "<band index>:<band hex>" per 32-bit dHash band
+    ink         text,            -- zlib + base64 two-level ink grid
+    created_at  timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS document_page_hashes_job_page_key
+    ON document_page_hashes (job_id, page_number);
+
+CREATE INDEX IF NOT EXISTS document_page_hashes_dhash_bands_idx
+    ON document_page_hashes USING gin (dhash_bands);
+
+CREATE INDEX IF NOT EXISTS document_page_hashes_owner_schema_idx
+    ON document_page_hashes (owner_id, schema_key, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS document_page_hashes_document_schema_idx
+    ON document_page_hashes (document_id, schema_key, created_at DESC);
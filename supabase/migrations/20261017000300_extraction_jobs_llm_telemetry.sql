@@ -0,0 +1,11 @@
+-- Per-job LLM call telemetry (job_manager.save_job_telemetry).
+--
+-- llm_telemetry is call_telemetry.job_summary: call, token, cost and retry
+-- totals, latency quantiles, and the same per stage and per provider. llm_calls and
+-- llm_cost_usd copy two of its totals into plain columns for filtering and
+-- sorting jobs.
+
+ALTER TABLE extraction_jobs
+    ADD COLUMN IF NOT EXISTS llm_telemetry jsonb,
+    ADD COLUMN IF NOT EXISTS llm_calls     integer,
+    ADD COLUMN IF NOT EXISTS llm_cost_usd  numeric(12, 6);
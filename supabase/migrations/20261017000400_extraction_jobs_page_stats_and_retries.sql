@@ -0,0 +1,16 @@
+-- Per-job run settings and stats (job_manager.save_job_params,
+-- save_job_page_stats and append_job_retry).
+--
+-- extraction_params: what the job was run with (source kind, name, schema
+--   path, page range), so its failed pages can be re-extracted the same way.
+-- page_stats: pages the first run answered without the VLM (blank pages
+--   skipped, duplicate pages reused or seeded, VLM calls saved).
+-- retries: one object per retry of failed pages (started_at, status,
+--   processing_time_ms, page_numbers, still_failed, ai_model_used,
+--   page_stats, llm_telemetry). A retry never overwrites the first run's
+--   processing_time_ms, ai_model_used, page_stats or llm_telemetry.
+
+ALTER TABLE extraction_jobs
+    ADD COLUMN IF NOT EXISTS extraction_params jsonb,
+    ADD COLUMN IF NOT EXISTS page_stats        jsonb,
+    ADD COLUMN IF NOT EXISTS retries           jsonb NOT NULL DEFAULT '[]'::jsonb;
@@ -0,0 +1,36 @@
+"""Shared fixtures."""
+
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from .fake_supabase import FakeSupabase
+from .page_images import BLANK_PAGE
+
+
+@pytest.fixture(scope="session")
+def blank_page() -> Image.Image:
+    return Image.open(BLANK_PAGE).convert("RGB")
+
+
+@pytest.fixture
+def save(tmp_path):
+    """Save an image under tmp_path and return its path."""
+    def _save(img: Image.Image, name: str) -> Path:
+        path = tmp_path / f"{name}.png"
+        img.save(path)
+        return path
+    return _save
+
+
+@pytest.fixture
+def supabase(monkeypatch) -> FakeSupabase:
+    """An in-memory Supabase behind job_manager, with its schema fallbacks reset."""
+    from src.services import job_manager
+
+    client = FakeSupabase()
+    monkeypatch.setattr(job_manager, "get_supabase", lambda: client)
+    monkeypatch.setattr(job_manager, "_results_upsert_supported", True)
+    monkeypatch.setattr(job_manager, "_page_hashes_available", True)
+    return client
@@ -0,0 +1,84 @@
+"""In-memory stand-in for the few supabase-py query builder calls job_manager makes."""
+
+from types import SimpleNamespace
+
+
+class APIError(Exception):
+    """Shaped like postgrest.exceptions.APIError: a Postgres error code and message."""
+
+    def __init__(self, code: str, message: str = ""):
+        super().__init__(message or code)
+        self.code, self.message = code, message
+
+
+class _Query:
+    def __init__(self, client: "FakeSupabase", table: str):
+        self.client, self.table = client, table
+        self.op, self.payload, self.filters, self.on_conflict = "select", None, [], None
+        self.columns = "*"
+
+    def select(self, columns="*"):
+        self.op, self.columns = "select", columns
+        return self
+
+    def insert(self, row):
+        self.op, self.payload = "insert", row
+        return self
+
+    def upsert(self, row, on_conflict=None):
+        self.op, self.payload, self.on_conflict = "upsert", row, on_conflict
+        return self
+
+    def update(self, fields):
+        self.op, self.payload = "update", fields
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append((column, value))
+        return self
+
+    def __getattr__(self, name):
+        # ov/gt/order/limit: recorded nowhere, rows are filtered by eq only
+        return lambda *args, **kwargs: self
+
+    def _matches(self, row):
+        return all(row.get(column) == value for column, value in self.filters)
+
+    def execute(self):
+        self.client.calls.append((self.table, self.op))
+        error = self.client.errors.get((self.table, self.op))
+        if error is not None:
+            raise error
+        rows = self.client.rows.setdefault(self.table, [])
+        if self.op in ("insert", "upsert"):
+            keys = self.on_conflict.split(",") if self.on_conflict else []
+            if keys:
+                rows[:] = [r for r in rows if any(r.get(k) != self.payload.get(k) for k in keys)]
+            row = {"id": f"{self.table}-{len(self.client.calls)}", **self.payload}
+            rows.append(row)
+            return SimpleNamespace(data=[row])
+        matched = [r for r in rows if self._matches(r)]
+        if self.op == "update":
+            for row in matched:
+                row.update(self.payload)
+        elif self.op == "delete":
+            rows[:] = [r for r in rows if not self._matches(r)]
+        elif self.columns != "*":
+            matched = [{c: r.get(c) for c in self.columns.split(",")} for r in matched]
+        return SimpleNamespace(data=matched)
+
+
+class FakeSupabase:
+    """Rows per table; ``errors[(table, op)]`` is raised by every matching query."""
+
+    def __init__(self):
+        self.rows: dict[str, list[dict]] = {}
+        self.errors: dict[tuple[str, str], Exception] = {}
+        self.calls: list[tuple[str, str]] = []
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
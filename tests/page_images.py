@@ -0,0 +1,66 @@
+"""Test page images: a blank template, scan-like copies of it, and pen marks."""
+
+import io
+import random
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFilter
+
+TEMPLATES = Path(__file__).resolve().parent.parent / "templates"
+BLANK_PAGE = TEMPLATES / "orofacial_exam_blank_page_4.png"
+# An option word on that page ("Right" of p4_hand_dominance), as page fractions.
+OPTION_BOX = (0.25459, 0.11709, 0.29365, 0.13164)
+PEN = (30, 30, 150)
+
+
+def scan_like(img: Image.Image, seed: int, rescan: bool = True) -> Image.Image:
+    """A JPEG copy of a page; with ``rescan``, also slightly rescaled, offset and blurred."""
+    rng = random.Random(seed)
+    if rescan:
+        width, height = img.size
+        scale = 1 + rng.uniform(-0.004, 0.004)
+        scaled = img.resize((int(width * scale), int(height * scale)))
+        img = Image.new("RGB", (width, height), "white")
+        img.paste(scaled, (rng.randint(-8, 8), rng.randint(-8, 8)))
+        img = img.filter(ImageFilter.GaussianBlur(rng.uniform(0.3, 1.0)))
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=rng.choice([60, 75, 90]))
+    buffer.seek(0)
+    return Image.open(buffer).convert("RGB")
+
+
+def option_box(img: Image.Image) -> tuple[float, float, float, float]:
+    width, height = img.size
+    x0, y0, x1, y1 = OPTION_BOX
+    return x0 * width, y0 * height, x1 * width, y1 * height
+
+
+def strike(img: Image.Image) -> Image.Image:
+    """A line through the option word."""
+    img = img.copy()
+    x0, y0, x1, y1 = option_box(img)
+    ImageDraw.Draw(img).line((x0 - 5, (y0 + y1) / 2, x1 + 5, (y0 + y1) / 2 + 3), fill=PEN, width=3)
+    return img
+
+
+def tick(img: Image.Image) -> Image.Image:
+    """A check mark over the option word."""
+    img = img.copy()
+    x0, y0, x1, y1 = option_box(img)
+    cx, cy, h = (x0 + x1) / 2, (y0 + y1) / 2, y1 - y0
+    ImageDraw.Draw(img).line(
+        [(cx - h * 0.5, cy), (cx - h * 0.1, cy + h * 0.5), (cx + h * 0.8, cy - h * 0.7)], fill=PEN, width=3,
+    )
+    return img
+
+
+def handwriting(img: Image.Image, seed: int) -> Image.Image:
+    """Wavy pen strokes across the page."""
+    img = img.copy()
+    rng = random.Random(seed)
+    draw = ImageDraw.Draw(img)
+    width, height = img.size
+    for _ in range(25):
+        x, y = rng.randint(100, width - 300), rng.randint(100, height - 100)
+        draw.line([(x + j * 8, y + rng.randint(-6, 6)) for j in range(rng.randint(6, 20))], fill=PEN, width=3)
+    return img
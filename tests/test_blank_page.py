@@ -0,0 +1,37 @@
+"""Blank-page thresholds: scans of a blank stay blank, any pen mark does not."""
+
+import pytest
+
+from src.services.blank_page import BlankPageDetector
+
+from .page_images import BLANK_PAGE, handwriting, scan_like, strike, tick
+
+
+@pytest.fixture(scope="module")
+def detector():
+    return BlankPageDetector()
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_scanned_blank_is_blank(detector, blank_page, save, seed):
+    score = detector.score(save(scan_like(blank_page, seed), "scan"), BLANK_PAGE)
+    assert score.blank, score
+
+
+@pytest.mark.parametrize("mark", [strike, tick], ids=["strike", "tick"])
+def test_ink_over_printed_text_is_not_blank(detector, blank_page, save, mark):
+    score = detector.score(save(scan_like(mark(blank_page), 4), "marked"), BLANK_PAGE)
+    assert not score.blank, score
+    assert score.over_score >= score.over_threshold
+
+
+def test_handwriting_is_not_blank(detector, blank_page, save):
+    score = detector.score(save(scan_like(handwriting(blank_page, 5), 5), "filled"), BLANK_PAGE)
+    assert not score.blank, score
+    assert score.score >= score.threshold
+
+
+def test_thresholds_have_their_floors(detector):
+    threshold, over_threshold = detector.thresholds(BLANK_PAGE)
+    assert threshold >= detector.min_threshold
+    assert over_threshold >= detector.min_over_threshold
@@ -0,0 +1,57 @@
+"""Hedge budget, delay and metrics."""
+
+from src.services.hedging import HedgePolicy
+from src.services.provider_router import ProviderRouter
+
+
+def test_hedges_are_capped_at_the_budget():
+    policy = HedgePolicy(enabled=True, budget=0.1)
+    granted = 0
+    for _ in range(100):
+        policy.start()
+        granted += policy.try_hedge()
+    assert granted == 10
+    assert policy.snapshot()["hedged_fraction"] == 0.1
+
+
+def test_no_hedge_before_enough_calls():
+    policy = HedgePolicy(enabled=True, budget=0.1)
+    for _ in range(9):
+        policy.start()
+    assert not policy.try_hedge()
+    policy.start()
+    assert policy.try_hedge()
+    assert not policy.try_hedge()
+
+
+def test_zero_budget_never_hedges():
+    policy = HedgePolicy(enabled=True, budget=0.0)
+    for _ in range(50):
+        policy.start()
+    assert not policy.try_hedge()
+
+
+def test_delay_waits_for_history_and_respects_the_floor():
+    router = ProviderRouter()
+    policy = HedgePolicy(enabled=True, min_samples=20, min_delay_seconds=5.0)
+    for _ in range(19):
+        router.record_success("together", 1.0)
+    assert policy.delay(router, "together") is None
+
+    router.record_success("together", 1.0)
+    assert policy.delay(router, "together") == 5.0
+
+    for _ in range(40):
+        router.record_success("together", 12.0)
+    assert policy.delay(router, "together") == 12.0
+
+
+def test_cancelled_primaries_are_counted_apart():
+    policy = HedgePolicy(enabled=True)
+    policy.record(observed=2.0, primary=2.0)
+    policy.record(observed=6.0, primary=None, hedge_won=True)
+    snapshot = policy.snapshot()
+    assert snapshot["hedge_wins"] == 1
+    assert snapshot["primaries_cancelled"] == 1
+    assert snapshot["primary_latency"]["p50_ms"] == 2000
+    assert snapshot["latency"]["p90_ms"] == 6000
@@ -0,0 +1,58 @@
+"""Page image encoding: the baseline by default, per-provider budgets behind a flag."""
+
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from src.services.image_encoding import (
+    ADAPTIVE_PROFILES,
+    DEFAULT_PROFILE,
+    encode_image,
+    get_encoding_profile,
+)
+
+
+@pytest.fixture
+def page(blank_page, save):
+    return save(blank_page, "page")
+
+
+@pytest.mark.parametrize("provider", [None, "together", "fireworks", "claude"])
+def test_baseline_encoding_by_default(monkeypatch, provider):
+    monkeypatch.delenv("IMAGE_ADAPTIVE_ENCODING", raising=False)
+    assert get_encoding_profile(provider) == DEFAULT_PROFILE
+
+
+def test_baseline_matches_the_original_encoder(page):
+    with Image.open(page) as img:
+        img = img.convert("RGB")
+        ratio = min(2048 / img.width, 2048 / img.height, 1.0)
+        if ratio < 1.0:
+            img = img.resize((int(img.width * ratio), int(img.height * ratio)), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=95, optimize=True)
+
+    encoded = encode_image(page, get_encoding_profile())
+    assert base64.standard_b64decode(encoded.data) == buffer.getvalue()
+    assert (encoded.format, encoded.quality) == ("jpeg", 95)
+
+
+@pytest.mark.parametrize("provider", ["together", "fireworks", "claude"])
+def test_adaptive_encoding_fits_the_provider_budget(monkeypatch, page, provider):
+    monkeypatch.setenv("IMAGE_ADAPTIVE_ENCODING", "true")
+    profile = get_encoding_profile(provider)
+    assert profile == ADAPTIVE_PROFILES[provider]
+
+    encoded = encode_image(page, profile)
+    assert encoded.size_bytes <= profile.target_bytes
+    assert max(encoded.width, encoded.height) <= profile.max_dimension
+    if profile.target_tokens:
+        assert encoded.width * encoded.height <= profile.target_tokens * profile.pixels_per_token
+
+
+def test_overrides_apply_to_the_baseline(monkeypatch):
+    monkeypatch.delenv("IMAGE_ADAPTIVE_ENCODING", raising=False)
+    monkeypatch.setenv("IMAGE_MAX_DIMENSION", "1024")
+    assert get_encoding_profile("claude").max_dimension == 1024
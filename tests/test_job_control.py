@@ -0,0 +1,101 @@
+"""Job deadlines and cancellation."""
+
+import asyncio
+import time
+
+import pytest
+
+from src.services.job_control import (
+    MIN_CALL_SECONDS,
+    JobCancelled,
+    JobControl,
+    JobDeadlineExceeded,
+    JobRegistry,
+)
+
+
+def test_check_raises_after_deadline():
+    control = JobControl("job", deadline_s=0.01)
+    time.sleep(0.02)
+    with pytest.raises(JobDeadlineExceeded):
+        control.check()
+    assert control.reason == "deadline"
+
+
+def test_cancel_wins_over_a_later_deadline():
+    control = JobControl("job", deadline_s=0.01)
+    control.cancel()
+    time.sleep(0.02)
+    with pytest.raises(JobCancelled):
+        control.check()
+
+
+def test_call_timeout_is_capped_at_time_left():
+    assert JobControl("job").call_timeout(300.0) == 300.0
+    assert JobControl("job", deadline_s=60.0).call_timeout(300.0) <= 60.0
+
+
+def test_call_timeout_fails_fast_near_the_deadline():
+    control = JobControl("job", deadline_s=MIN_CALL_SECONDS / 2)
+    with pytest.raises(JobDeadlineExceeded):
+        control.call_timeout(300.0)
+
+
+def test_bound_task_is_cancelled_at_its_deadline():
+    async def job():
+        with JobControl("job", deadline_s=0.05).bind():
+            await asyncio.sleep(5)
+
+    started = time.monotonic()
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(job())
+    assert time.monotonic() - started < 2
+
+
+def test_cancel_of_a_running_job():
+    registry = JobRegistry()
+    control = registry.open("job")
+    assert registry.cancel("job") is True
+    assert control.aborted
+    assert not registry.take_pending_cancel("job")
+
+
+def test_cancel_before_start_is_kept_for_the_job():
+    registry = JobRegistry()
+    assert registry.cancel("job") is False
+    control = registry.open("job")
+    with pytest.raises(JobCancelled):
+        control.check()
+
+
+def test_pending_cancel_is_used_up():
+    registry = JobRegistry()
+    registry.cancel("job")
+    assert registry.take_pending_cancel("job")
+    assert not registry.take_pending_cancel("job")
+    assert not registry.open("job").aborted
+
+
+def test_cancel_without_remember_is_dropped():
+    registry = JobRegistry()
+    assert registry.cancel("job", remember=False) is False
+    assert not registry.take_pending_cancel("job")
+
+
+def test_claimed_job_is_owned_until_it_closes():
+    registry = JobRegistry()
+    assert not registry.owns("job")
+    registry.claim("job")
+    assert registry.owns("job")
+    registry.open("job")
+    assert registry.owns("job")
+    registry.close("job")
+    assert not registry.owns("job")
+
+
+def test_cancel_of_a_claimed_job_is_kept_until_it_opens():
+    registry = JobRegistry()
+    registry.claim("job")
+    assert registry.cancel("job", remember=False) is False
+    with pytest.raises(JobCancelled):
+        registry.open("job").check()
@@ -0,0 +1,93 @@
+"""Job and page-result persistence against an in-memory Supabase."""
+
+import pytest
+
+from src.services import job_manager
+from src.services.page_hash import DuplicatePageDetector, compute_page_hash
+
+from .fake_supabase import APIError
+
+
+@pytest.fixture
+def page_hash(blank_page, save):
+    return compute_page_hash(save(blank_page, "page"))
+
+
+def test_page_result_upserts_on_job_and_page(supabase):
+    job_manager.save_page_result("job", "doc", 1, {"overall_confidence": 0.5})
+    job_manager.save_page_result("job", "doc", 1, {"overall_confidence": 0.9})
+    rows = supabase.rows["extraction_results"]
+    assert [r["overall_confidence"] for r in rows] == [0.9]
+    assert ("extraction_results", "delete") not in supabase.calls
+
+
+def test_page_result_falls_back_without_unique_index(supabase, caplog):
+    supabase.errors[("extraction_results", "upsert")] = APIError("42P10", "no unique constraint")
+    job_manager.save_page_result("job", "doc", 1, {"overall_confidence": 0.5})
+    job_manager.save_page_result("job", "doc", 1, {"overall_confidence": 0.9})
+    job_manager.save_page_result("job", "doc", 2, {"overall_confidence": 0.7})
+
+    rows = supabase.rows["extraction_results"]
+    assert sorted((r["page_number"], r["overall_confidence"]) for r in rows) == [(1, 0.9), (2, 0.7)]
+    assert supabase.calls.count(("extraction_results", "upsert")) == 1
+    assert sum("no unique index" in r.message for r in caplog.records) == 1
+
+
+def test_page_result_other_errors_still_raise(supabase):
+    supabase.errors[("extraction_results", "upsert")] = APIError("23503", "foreign key violation")
+    with pytest.raises(APIError):
+        job_manager.save_page_result("job", "doc", 1, {})
+    assert job_manager._results_upsert_supported
+
+
+def test_duplicate_page_is_found_for_the_same_owner(supabase, page_hash):
+    job_manager.save_page_result("job", "doc", 3, {"overall_confidence": 0.9, "items_needing_review": 0})
+    job_manager.save_page_hash("job", "doc", 3, page_hash, "schema", owner_id="owner")
+
+    match = job_manager.find_duplicate_page(page_hash, "schema", DuplicatePageDetector(), "other-doc", "owner")
+    assert (match.job_id, match.page_number) == ("job", 3)
+    assert match.result.overall_confidence == 0.9
+    assert job_manager.find_duplicate_page(page_hash, "schema", DuplicatePageDetector(), "doc", "someone-else") is None
+
+
+@pytest.mark.parametrize("code", ["PGRST205", "42703"])
+def test_missing_page_hash_table_means_no_duplicates(supabase, page_hash, caplog, code):
+    supabase.errors[("document_page_hashes", "select")] = APIError(code)
+    supabase.errors[("document_page_hashes", "upsert")] = APIError(code)
+    detector = DuplicatePageDetector()
+
+    for page_number in (1, 2):
+        assert job_manager.find_duplicate_page(page_hash, "schema", detector, "doc") is None
+        job_manager.save_page_hash("job", "doc", page_number, page_hash, "schema")
+
+    assert supabase.calls.count(("document_page_hashes", "select")) == 1
+    assert ("document_page_hashes", "upsert") not in supabase.calls
+    assert sum("document_page_hashes is missing" in r.message for r in caplog.records) == 1
+
+
+def test_page_hash_outages_still_raise(supabase, page_hash):
+    supabase.errors[("document_page_hashes", "select")] = APIError("57014", "statement timeout")
+    with pytest.raises(APIError):
+        job_manager.find_duplicate_page(page_hash, "schema", DuplicatePageDetector(), "doc")
+    assert job_manager._page_hashes_available
+
+
+def test_retry_stats_are_appended_not_replaced(supabase):
+    supabase.rows["extraction_jobs"] = [{
+        "id": "job", "processing_time_ms": 90_000, "ai_model_used": "qwen",
+        "page_stats": {"blank_pages_skipped": 2}, "llm_telemetry": {"calls": 10, "cost_usd": 0.5},
+        "llm_calls": 10, "llm_cost_usd": 0.5,
+    }]
+    for pages, calls in (([3], 2), ([3, 4], 3)):
+        job_manager.append_job_retry("job", {
+            "page_numbers": pages, "page_stats": {"blank_pages_skipped": 0},
+            "llm_telemetry": {"calls": calls, "cost_usd": 0.1},
+        })
+
+    job = supabase.rows["extraction_jobs"][0]
+    assert (job["processing_time_ms"], job["ai_model_used"]) == (90_000, "qwen")
+    assert job["page_stats"] == {"blank_pages_skipped": 2}
+    assert job["llm_telemetry"] == {"calls": 10, "cost_usd": 0.5}
+    assert [r["page_numbers"] for r in job["retries"]] == [[3], [3, 4]]
+    assert job["llm_calls"] == 15
+    assert job["llm_cost_usd"] == pytest.approx(0.7)
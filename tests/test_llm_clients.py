@@ -0,0 +1,65 @@
+"""Shared LLM client pools: one async pool per event loop."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from src.services import llm_clients
+from src.services.async_engine import get_engine_loop, run_sync
+
+
+@pytest.fixture(autouse=True)
+def api_key(monkeypatch):
+    monkeypatch.setenv("TOGETHER_API_KEY", "test-key")
+
+
+def test_async_client_built_outside_a_loop_belongs_to_the_engine_loop():
+    client = llm_clients.get_llm_client("together", async_client=True)
+
+    async def inside_engine():
+        return llm_clients.get_llm_client("together", async_client=True)
+
+    assert run_sync(inside_engine()) is client
+    assert llm_clients._http_clients[("together", get_engine_loop())] is not None
+
+
+def test_each_loop_gets_its_own_async_client():
+    async def client():
+        return llm_clients.get_llm_client("together", async_client=True)
+
+    first, second = asyncio.run(client()), asyncio.run(client())
+    assert first is not second
+    assert first is not llm_clients.get_llm_client("together", async_client=True)
+
+
+def test_sync_client_is_shared():
+    assert llm_clients.get_llm_client("together") is llm_clients.get_llm_client("together")
+
+
+def test_async_pool_refuses_another_loop():
+    pool = llm_clients._http_client("together", get_engine_loop())
+
+    async def request():
+        await pool.get("https://api.together.xyz/v1/models")
+
+    with pytest.raises(RuntimeError, match="outside the event loop"):
+        asyncio.run(request())
+
+
+def test_async_pool_allows_its_own_loop():
+    async def check():
+        pool = llm_clients._http_client("together", asyncio.get_running_loop())
+        for hook in pool.event_hooks["request"]:
+            await hook(httpx.Request("GET", "https://api.together.xyz/v1/models"))
+
+    asyncio.run(check())
+
+
+def test_pools_of_closed_loops_are_dropped():
+    async def client():
+        return llm_clients.get_llm_client("together", async_client=True)
+
+    asyncio.run(client())
+    llm_clients._http_client("together", get_engine_loop())
+    assert all(loop is None or not loop.is_closed() for _, loop in llm_clients._http_clients)
@@ -0,0 +1,51 @@
+"""Grouping pages into shared Stage 1 requests."""
+
+import pytest
+
+from src.services.page_batching import BatchCandidate, PageBatchPolicy
+
+
+def page(index: int, output_tokens: int = 400, images: int = 1, schema_tokens: int = 300, group: tuple = ("a",)):
+    return BatchCandidate(index, schema_tokens, output_tokens, images, group)
+
+
+@pytest.fixture
+def policy():
+    return PageBatchPolicy(enabled=True, max_pages=4, max_images=4, max_batch_output_tokens=4000)
+
+
+def test_disabled_policy_runs_every_page_alone():
+    assert PageBatchPolicy().plan([page(0), page(1)]) == [[0], [1]]
+
+
+def test_short_pages_share_a_request(policy):
+    assert policy.plan([page(i) for i in range(3)]) == [[0, 1, 2]]
+
+
+def test_page_limit(policy):
+    policy.max_pages = 2
+    assert policy.plan([page(i) for i in range(5)]) == [[0, 1], [2, 3], [4]]
+
+
+def test_image_limit_counts_blanks(policy):
+    # A page with its blank template is two images; max_images 4 fits two of them.
+    assert policy.plan([page(i, images=2) for i in range(3)]) == [[0, 1], [2]]
+
+
+def test_output_limit(policy):
+    assert policy.plan([page(i, output_tokens=1500) for i in range(3)]) == [[0, 1], [2]]
+
+
+@pytest.mark.parametrize("candidate", [
+    page(1, output_tokens=2500),      # more than half the batch output
+    page(1, schema_tokens=5000),      # long schema
+    page(1, output_tokens=None),      # no schema: output unbounded
+    page(1, images=3),                # more than half the image limit
+])
+def test_long_pages_go_alone(policy, candidate):
+    assert policy.plan([page(0), candidate, page(2)]) == [[0, 2], [1]]
+
+
+def test_groups_never_mix_and_keep_page_order(policy):
+    candidates = [page(0, group=("a",)), page(1, group=("b",)), page(2, group=("a",)), page(3, group=("b",))]
+    assert policy.plan(candidates) == [[0, 2], [1, 3]]
@@ -0,0 +1,63 @@
+"""Duplicate-page thresholds: re-exports match, a page with one more mark does not."""
+
+import pytest
+
+from src.services.page_hash import DuplicatePageDetector, PageHash, compute_page_hash
+
+from .page_images import handwriting, scan_like, tick
+
+
+@pytest.fixture(scope="module")
+def detector():
+    return DuplicatePageDetector()
+
+
+@pytest.fixture
+def filled(blank_page):
+    return handwriting(blank_page, 1)
+
+
+@pytest.fixture
+def filled_hash(filled, save):
+    return compute_page_hash(save(filled, "filled"))
+
+
+def test_defaults_seed_stage2(detector):
+    assert detector.mode == "seed"
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_reexport_matches(detector, filled, filled_hash, save, seed):
+    other = compute_page_hash(save(scan_like(filled, seed, rescan=False), "reexport"))
+    assert filled_hash.ink_difference(other) <= detector.max_ink_difference
+    assert detector.matches(filled_hash, other) is not None
+
+
+def test_added_tick_does_not_match(detector, filled, filled_hash, save):
+    other = compute_page_hash(save(scan_like(tick(filled), 1, rescan=False), "ticked"))
+    assert filled_hash.distance(other)[0] <= detector.max_dhash_distance
+    assert filled_hash.ink_difference(other) > detector.max_ink_difference
+    assert detector.matches(filled_hash, other) is None
+
+
+def test_other_handwriting_does_not_match(detector, blank_page, filled_hash, save):
+    other = compute_page_hash(save(scan_like(handwriting(blank_page, 2), 1, rescan=False), "other"))
+    assert detector.matches(filled_hash, other) is None
+
+
+def test_hash_without_ink_never_matches(detector, filled_hash):
+    bare = PageHash(filled_hash.dhash, filled_hash.phash)
+    assert bare == filled_hash
+    assert detector.matches(filled_hash, bare) is None
+
+
+def test_stored_hash_round_trips(filled_hash):
+    stored = PageHash.from_hex(filled_hash.dhash_hex, filled_hash.phash_hex, filled_hash.ink_b64)
+    assert stored == filled_hash
+    assert stored.ink == filled_hash.ink
+    assert filled_hash.ink_difference(stored) == 0.0
+
+
+def test_bands_find_every_indexed_distance(filled_hash):
+    flipped = PageHash(filled_hash.dhash ^ sum(1 << (i * 32) for i in range(7)), filled_hash.phash)
+    assert set(filled_hash.bands()) & set(flipped.bands())
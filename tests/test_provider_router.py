@@ -0,0 +1,120 @@
+"""Provider ordering and circuit breakers."""
+
+import pytest
+
+from src.services.provider_router import CLOSED, HALF_OPEN, OPEN, ProviderRouter, ROUTING_POLICIES
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+def make_router(policy: str, **kwargs) -> ProviderRouter:
+    router = ProviderRouter(policy=policy, **kwargs)
+    router.register("claude", "claude-model", cost=10.0)
+    router.register("together", "qwen-model", cost=1.0)
+    router.register("fireworks", "qwen-model", cost=2.0)
+    return router
+
+
+def trip(router: ProviderRouter, provider: str) -> None:
+    for _ in range(router.failure_threshold):
+        router.record_failure(provider, 1.0, RuntimeError("boom"))
+
+
+def state(router: ProviderRouter, provider: str) -> str:
+    return router.snapshot()["providers"][provider]["state"]
+
+
+def test_priority_keeps_configured_order():
+    router = make_router("priority")
+    assert router.route(["claude", "together", "fireworks"]) == ["claude", "together", "fireworks"]
+
+
+def test_cost_puts_cheapest_first():
+    router = make_router("cost")
+    assert router.route(["claude", "together", "fireworks"]) == ["together", "fireworks", "claude"]
+
+
+def test_latency_puts_fastest_first():
+    router = make_router("latency")
+    router.record_success("claude", 4.0)
+    router.record_success("together", 2.0)
+    router.record_success("fireworks", 1.0)
+    assert router.route(["claude", "together", "fireworks"]) == ["fireworks", "together", "claude"]
+
+
+@pytest.mark.parametrize("policy", ROUTING_POLICIES)
+def test_pinned_provider_stays_first_under_every_policy(policy):
+    router = make_router(policy)
+    router.record_success("claude", 9.0)
+    router.record_success("together", 1.0)
+    router.record_success("fireworks", 2.0)
+    order = router.route(["together", "claude", "fireworks"], pinned="claude")
+    assert order[0] == "claude"
+    assert sorted(order[1:]) == ["fireworks", "together"]
+
+
+def test_pinned_fallbacks_follow_policy():
+    router = make_router("cost")
+    assert router.route(["claude", "fireworks", "together"], pinned="claude") == ["claude", "together", "fireworks"]
+
+
+def test_open_pinned_provider_falls_behind():
+    router = make_router("priority")
+    trip(router, "claude")
+    assert router.route(["claude", "together"], pinned="claude") == ["together", "claude"]
+
+
+def test_consecutive_failures_trip_the_breaker():
+    router = make_router("priority", failure_threshold=3)
+    router.record_failure("claude", 1.0, RuntimeError("boom"))
+    router.record_failure("claude", 1.0, RuntimeError("boom"))
+    assert state(router, "claude") == CLOSED
+    router.record_failure("claude", 1.0, RuntimeError("boom"))
+    assert state(router, "claude") == OPEN
+    assert not router.available("claude")
+    assert router.route(["claude", "together"]) == ["together", "claude"]
+
+
+def test_error_rate_trips_the_breaker():
+    router = make_router("priority", failure_threshold=100, min_calls=4, error_rate_threshold=0.5)
+    for ok in (True, False, True, False):
+        if ok:
+            router.record_success("together", 1.0)
+        else:
+            router.record_failure("together", 1.0, RateLimitError("slow down"))
+    assert state(router, "together") == OPEN
+    assert router.snapshot()["providers"]["together"]["rate_limited"] == 2
+
+
+def test_half_open_probe_closes_or_reopens():
+    router = make_router("priority", cooldown_seconds=0.0)
+    trip(router, "claude")
+    assert router.available("claude")
+    router.acquire("claude")
+    assert state(router, "claude") == HALF_OPEN
+    assert not router.available("claude"), "only one probe at a time"
+
+    router.record_failure("claude", 1.0, RuntimeError("still down"))
+    assert state(router, "claude") == OPEN
+
+    router.available("claude")
+    router.acquire("claude")
+    router.record_success("claude", 1.0)
+    assert state(router, "claude") == CLOSED
+
+
+def test_cooldown_doubles_on_repeated_trips():
+    router = make_router("priority", cooldown_seconds=10.0)
+    trip(router, "claude")
+    first = router._health["claude"].cooldown
+    router._health["claude"].opened_at -= first
+    router.available("claude")
+    router.record_failure("claude", 1.0, RuntimeError("still down"))
+    assert router._health["claude"].cooldown == 2 * first
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        ProviderRouter(policy="random")
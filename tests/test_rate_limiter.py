@@ -0,0 +1,63 @@
+"""Rate-limit header parsing."""
+
+import time
+from email.utils import formatdate
+
+import pytest
+
+from src.services.rate_limiter import parse_exhausted_window, parse_retry_after
+
+
+def test_retry_after_seconds():
+    assert parse_retry_after({"retry-after": "7"}) == 7.0
+
+
+def test_retry_after_ms_takes_precedence():
+    assert parse_retry_after({"retry-after-ms": "1500", "retry-after": "7"}) == 1.5
+
+
+def test_retry_after_http_date():
+    value = formatdate(time.time() + 30, usegmt=True)
+    assert parse_retry_after({"retry-after": value}) == pytest.approx(30, abs=2)
+
+
+def test_retry_after_missing_or_garbled():
+    assert parse_retry_after({}) is None
+    assert parse_retry_after({"retry-after": "soon"}) is None
+
+
+@pytest.mark.parametrize(
+    ("reset", "seconds"),
+    [("6m0s", 360.0), ("1h2m3s", 3723.0), ("20ms", 0.02), ("12", 12.0), ("1.5s", 1.5)],
+)
+def test_exhausted_window_reset_formats(reset, seconds):
+    headers = {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": reset}
+    assert parse_exhausted_window(headers) == pytest.approx(seconds)
+
+
+def test_exhausted_window_epoch_reset():
+    headers = {"x-ratelimit-remaining": "0", "x-ratelimit-reset": str(time.time() + 20)}
+    assert parse_exhausted_window(headers) == pytest.approx(20, abs=1)
+
+
+def test_exhausted_window_anthropic_rfc3339():
+    headers = {
+        "anthropic-ratelimit-tokens-remaining": "0",
+        "anthropic-ratelimit-tokens-reset": "2000-01-01T00:00:00Z",
+    }
+    assert parse_exhausted_window(headers) == 0.0
+
+
+def test_window_with_capacity_left_is_ignored():
+    headers = {"x-ratelimit-remaining-tokens": "5000", "x-ratelimit-reset-tokens": "30s"}
+    assert parse_exhausted_window(headers) is None
+
+
+def test_longest_exhausted_window_wins():
+    headers = {
+        "x-ratelimit-remaining-requests": "0",
+        "x-ratelimit-reset-requests": "2s",
+        "x-ratelimit-remaining-tokens": "0",
+        "x-ratelimit-reset-tokens": "45s",
+    }
+    assert parse_exhausted_window(headers) == 45.0
@@ -0,0 +1,76 @@
+"""Response cache: hits and misses by content key, expiry, eviction."""
+
+import pytest
+from pydantic import BaseModel
+
+from src.services.response_cache import ResponseCache, make_cache_key
+
+
+class Answer(BaseModel):
+    value: str
+
+
+class OtherAnswer(BaseModel):
+    value: str
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(tmp_path / "cache.sqlite3")
+
+
+def key(**overrides) -> str:
+    parts = dict(
+        image_data="page", blank_image_data="blank", prompt="prompt", model_id="model", response_model=Answer,
+    )
+    parts.update(overrides)
+    return make_cache_key(**parts)
+
+
+def test_identical_call_hits(cache):
+    cache.put(key(), "model", Answer(value="yes"))
+    assert cache.get(key(), Answer) == Answer(value="yes")
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+@pytest.mark.parametrize("change", [
+    {"image_data": "other page"},
+    {"blank_image_data": None},
+    {"prompt": "other prompt"},
+    {"model_id": "other model"},
+    {"response_model": OtherAnswer},
+])
+def test_any_change_to_the_call_misses(cache, change):
+    cache.put(key(), "model", Answer(value="yes"))
+    assert key(**change) != key()
+    assert cache.get(key(**change), Answer) is None
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+def test_expired_entry_misses_and_is_dropped(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite3", ttl_seconds=-1)
+    cache.put(key(), "model", Answer(value="yes"))
+    assert cache.get(key(), Answer) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_unreadable_entry_misses_and_is_dropped(cache):
+    class Stricter(BaseModel):
+        value: int
+
+    cache.put(key(), "model", Answer(value="yes"))
+    assert cache.get(key(), Stricter) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    entry_size = len(Answer(value="x" * 100).model_dump_json())
+    cache = ResponseCache(tmp_path / "cache.sqlite3", max_bytes=entry_size * 3)
+    for name in ("a", "b", "c"):
+        cache.put(key(prompt=name), "model", Answer(value="x" * 100))
+    cache.get(key(prompt="a"), Answer)
+    cache.put(key(prompt="d"), "model", Answer(value="x" * 100))
+
+    assert cache.get(key(prompt="a"), Answer) is not None
+    assert cache.get(key(prompt="b"), Answer) is None
+    assert cache.get(key(prompt="d"), Answer) is not None
@@ -0,0 +1,79 @@
+"""Local repair of structured VLM output."""
+
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel, Field
+
+from src.services.structured_output import StructuredOutputError, repair_json, repair_structured_output
+
+
+class Item(BaseModel):
+    field_id: str
+    value: Optional[str] = None
+    confidence: float = Field(ge=0.0, le=1.0)
+    is_checked: Optional[bool] = None
+
+
+class Page(BaseModel):
+    fields: list[Item]
+    page_legibility: str
+
+
+def test_valid_output_needs_no_repair():
+    page, repairs = repair_structured_output(
+        '{"fields": [{"field_id": "a", "confidence": 0.9}], "page_legibility": "good"}', Page,
+    )
+    assert page.fields[0].field_id == "a"
+    assert repairs == []
+
+
+def test_code_fence_and_trailing_comma():
+    repairs = []
+    data = repair_json('```json\n{"a": [1, 2,],}\n```', repairs)
+    assert data == {"a": [1, 2]}
+    assert "code_fence" in repairs
+
+
+def test_python_literals():
+    assert repair_json('{"a": True, "b": None,}') == {"a": True, "b": None}
+
+
+def test_truncated_output_keeps_complete_items_only():
+    repairs = []
+    text = '{"fields": [{"field_id": "a", "confidence": 0.9}, {"field_id": "b", "value": "hal'
+    data = repair_json(text, repairs)
+    assert data == {"fields": [{"field_id": "a", "confidence": 0.9}]}
+    assert "truncated" in repairs
+
+
+def test_no_json_at_all():
+    with pytest.raises(StructuredOutputError):
+        repair_json("I could not read this page.")
+
+
+def test_confidence_and_booleans_are_coerced():
+    payload = {
+        "fields": [{"field_id": "a", "confidence": "85%", "is_checked": "yes"}],
+        "page_legibility": "good",
+    }
+    page, repairs = repair_structured_output(payload, Page)
+    assert page.fields[0].confidence == pytest.approx(0.85)
+    assert page.fields[0].is_checked is True
+    assert repairs
+
+
+def test_invalid_list_item_is_dropped():
+    payload = {
+        "fields": [{"field_id": "a", "confidence": 0.9}, {"value": "no id"}],
+        "page_legibility": "good",
+    }
+    page, _ = repair_structured_output(payload, Page)
+    assert [f.field_id for f in page.fields] == ["a"]
+
+
+def test_truncated_required_key_is_defaulted():
+    text = '{"fields": [{"field_id": "a", "confidence": 0.9}, {"field_id": "b"'
+    page, repairs = repair_structured_output(text, Page, defaults={Page: {"page_legibility": "fair"}})
+    assert page.page_legibility == "fair"
+    assert "truncated" in repairs
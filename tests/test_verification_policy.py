@@ -0,0 +1,88 @@
+"""Selective Stage 2 verification decisions."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from src.services.verification_policy import (
+    VERIFY_ALWAYS,
+    VERIFY_NEVER,
+    VERIFY_SELECTIVE,
+    VerificationDecision,
+    VerificationPolicy,
+)
+
+
+def field(field_id: str, confidence: float):
+    return SimpleNamespace(field_id=field_id, confidence=confidence)
+
+
+@pytest.fixture
+def selective():
+    return VerificationPolicy(mode=VERIFY_SELECTIVE)
+
+
+def test_always_verifies_every_field_by_default():
+    policy = VerificationPolicy()
+    assert policy.mode == VERIFY_ALWAYS
+    decision = policy.decide([field("a", 0.99), field("b", 0.99)], "excellent")
+    assert (decision.action, decision.field_ids) == ("full", ["a", "b"])
+
+
+def test_never_skips():
+    decision = VerificationPolicy(mode=VERIFY_NEVER).decide([field("a", 0.1)], "poor")
+    assert decision.skipped
+
+
+def test_clean_page_is_skipped(selective):
+    decision = selective.decide([field("a", 0.95), field("b", 0.92)], "Excellent")
+    assert decision.skipped
+    assert decision.total_fields == 2
+
+
+def test_page_short_of_skip_legibility_verifies_its_legal_fields(selective):
+    decision = selective.decide([field("a", 0.95), field("p1_birth_date", 0.95)], "good")
+    assert (decision.action, decision.field_ids) == ("subset", ["p1_birth_date"])
+
+
+def test_low_confidence_and_legal_fields_form_the_subset(selective):
+    fields = [field("a", 0.5), field("b", 0.95), field("date_of_injury", 0.99), field("patient_dob", 0.6)]
+    decision = selective.decide(fields, "good")
+    assert decision.action == "subset"
+    assert decision.field_ids == ["a", "patient_dob", "date_of_injury"]
+    assert decision.total_fields == 4
+
+
+def test_confident_page_without_legal_fields_is_skipped(selective):
+    decision = selective.decide([field("a", 0.88), field("b", 0.9)], "fair")
+    assert decision.skipped
+
+
+def test_no_fields_means_full_verification(selective):
+    assert selective.decide([], "excellent").action == "full"
+
+
+def test_legal_fields_block_a_skip_only_below_the_page_threshold(selective):
+    decision = selective.decide([field("case_number", 0.8), field("a", 0.95)], "excellent")
+    assert (decision.action, decision.field_ids) == ("subset", ["case_number"])
+
+
+@pytest.mark.parametrize("action, fields, covered, expected", [
+    ("subset", ["a"], True, True),
+    ("subset", ["a"], False, False),
+    ("full", ["a"], True, False),
+    ("subset", [f"f{i}" for i in range(25)], True, False),
+])
+def test_use_crops(selective, action, fields, covered, expected):
+    decision = VerificationDecision(action, fields, len(fields), "")
+    assert selective.use_crops(decision, covered) is expected
+
+
+def test_crops_can_be_turned_off():
+    policy = VerificationPolicy(mode=VERIFY_SELECTIVE, crop_verification=False)
+    assert not policy.use_crops(VerificationDecision("subset", ["a"], 1, ""), True)
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        VerificationPolicy(mode="sometimes")